@@ -14,91 +14,860 @@
 # CONDITIONS OF ANY KIND, either express or implied. See the License for the
 # specific language governing permissions and limitations under the License.
 
+import contextvars
+import io
+import json
 import os
-import tempfile
+import re
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from contextlib import contextmanager
 from ftplib import FTP
+from ftplib import error_perm
+from ftplib import error_temp
 from mimetypes import MimeTypes
 from urllib.parse import urlparse
 
-import requests
 from packageurl.contrib import purl2url
 
+from fetchcode import memo
+from fetchcode import transport
+from fetchcode.cache import copy_file
+from fetchcode.utils import CHECKSUM_ALGORITHMS
+from fetchcode.utils import MultiHasher
 from fetchcode.utils import _http_exists
+from fetchcode.workspace import get_workspace
+
+# Size in bytes of each chunk read from the network and written to disk when
+# streaming a download.
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# Smallest byte range fetched by a single connection in a segmented download.
+# Files smaller than two segments are always fetched with a single stream.
+MIN_SEGMENT_SIZE = 8 * 1024 * 1024
+
+# Default number of concurrent downloads in fetch_many.
+DEFAULT_MAX_WORKERS = 8
+
+# Default number of concurrent downloads from the same host in fetch_many.
+DEFAULT_PER_HOST_LIMIT = 4
 
 
 class Response:
-    def __init__(self, location, content_type, size, url):
+    def __init__(
+        self, location, content_type, size, url, headers=None, checksums=None, content=None
+    ):
         """
         Represent the response from fetching a URL with:
-        - `location`: the absolute location of the files that was fetched
+        - `location`: the absolute location of the files that was fetched or
+          None if the content was not saved to a file
         - `content_type`: content type of the file
         - `size`: size of the retrieved content in bytes
         - `url`: fetched URL
+        - `headers`: mapping of HTTP response headers, if any
+        - `checksums`: mapping of {algorithm: hex digest} of the content
+        - `content`: the fetched content bytes when fetched in memory
         """
         self.url = url
         self.size = size
         self.content_type = content_type
         self.location = location
+        self.headers = headers or {}
+        self.checksums = checksums or {}
+        self.content = content
+        # the Workspace and entry directory of content fetched without a location
+        self.workspace = None
+        self.workspace_entry = None
+
+    def __enter__(self):
+        if self.workspace_entry:
+            self.workspace.pin(self.workspace_entry)
+        return self
+
+    def __exit__(self, *args):
+        self.delete()
+
+    def delete(self):
+        """
+        Delete the fetched file and release its workspace storage if any.
+        """
+        if self.workspace_entry:
+            self.workspace.release(self.workspace_entry)
+            self.workspace_entry = None
+        elif self.location and os.path.isfile(self.location):
+            os.remove(self.location)
 
+    @property
+    def md5(self):
+        return self.checksums.get("md5")
+
+    @property
+    def sha1(self):
+        return self.checksums.get("sha1")
+
+    @property
+    def sha256(self):
+        return self.checksums.get("sha256")
+
+    @property
+    def sha512(self):
+        return self.checksums.get("sha512")
+
+
+class FetchResult:
+    def __init__(self, url, response=None, error=None):
+        """
+        Represent the outcome of fetching one URL or PURL of a batch with:
+        - `url`: the requested URL or PURL string
+        - `response`: the `Response` object or None if the fetch failed
+        - `error`: the exception raised if the fetch failed or None
+        """
+        self.url = url
+        self.response = response
+        self.error = error
 
-def fetch_http(url, location):
+
+class RangeNotSupported(Exception):
+    pass
+
+
+class ChecksumMismatchError(Exception):
+    pass
+
+
+class MaxSizeExceeded(Exception):
+    pass
+
+
+def get_multi_hasher(checksums=None, algorithms=CHECKSUM_ALGORITHMS):
+    """
+    Return a MultiHasher computing the `algorithms` checksums and the checksums
+    of the expected `checksums` mapping of {algorithm: hex digest}.
+    """
+    algorithms = list(algorithms or [])
+    algorithms.extend(algorithm for algorithm in checksums or {} if algorithm not in algorithms)
+    return MultiHasher(algorithms)
+
+
+def check_checksums(response, checksums):
+    """
+    Raise a ChecksumMismatchError and delete the fetched file if the checksums
+    of the `response` do not match the expected `checksums` mapping of
+    {algorithm: hex digest}.
+    """
+    if not checksums:
+        return
+
+    missing = [algorithm for algorithm in checksums if algorithm not in response.checksums]
+    if missing and response.location:
+        hasher = MultiHasher(missing)
+        hasher.update_from_file(response.location)
+        response.checksums.update(hasher.hexdigests())
+
+    for algorithm, expected in checksums.items():
+        actual = response.checksums.get(algorithm)
+        if expected and actual != expected.lower():
+            if response.location and os.path.exists(response.location):
+                os.remove(response.location)
+            raise ChecksumMismatchError(
+                f"{algorithm} checksum mismatch for {response.url}: "
+                f"expected {expected} but got {actual}"
+            )
+
+
+def fetch_http(
+    url,
+    location,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    segments=1,
+    resume=False,
+    checksums=None,
+    checksum_algorithms=CHECKSUM_ALGORITHMS,
+):
     """
     Return a `Response` object built from fetching the content at a HTTP/HTTPS based
     `url` URL string saving the content in a file at `location`
+
+    The content is streamed to disk in chunks of at most `chunk_size` bytes such
+    that memory usage stays flat regardless of the size of the fetched file.
+
+    When `segments` is greater than 1 and the server supports byte ranges, the
+    file is split in up to `segments` byte ranges fetched concurrently over
+    separate connections. Otherwise, fall back to a single stream.
+
+    When `resume` is True, a single stream is used and the content is first saved
+    in a partial file next to `location` such that an interrupted download can be
+    resumed where it stopped on the next call.
+
+    The `checksum_algorithms` checksums are computed while the content is
+    streamed to disk. Raise a ChecksumMismatchError if the content does not
+    match the expected `checksums` mapping of {algorithm: hex digest}.
+
+    Raise a ``requests.HTTPError`` if the server responds with an error status.
     """
-    r = requests.get(url)
+    hasher = get_multi_hasher(checksums=checksums, algorithms=checksum_algorithms)
 
-    with open(location, "wb") as f:
-        f.write(r.content)
+    response = None
+    if resume:
+        response = fetch_http_resumable(
+            url=url, location=location, chunk_size=chunk_size, hasher=hasher
+        )
+
+    elif segments > 1:
+        try:
+            response = fetch_http_segmented(
+                url=url, location=location, chunk_size=chunk_size, segments=segments
+            )
+            # segments arrive out of order and are checksummed once complete
+            hasher.update_from_file(location)
+        except RangeNotSupported:
+            pass
 
+    if not response:
+        r = transport.get(url, stream=True)
+        raise_for_status(r)
+        response = save_http_response(
+            r, url=url, location=location, chunk_size=chunk_size, hasher=hasher
+        )
+
+    response.checksums = hasher.hexdigests()
+    check_checksums(response, checksums)
+    return response
+
+
+def raise_for_status(r):
+    """
+    Close the `r` streamed ``requests.Response`` and raise a ``requests.HTTPError``
+    if its status code is a client or server error.
+    """
+    if r.status_code >= 400:
+        r.close()
+        r.raise_for_status()
+
+
+def save_http_response(r, url, location, chunk_size=DEFAULT_CHUNK_SIZE, hasher=None):
+    """
+    Return a `Response` object built from streaming the content of the `r`
+    streamed ``requests.Response`` for `url` to a file at `location`, updating
+    the `hasher` MultiHasher checksums with the content if provided.
+    """
     content_type = r.headers.get("content-type")
-    size = r.headers.get("content-length")
-    size = int(size) if size else None
+    with open(location, "wb") as f:
+        size = stream_http_response(r, f.write, chunk_size=chunk_size, hasher=hasher)
 
-    resp = Response(location=location, content_type=content_type, size=size, url=url)
+    resp = Response(
+        location=location,
+        content_type=content_type,
+        size=size,
+        url=url,
+        headers=r.headers,
+        checksums=hasher and hasher.hexdigests(),
+    )
 
     return resp
 
 
-def fetch_ftp(url, location):
+def stream_http_response(r, write, chunk_size=DEFAULT_CHUNK_SIZE, hasher=None):
+    """
+    Call the `write` callable with each chunk of at most `chunk_size` bytes of
+    the content of the `r` streamed ``requests.Response`` and return the size
+    of the content. Update the `hasher` MultiHasher checksums with the content
+    if provided.
+    """
+    try:
+        size = 0
+        for chunk in r.iter_content(chunk_size=chunk_size):
+            write(chunk)
+            size += len(chunk)
+            if hasher:
+                hasher.update(chunk)
+    finally:
+        r.close()
+    return size
+
+
+def fetch_http_cached(url, location, cache, purl=None, **kwargs):
+    """
+    Return a `Response` object built from fetching the content at a HTTP/HTTPS based
+    `url` URL string saving the content in a file at `location`, using the `cache`
+    DownloadCache.
+
+    A cached download is revalidated with a conditional request and reused if
+    it did not change. Otherwise, the fetched content is added to the `cache`
+    and indexed by `url` and by the `purl` string that resolved to `url` if any.
+    Extra `kwargs` are passed to `fetch_http`.
+
+    When the expected `checksums` include a sha256 already stored in the
+    `cache`, the stored file is reused without any request. In offline mode, a
+    cached download is reused without revalidation.
+
+    Only successful responses are cached. Raise a ``requests.HTTPError`` on a
+    client or server error, except that a cached download is reused if its
+    revalidation fails with a server error.
+    """
+    checksums = kwargs.get("checksums")
+    expected_sha256 = checksums and checksums.get("sha256")
+    cached = expected_sha256 and cache.get_by_sha256(expected_sha256)
+
+    response = None
+    if not cached:
+        cached = cache.get(url)
+        if cached and not transport.is_offline():
+            r = transport.get(url, headers=cached.get_conditional_headers(), stream=True)
+            if r.status_code == 304 or r.status_code >= 500:
+                r.close()
+            else:
+                raise_for_status(r)
+                cached = None
+                hasher = get_multi_hasher(
+                    checksums=checksums,
+                    algorithms=kwargs.get("checksum_algorithms", CHECKSUM_ALGORITHMS),
+                )
+                response = save_http_response(
+                    r,
+                    url=url,
+                    location=location,
+                    chunk_size=kwargs.get("chunk_size", DEFAULT_CHUNK_SIZE),
+                    hasher=hasher,
+                )
+                check_checksums(response, checksums)
+
+    if cached:
+        if purl:
+            cache.add_purl(purl, url)
+        copy_file(cached.location, location)
+        response = Response(
+            location=location,
+            content_type=cached.content_type,
+            size=cached.size,
+            url=url,
+            checksums=cached.checksums,
+        )
+        check_checksums(response, checksums)
+        return response
+
+    if not response:
+        response = fetch_http(url, location, **kwargs)
+
+    cache.add(
+        url=url,
+        location=location,
+        content_type=response.content_type,
+        etag=response.headers.get("etag"),
+        last_modified=response.headers.get("last-modified"),
+        purl=purl,
+        checksums=response.checksums,
+    )
+    return response
+
+
+def get_partial_location(location):
+    """
+    Return the location of the partial file of a resumable download to `location`.
+    """
+    return f"{location}.part"
+
+
+def load_partial_state(location):
+    """
+    Return a mapping of the saved state of a resumable download to `location`
+    or an empty mapping if there is no saved state.
+    """
+    try:
+        with open(f"{location}.part.json") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_partial_state(location, **state):
+    """
+    Save the `state` of a resumable download to `location`. This state is used
+    to check that a partial file is still valid before resuming its download.
+    """
+    with open(f"{location}.part.json", "w") as f:
+        json.dump(state, f)
+
+
+def clear_partial(location):
+    """
+    Remove the partial file and the saved state of a resumable download to `location`.
+    """
+    for partial in (get_partial_location(location), f"{location}.part.json"):
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+def complete_partial(location):
+    """
+    Move the partial file of a resumable download to its final `location`.
+    """
+    os.replace(get_partial_location(location), location)
+    clear_partial(location)
+
+
+def get_resume_offset(location, **validators):
+    """
+    Return the number of bytes already fetched for a resumable download to
+    `location` or 0 if the download must start over because there is no partial
+    file or because the saved state does not match the `validators`.
+    """
+    partial_location = get_partial_location(location)
+    if not os.path.exists(partial_location):
+        return 0
+
+    state = load_partial_state(location)
+    if not state or any(state.get(key) != value for key, value in validators.items()):
+        return 0
+
+    return os.path.getsize(partial_location)
+
+
+def parse_content_range(value):
+    """
+    Return a tuple of (start, end, total size) from a Content-Range header
+    `value` or None if it is not a valid byte range. The total size is None if
+    unknown.
+
+    For example:
+    >>> parse_content_range("bytes 4-9/10")
+    (4, 9, 10)
+    >>> parse_content_range("bytes 4-9/*")
+    (4, 9, None)
+    >>> parse_content_range("bytes */10")
+    """
+    match = re.fullmatch(r"bytes (\d+)-(\d+)/(\d+|\*)", (value or "").strip())
+    if not match:
+        return
+    start, end, total = match.groups()
+    return int(start), int(end), None if total == "*" else int(total)
+
+
+def is_resumed_response(response, offset, size=None):
+    """
+    Return True if a 206 `response` to a ranged request continues a partial
+    download at `offset` of a content of `size` bytes if known.
+    """
+    content_range = parse_content_range(response.headers.get("content-range"))
+    if not content_range:
+        return False
+    start, _end, total = content_range
+    return start == offset and (size is None or total is None or total == size)
+
+
+def fetch_http_resumable(url, location, chunk_size=DEFAULT_CHUNK_SIZE, hasher=None):
+    """
+    Return a `Response` object built from fetching the content at a HTTP/HTTPS based
+    `url` URL string saving the content in a file at `location`, resuming a
+    previously interrupted download of the same `url` to the same `location`.
+
+    The content is saved in a partial file along with the ETag, Last-Modified
+    and size of the fetched content. A later call sends a ranged request guarded
+    by an If-Range validator, or by the size of the content when the server sent
+    no validator, and appends to the partial file only if the Content-Range of
+    the response starts at the end of the partial file and has the same size. It
+    starts over otherwise, such as when the content changed on the server.
+
+    The `hasher` MultiHasher checksums are updated with the content if provided.
+    """
+    partial_location = get_partial_location(location)
+    state = load_partial_state(location)
+    validator = state.get("etag") or state.get("last_modified")
+    expected_size = state.get("size")
+
+    offset = 0
+    headers = {}
+    if validator or expected_size:
+        offset = get_resume_offset(location, url=url)
+        if offset:
+            headers = {"Range": f"bytes={offset}-"}
+            if validator:
+                headers["If-Range"] = validator
+
+    r = transport.get(url, headers=headers, stream=True)
+    try:
+        not_resumed = r.status_code == 206 and not is_resumed_response(r, offset, expected_size)
+        not_complete = r.status_code == 416 and offset != expected_size
+        if offset and (not_resumed or not_complete):
+            # the server did not resume at the end of the partial file
+            r.close()
+            clear_partial(location)
+            offset = 0
+            r = transport.get(url, headers={}, stream=True)
+
+        if r.status_code == 416 and offset and offset == expected_size:
+            # the partial file was already complete
+            if hasher:
+                hasher.update_from_file(partial_location)
+            complete_partial(location)
+            return Response(
+                location=location,
+                content_type=state.get("content_type"),
+                size=offset,
+                url=url,
+            )
+
+        if r.status_code >= 400:
+            clear_partial(location)
+            r.raise_for_status()
+
+        content_type = r.headers.get("content-type")
+        if r.status_code == 206 and offset:
+            mode = "ab"
+            content_type = content_type or state.get("content_type")
+        else:
+            mode = "wb"
+            offset = 0
+            expected_size = r.headers.get("content-length")
+            expected_size = int(expected_size) if expected_size else None
+            save_partial_state(
+                location,
+                url=url,
+                etag=r.headers.get("etag"),
+                last_modified=r.headers.get("last-modified"),
+                size=expected_size,
+                content_type=content_type,
+            )
+
+        if hasher and offset:
+            hasher.update_from_file(partial_location)
+
+        size = offset
+        with open(partial_location, mode) as f:
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                size += len(chunk)
+                if hasher:
+                    hasher.update(chunk)
+    finally:
+        r.close()
+
+    if expected_size is not None and size != expected_size:
+        raise Exception(f"Incomplete download of {url}: {size} of {expected_size} bytes")
+
+    complete_partial(location)
+    return Response(
+        location=location, content_type=content_type, size=size, url=url, headers=r.headers
+    )
+
+
+def get_segments(size, segments):
+    """
+    Return a list of (start, end) inclusive byte ranges splitting a file of
+    `size` bytes in at most `segments` ranges of at least MIN_SEGMENT_SIZE bytes.
+
+    For example:
+    >>> get_segments(10, 3)
+    [(0, 9)]
+    >>> get_segments(MIN_SEGMENT_SIZE * 2, 4) == [
+    ...     (0, MIN_SEGMENT_SIZE - 1), (MIN_SEGMENT_SIZE, MIN_SEGMENT_SIZE * 2 - 1)
+    ... ]
+    True
+    """
+    segments = max(1, min(segments, size // MIN_SEGMENT_SIZE))
+    segment_size = -(-size // segments)
+    return [(start, min(start + segment_size, size) - 1) for start in range(0, size, segment_size)]
+
+
+def fetch_http_segmented(url, location, chunk_size=DEFAULT_CHUNK_SIZE, segments=4):
+    """
+    Return a `Response` object built from fetching the content at a HTTP/HTTPS based
+    `url` URL string in up to `segments` byte ranges fetched concurrently and
+    written in place in a preallocated file at `location`.
+
+    Raise a RangeNotSupported exception if the server does not support byte
+    ranges or if the file is too small to be worth splitting, and a
+    ``requests.HTTPError`` if a byte range request fails with an error status.
+    """
+    head = transport.head(url, allow_redirects=True)
+    headers = head.headers
+    size = headers.get("content-length")
+    accepts_ranges = headers.get("accept-ranges", "").lower() == "bytes"
+    too_small = not size or int(size) < 2 * MIN_SEGMENT_SIZE
+    if head.status_code != 200 or not accepts_ranges or too_small:
+        raise RangeNotSupported(url)
+
+    size = int(size)
+    content_type = headers.get("content-type")
+    # Use the final URL after redirects and make sure that all the segments
+    # come from the same representation of the resource.
+    range_url = head.url or url
+    validator = headers.get("etag") or headers.get("last-modified")
+    if validator and validator.startswith("W/"):
+        validator = None
+
+    with open(location, "wb") as f:
+        f.truncate(size)
+
+    # set when any segment fails such that the other segments stop early
+    failed = threading.Event()
+
+    def fetch_segment(byte_range):
+        start, end = byte_range
+        range_headers = {"Range": f"bytes={start}-{end}"}
+        if validator:
+            range_headers["If-Range"] = validator
+
+        r = transport.get(range_url, headers=range_headers, stream=True)
+        try:
+            r.raise_for_status()
+            if r.status_code != 206:
+                raise RangeNotSupported(url)
+            written = 0
+            with open(location, "r+b") as f:
+                f.seek(start)
+                for chunk in r.iter_content(chunk_size=chunk_size):
+                    if failed.is_set():
+                        return written
+                    f.write(chunk)
+                    written += len(chunk)
+        except Exception:
+            failed.set()
+            raise
+        finally:
+            r.close()
+
+        if written != end - start + 1:
+            raise Exception(f"Incomplete segment {start}-{end} for: {url}")
+        return written
+
+    byte_ranges = get_segments(size, segments)
+    with ThreadPoolExecutor(max_workers=len(byte_ranges)) as executor:
+        size = sum(executor.map(fetch_segment, byte_ranges))
+
+    return Response(
+        location=location, content_type=content_type, size=size, url=url, headers=headers
+    )
+
+
+class FTPPool:
+    """
+    A pool of logged in FTP connections kept open per host and reused across
+    downloads to avoid the connection and login round-trips of each download.
+    At most `max_idle_per_host` idle connections are kept for each host.
+    """
+
+    def __init__(self, max_idle_per_host=DEFAULT_PER_HOST_LIMIT):
+        self.max_idle_per_host = max_idle_per_host
+        self.idle_connections = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def acquire(self, netloc, reuse=True):
+        """
+        Return a logged in FTP connection to `netloc`, reusing an idle
+        connection if `reuse` is True and one is available.
+        """
+        if reuse:
+            with self.lock:
+                idle = self.idle_connections[netloc]
+                if idle:
+                    return idle.pop()
+
+        transport.check_online(f"ftp://{netloc}")
+        ftp = FTP(netloc)
+        ftp.login()
+        return ftp
+
+    def release(self, netloc, ftp):
+        """
+        Return an `ftp` FTP connection to `netloc` to the pool or close it if
+        the pool is full.
+        """
+        with self.lock:
+            idle = self.idle_connections[netloc]
+            if len(idle) < self.max_idle_per_host:
+                idle.append(ftp)
+                return
+        close_ftp(ftp)
+
+    def close(self):
+        """
+        Close all the idle connections of the pool.
+        """
+        with self.lock:
+            connections = [ftp for idle in self.idle_connections.values() for ftp in idle]
+            self.idle_connections.clear()
+        for ftp in connections:
+            close_ftp(ftp)
+
+
+def close_ftp(ftp):
+    """
+    Close an `ftp` FTP connection ignoring errors.
+    """
+    try:
+        ftp.close()
+    except Exception:
+        pass
+
+
+# FTP connections shared by all FTP downloads
+ftp_pool = FTPPool()
+
+
+def fetch_ftp(
+    url,
+    location,
+    resume=False,
+    checksums=None,
+    checksum_algorithms=CHECKSUM_ALGORITHMS,
+):
     """
     Return a `Response` object built from fetching the content at a FTP based `url` URL string
     saving the content in a file at `location`
+
+    When `resume` is True, the content is first saved in a partial file next to
+    `location` and an interrupted download is resumed with a REST command on the
+    next call if the file size and modification time on the server did not change.
+
+    The `checksum_algorithms` checksums are computed while the content is
+    streamed to disk. Raise a ChecksumMismatchError if the content does not
+    match the expected `checksums` mapping of {algorithm: hex digest}.
+
+    The FTP connection is taken from and returned to the shared `ftp_pool`.
     """
-    url_parts = urlparse(url)
+    hasher = get_multi_hasher(checksums=checksums, algorithms=checksum_algorithms)
 
-    netloc = url_parts.netloc
-    path = url_parts.path
-    dir, file = os.path.split(path)
+    with ftp_connection(url) as (ftp, size):
+        file = os.path.basename(urlparse(url).path)
+        command = "RETR {}".format(file)
+        if resume:
+            fetch_ftp_resumable(ftp, command, url, location, size, hasher=hasher)
+        else:
+            with open(location, "wb") as f:
+
+                def write(data):
+                    f.write(data)
+                    hasher.update(data)
+
+                ftp.retrbinary(command, write)
+
+    resp = Response(
+        location=location,
+        content_type=guess_content_type(url),
+        size=size,
+        url=url,
+        checksums=hasher.hexdigests(),
+    )
+    check_checksums(resp, checksums)
+    return resp
 
-    ftp = FTP(netloc)
-    ftp.login()
 
-    size = ftp.size(path)
+def guess_content_type(url):
+    """
+    Return the content type guessed from the file name of a `url` or None.
+    """
+    file = os.path.basename(urlparse(url).path)
     mime = MimeTypes()
     mime_type = mime.guess_type(file)
     if mime_type:
-        content_type = mime_type[0]
-    else:
-        content_type = None
+        return mime_type[0]
 
-    ftp.cwd(dir)
-    file = "RETR {}".format(file)
-    with open(location, "wb") as f:
-        ftp.retrbinary(file, f.write)
-    ftp.close()
 
-    resp = Response(location=location, content_type=content_type, size=size, url=url)
-    return resp
+@contextmanager
+def ftp_connection(url):
+    """
+    Yield a tuple of (FTP connection, file size) for a FTP `url` URL string
+    using a connection from the shared `ftp_pool` with its working directory
+    set to the directory of the `url` file. The connection is returned to the
+    pool on success and closed on failure.
+    """
+    url_parts = urlparse(url)
+    netloc = url_parts.netloc
+    path = url_parts.path
+    dir = os.path.dirname(path)
+
+    def prepare(ftp):
+        size = ftp.size(path)
+        ftp.cwd(dir)
+        return size
+
+    ftp = ftp_pool.acquire(netloc)
+    try:
+        size = prepare(ftp)
+    except (EOFError, OSError, error_temp):
+        # the pooled connection may have been closed by the server while idle:
+        # retry once with a new connection
+        close_ftp(ftp)
+        ftp = ftp_pool.acquire(netloc, reuse=False)
+        try:
+            size = prepare(ftp)
+        except BaseException:
+            close_ftp(ftp)
+            raise
+    except BaseException:
+        close_ftp(ftp)
+        raise
+
+    try:
+        yield ftp, size
+    except BaseException:
+        close_ftp(ftp)
+        raise
+    ftp_pool.release(netloc, ftp)
 
 
-def resolve_purl(purl):
+def fetch_ftp_resumable(ftp, command, url, location, size, hasher=None):
+    """
+    Run the `command` RETR FTP command with the `ftp` FTP connection saving the
+    content of `url` in a partial file of `location` and resuming a previously
+    interrupted download. The `hasher` MultiHasher checksums are updated with
+    the content if provided.
+    """
+    path = urlparse(url).path
+    try:
+        modified = ftp.sendcmd(f"MDTM {path}").split()[-1]
+    except error_perm:
+        modified = None
+
+    offset = get_resume_offset(location, url=url, size=size, modified=modified)
+    if not offset:
+        save_partial_state(location, url=url, size=size, modified=modified)
+
+    partial_location = get_partial_location(location)
+    if hasher and offset:
+        hasher.update_from_file(partial_location)
+
+    mode = "ab" if offset else "wb"
+    with open(partial_location, mode) as f:
+
+        def write(data):
+            f.write(data)
+            if hasher:
+                hasher.update(data)
+
+        ftp.retrbinary(command, write, rest=offset or None)
+
+    fetched_size = os.path.getsize(partial_location)
+    if size is not None and fetched_size != size:
+        # a truncated download or a partial file of another content
+        clear_partial(location)
+        raise Exception(f"Incomplete download of {url}: {fetched_size} of {size} bytes")
+
+    complete_partial(location)
+
+
+def resolve_purl(purl, cache=None):
     """
     Resolve a Package URL (PURL) to a download URL.
 
     This function attempts to resolve the PURL using first purl2url library and
-    if that fails, it falls back to fetchcode's download_urls module.
+    if that fails, it falls back to fetchcode's download_urls module. The
+    purl2url URL is built without network requests: the download_urls resolver,
+    which may query package APIs, runs only if there is no such URL or if it
+    does not exist. The candidates of a resolver are checked concurrently.
+
+    The download URL previously resolved for the PURL is returned from the
+    `cache` DownloadCache if provided. The existence checks are stored in the
+    metadata cache if one is set such that a PURL can be resolved in offline
+    mode.
     """
+    cached_url = cache and cache.get_purl_url(purl)
+    if cached_url:
+        return cached_url
+
     from fetchcode.download_urls import download_url as get_download_url_from_fetchcode
 
     for resolver in (purl2url.get_download_url, get_download_url_from_fetchcode):
@@ -137,32 +906,265 @@ def get_url_scheme(url):
     return urlparse(url).scheme
 
 
-def fetch(url):
+def resolve_fetch_url(purl, cache=None):
+    """
+    Return a tuple of (URL, scheme) for the download URL of a `purl` PURL
+    string, from the `cache` DownloadCache if it has fetched this PURL before
+    or resolved otherwise. Raise ValueError if the PURL cannot be resolved.
+    """
+    cached_url = cache and cache.get_purl_url(purl)
+    if cached_url:
+        return cached_url, get_url_scheme(cached_url)
+    return get_resolved_url(purl, "pkg")
+
+
+def fetch(url, location=None, segments=1, resume=False, cache=None, checksums=None, purl=None):
     """
     Return a `Response` object built from fetching the content at the `url` URL string and
-    store content at a temporary file.
+    store content at `location` or in a new entry of the `fetchcode.workspace`
+    if `location` is not provided. The workspace entry is released when the
+    `Response` is deleted or used as a context manager, and may be removed by
+    the workspace quota cleanup otherwise unless the `Response` is in use as a
+    context manager.
+
+    HTTP/HTTPS downloads use up to `segments` concurrent byte range requests
+    when the server supports it.
+
+    When `resume` is True, an interrupted download of the same `url` to the same
+    `location` is resumed where it stopped. A `location` is required to resume.
+
+    When `cache` is a `fetchcode.cache.DownloadCache`, HTTP/HTTPS downloads are
+    served from this cache when still valid and stored in this cache otherwise.
+    The download URL of a PURL is stored in this cache too, as is the `purl`
+    that a `url` was resolved from if provided.
+
+    The md5, sha1, sha256 and sha512 checksums of the content are computed while
+    it is fetched and available in the `Response`. Raise a ChecksumMismatchError
+    if the content does not match the expected `checksums` mapping of
+    {algorithm: hex digest} such as {"sha256": package.sha256}.
+
+    In offline mode, see `fetchcode.transport.set_offline`, content is served
+    only from the `cache` and a `fetchcode.transport.OfflineError` is raised
+    on a cache miss.
     """
+    if resume and not location:
+        raise ValueError("A location is required to resume a download.")
+
     scheme = get_url_scheme(url)
 
+    if scheme in ["pkg"]:
+        purl = url
+        url, scheme = resolve_fetch_url(purl, cache=cache)
+
+    if scheme not in ("http", "https", "ftp"):
+        raise Exception(f"Not a supported/known scheme: {scheme}.")
+
+    workspace = workspace_entry = None
+    if not location:
+        workspace = get_workspace()
+        workspace_entry = workspace.make_entry()
+        location = os.path.join(workspace_entry, get_file_name(url))
+
+    try:
+        if scheme == "ftp":
+            response = fetch_ftp(url, location, resume=resume, checksums=checksums)
+        elif cache:
+            response = fetch_http_cached(
+                url,
+                location,
+                cache=cache,
+                purl=purl,
+                segments=segments,
+                resume=resume,
+                checksums=checksums,
+            )
+        else:
+            response = fetch_http(
+                url, location, segments=segments, resume=resume, checksums=checksums
+            )
+    except BaseException:
+        if workspace_entry:
+            workspace.release(workspace_entry)
+        raise
+
+    if workspace_entry:
+        workspace.unpin(workspace_entry)
+    response.workspace = workspace
+    response.workspace_entry = workspace_entry
+    return response
+
+
+def get_file_name(url):
+    """
+    Return a file name for the content fetched from `url`.
+
+    For example:
+    >>> get_file_name("https://example.com/foo/bar-1.0.tar.gz?x=1")
+    'bar-1.0.tar.gz'
+    >>> get_file_name("https://example.com/")
+    'download'
+    """
+    return os.path.basename(urlparse(url).path) or "download"
+
+
+def fetch_to_callback(
+    url,
+    callback,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    checksums=None,
+    checksum_algorithms=CHECKSUM_ALGORITHMS,
+):
+    """
+    Return a `Response` object built from fetching the content at the `url` URL
+    or PURL string, calling the `callback` callable with each chunk of bytes of
+    the content as it arrives instead of saving the content to a file. The
+    `Response` has no `location`.
+
+    HTTP/HTTPS content is streamed in chunks of at most `chunk_size` bytes.
+    The `checksum_algorithms` checksums are computed while the content is
+    streamed. Raise a ChecksumMismatchError once the content is fetched if it
+    does not match the expected `checksums` mapping of {algorithm: hex digest}.
+    """
+    scheme = get_url_scheme(url)
     if scheme in ["pkg"]:
         url, scheme = get_resolved_url(url, scheme)
 
-    temp = tempfile.NamedTemporaryFile(delete=False)
-    location = temp.name
+    hasher = get_multi_hasher(checksums=checksums, algorithms=checksum_algorithms)
+
+    if scheme in ("http", "https"):
+        r = transport.get(url, stream=True)
+        raise_for_status(r)
+        size = stream_http_response(r, callback, chunk_size=chunk_size, hasher=hasher)
+        response = Response(
+            location=None,
+            content_type=r.headers.get("content-type"),
+            size=size,
+            url=url,
+            headers=r.headers,
+        )
+
+    elif scheme == "ftp":
+        with ftp_connection(url) as (ftp, size):
+
+            def write(data):
+                callback(data)
+                hasher.update(data)
+
+            file = os.path.basename(urlparse(url).path)
+            ftp.retrbinary("RETR {}".format(file), write)
+
+        response = Response(
+            location=None,
+            content_type=guess_content_type(url),
+            size=size,
+            url=url,
+        )
+
+    else:
+        raise Exception(f"Not a supported/known scheme: {scheme}.")
+
+    response.checksums = hasher.hexdigests()
+    check_checksums(response, checksums)
+    return response
+
+
+def fetch_to_file(url, fileobj, **kwargs):
+    """
+    Return a `Response` object built from fetching the content at the `url` URL
+    or PURL string, writing the content to the `fileobj` binary file-like
+    object as it arrives. Extra `kwargs` are passed to `fetch_to_callback`.
+    """
+    return fetch_to_callback(url, fileobj.write, **kwargs)
+
+
+def fetch_to_memory(url, max_size=None, **kwargs):
+    """
+    Return a `Response` object built from fetching the content at the `url` URL
+    or PURL string in memory, with the content bytes available as the
+    `Response.content`. This is best suited for small files such as metadata
+    files. Raise a MaxSizeExceeded if the content is larger than `max_size`
+    bytes. Extra `kwargs` are passed to `fetch_to_callback`.
+    """
+    buffer = io.BytesIO()
+
+    def write(data):
+        buffer.write(data)
+        if max_size is not None and buffer.tell() > max_size:
+            raise MaxSizeExceeded(f"Content of {url} is larger than {max_size} bytes.")
+
+    response = fetch_to_callback(url, write, **kwargs)
+    response.content = buffer.getvalue()
+    return response
+
+
+def fetch_many(
+    urls, max_workers=DEFAULT_MAX_WORKERS, per_host_limit=DEFAULT_PER_HOST_LIMIT, **kwargs
+):
+    """
+    Yield a `FetchResult` for each URL or PURL string of the `urls` list as soon
+    as it is fetched, in completion order.
+
+    Up to `max_workers` URLs are resolved and fetched concurrently, with at most
+    `per_host_limit` concurrent downloads from the same host. Extra `kwargs` are
+    passed to `fetch`. A failure is reported in the `error` of its `FetchResult`
+    and does not stop the other downloads.
+    """
+    host_limits = defaultdict(lambda: threading.BoundedSemaphore(per_host_limit))
+    host_limits_lock = threading.Lock()
+
+    def fetch_one(url):
+        purl = None
+        if get_url_scheme(url) in ["pkg"]:
+            # resolve first to limit the downloads per host of the PURLs too
+            purl = url
+            url, _scheme = resolve_fetch_url(purl, cache=kwargs.get("cache"))
+
+        host = urlparse(url).netloc
+        with host_limits_lock:
+            host_limit = host_limits[host]
+
+        with host_limit:
+            return fetch(url, purl=purl, **kwargs)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {
+            executor.submit(contextvars.copy_context().run, fetch_one, url): url for url in urls
+        }
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                yield FetchResult(url=url, response=future.result())
+            except Exception as e:
+                yield FetchResult(url=url, error=e)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
 
-    fetchers = {"ftp": fetch_ftp, "http": fetch_http, "https": fetch_http}
 
-    if scheme in fetchers:
-        return fetchers.get(scheme)(url, location)
+def fetch_ftp_many(urls, max_sessions=DEFAULT_PER_HOST_LIMIT, **kwargs):
+    """
+    Yield a `FetchResult` for each FTP URL string of the `urls` list as soon as
+    it is fetched, in completion order.
 
-    raise Exception(f"Not a supported/known scheme: {scheme}.")
+    The files of each host are fetched over at most `max_sessions` concurrent
+    FTP sessions, each reused for several files. Extra `kwargs` are passed to
+    `fetch`.
+    """
+    urls = list(urls)
+    hosts = {urlparse(url).netloc for url in urls}
+    yield from fetch_many(
+        urls,
+        max_workers=max(1, max_sessions * len(hosts)),
+        per_host_limit=max_sessions,
+        **kwargs,
+    )
 
 
 def fetch_json_response(url):
     """
     Fetch a JSON response from the given URL and return the parsed JSON data.
     """
-    response = requests.get(url)
+    response = memo.get(url)
     if response.status_code != 200:
         raise Exception(f"Failed to fetch {url}: {response.status_code} {response.reason}")
 
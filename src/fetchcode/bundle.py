@@ -0,0 +1,340 @@
+# fetchcode is a free software tool from nexB Inc. and others.
+# Visit https://github.com/aboutcode-org/fetchcode for support and download.
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and http://aboutcode.org
+#
+# This software is licensed under the Apache License version 2.0.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at:
+# http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+
+"""
+Portable bundles of the metadata and download caches.
+
+A bundle is a single file built from a warm MetadataCache and DownloadCache
+to seed the caches of other nodes. It contains each cached document and
+downloaded file compressed on its own, followed by a compressed index of
+their offsets in the bundle:
+
+    header | blob | blob | ... | index | footer
+
+A Bundle opens a bundle file with a memory map and reads only the index: a
+document or file is decompressed from the map when it is requested. A Bundle
+can be used directly as a read-only metadata cache with
+``transport.set_metadata_cache`` or imported into local caches with
+`import_bundle`.
+"""
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+
+from fetchcode.cache import get_request_key
+from fetchcode.cache import make_response
+from fetchcode.utils import MultiHasher
+
+MAGIC = b"FETCHCODEBUNDLE1"
+
+HEADER = struct.Struct("<16s")
+
+# index offset, index length and magic
+FOOTER = struct.Struct("<QQ16s")
+
+# Blobs compressed with zlib or stored as-is when compression does not help,
+# such as for archives that are already compressed.
+COMPRESSION_ZLIB = "zlib"
+COMPRESSION_NONE = None
+
+COMPRESSION_LEVEL = 6
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class BundleError(Exception):
+    pass
+
+
+def write_blob(output, data=None, location=None):
+    """
+    Write the `data` bytes or the content of the file at `location` to the
+    `output` file, compressed if this makes it smaller. Return a mapping of
+    the blob offset, length and compression.
+    """
+    offset = output.tell()
+    compressor = zlib.compressobj(COMPRESSION_LEVEL)
+    size = 0
+    for chunk in iter_chunks(data, location):
+        size += len(chunk)
+        output.write(compressor.compress(chunk))
+    output.write(compressor.flush())
+    length = output.tell() - offset
+
+    if length < size:
+        return dict(offset=offset, length=length, compression=COMPRESSION_ZLIB)
+
+    output.seek(offset)
+    output.truncate()
+    for chunk in iter_chunks(data, location):
+        output.write(chunk)
+    return dict(offset=offset, length=size, compression=COMPRESSION_NONE)
+
+
+def iter_chunks(data=None, location=None):
+    """
+    Yield chunks of bytes from `data` or from the file at `location`.
+    """
+    if location is None:
+        yield data or b""
+        return
+
+    with open(location, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            yield chunk
+
+
+def export_bundle(location, metadata_cache=None, download_cache=None):
+    """
+    Write a bundle file at `location` with the content of a `metadata_cache`
+    MetadataCache and of a `download_cache` DownloadCache. Return a mapping of
+    the number of exported responses, downloads, objects and purls.
+    """
+    index = dict(responses={}, objects={}, urls={}, purls={})
+
+    parent = os.path.dirname(os.path.abspath(location))
+    os.makedirs(parent, exist_ok=True)
+    fd, temp_location = tempfile.mkstemp(dir=parent)
+    try:
+        with os.fdopen(fd, "wb") as output:
+            output.write(HEADER.pack(MAGIC))
+
+            if metadata_cache:
+                for row in metadata_cache.iter_rows():
+                    blob = write_blob(output, data=row.pop("content"))
+                    row.update(blob)
+                    index["responses"][row.pop("key")] = row
+
+            if download_cache:
+                objects = index["objects"]
+                for download in download_cache.iter_downloads():
+                    if download.sha256 not in objects:
+                        blob = write_blob(output, location=download.location)
+                        blob.update(size=download.size, checksums=download.checksums)
+                        objects[download.sha256] = blob
+                    index["urls"][download.url] = dict(
+                        sha256=download.sha256,
+                        content_type=download.content_type,
+                        etag=download.etag,
+                        last_modified=download.last_modified,
+                    )
+                index["purls"] = dict(download_cache.iter_purls())
+
+            index_offset = output.tell()
+            index_data = zlib.compress(json.dumps(index).encode("utf-8"), COMPRESSION_LEVEL)
+            output.write(index_data)
+            output.write(FOOTER.pack(index_offset, len(index_data), MAGIC))
+
+        os.replace(temp_location, location)
+    except BaseException:
+        if os.path.exists(temp_location):
+            os.remove(temp_location)
+        raise
+
+    return {name: len(entries) for name, entries in index.items()}
+
+
+class Bundle:
+    """
+    A read-only bundle file at `location` opened with a memory map.
+
+    A Bundle serves its cached documents as a metadata cache: documents that
+    are not in the bundle are fetched with the `get` function passed to
+    `fetch`, or with `fallback`, a MetadataCache, if provided.
+    """
+
+    def __init__(self, location, fallback=None):
+        self.location = location
+        self.fallback = fallback
+        if os.path.getsize(location) < HEADER.size + FOOTER.size:
+            raise BundleError(f"Not a fetchcode bundle: {location}")
+        with open(location, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self.index = self.read_index()
+        except BaseException:
+            self.map.close()
+            raise
+
+        self.responses = self.index["responses"]
+        self.objects = self.index["objects"]
+        self.urls = self.index["urls"]
+        self.purls = self.index["purls"]
+
+    def read_index(self):
+        """
+        Return the index mapping of the bundle.
+        """
+        (magic,) = HEADER.unpack_from(self.map, 0)
+        index_offset, index_length, footer_magic = FOOTER.unpack_from(
+            self.map, len(self.map) - FOOTER.size
+        )
+        if magic != MAGIC or footer_magic != MAGIC:
+            raise BundleError(f"Not a fetchcode bundle: {self.location}")
+        index_data = self.map[index_offset : index_offset + index_length]
+        return json.loads(zlib.decompress(index_data))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.map.close()
+
+    def iter_blob(self, blob):
+        """
+        Yield the decompressed content of a `blob` mapping in chunks.
+        """
+        offset = blob["offset"]
+        end = offset + blob["length"]
+        decompressor = blob["compression"] == COMPRESSION_ZLIB and zlib.decompressobj()
+        for start in range(offset, end, CHUNK_SIZE):
+            chunk = self.map[start : min(start + CHUNK_SIZE, end)]
+            yield decompressor.decompress(chunk) if decompressor else chunk
+        if decompressor:
+            yield decompressor.flush()
+
+    def read_blob(self, blob):
+        return b"".join(self.iter_blob(blob))
+
+    def get(self, url, headers=None, method="GET"):
+        """
+        Return the ``requests.Response`` for a `method` request on `url` with
+        `headers` stored in the bundle or None.
+        """
+        row = self.responses.get(get_request_key(url, headers, method=method))
+        if not row:
+            return
+        return make_response(
+            url=row["url"],
+            status_code=row["status_code"],
+            headers=json.loads(row["headers"]),
+            content=self.read_blob(row),
+        )
+
+    def fetch(self, url, headers=None, get=None):
+        """
+        Return a ``requests.Response`` for a GET request on `url` with
+        `headers` served from the bundle, or from the fallback cache or the
+        `get` function if the bundle does not contain this document.
+        """
+        response = self.get(url, headers=headers)
+        if response:
+            return response
+        if self.fallback:
+            return self.fallback.fetch(url, headers=headers, get=get)
+        if headers:
+            return get(url, headers=headers)
+        return get(url)
+
+    def add(self, url, response, headers=None, method="GET"):
+        """
+        Store the `response` of a `method` request on `url` with `headers` in
+        the fallback cache if any, as a bundle is read-only.
+        """
+        if self.fallback:
+            self.fallback.add(url, response, headers=headers, method=method)
+
+    def extract_object(self, sha256, location):
+        """
+        Write the file with a `sha256` digest stored in the bundle to
+        `location` and return a mapping of its {algorithm: hex digest}
+        checksums computed while writing, or return None if there is no such
+        file. Raise a BundleError and remove the file if its content does not
+        match its `sha256` digest.
+        """
+        blob = self.objects.get(sha256)
+        if not blob:
+            return
+        hasher = MultiHasher()
+        with open(location, "wb") as f:
+            for chunk in self.iter_blob(blob):
+                f.write(chunk)
+                hasher.update(chunk)
+
+        checksums = hasher.hexdigests()
+        if checksums["sha256"] != sha256:
+            os.remove(location)
+            raise BundleError(f"Corrupted file {sha256} in bundle: {self.location}")
+        return checksums
+
+
+def import_bundle(location, metadata_cache=None, download_cache=None):
+    """
+    Seed a `metadata_cache` MetadataCache and a `download_cache` DownloadCache
+    with the content of the bundle file at `location`. Cached documents keep
+    the time they were fetched at such that they are revalidated as usual.
+    Return a mapping of the number of imported responses, downloads and purls.
+    Raise a BundleError if a file of the bundle does not match its sha256
+    digest.
+    """
+    counts = dict(responses=0, downloads=0, purls=0)
+    with Bundle(location) as bundle:
+        if metadata_cache:
+            for key, row in bundle.responses.items():
+                response = make_response(
+                    url=row["url"],
+                    status_code=row["status_code"],
+                    headers=json.loads(row["headers"]),
+                    content=bundle.read_blob(row),
+                )
+                metadata_cache.store(key, row["url"], response, fetched_at=row["fetched_at"])
+                counts["responses"] += 1
+
+        if download_cache:
+            for url, entry in bundle.urls.items():
+                sha256 = entry["sha256"]
+                blob = bundle.objects.get(sha256)
+                if not blob:
+                    continue
+                temp_location = None
+                try:
+                    cached = download_cache.get_by_sha256(sha256)
+                    if cached:
+                        object_location = cached.location
+                        checksums = cached.checksums
+                    else:
+                        # the checksums of the bundle are not trusted: a file is
+                        # stored under the digests of its extracted content
+                        fd, temp_location = tempfile.mkstemp(dir=download_cache.location)
+                        os.close(fd)
+                        object_location = temp_location
+                        checksums = bundle.extract_object(sha256, temp_location)
+                    download_cache.add(
+                        url=url,
+                        location=object_location,
+                        content_type=entry["content_type"],
+                        etag=entry["etag"],
+                        last_modified=entry["last_modified"],
+                        checksums=checksums,
+                    )
+                finally:
+                    if temp_location and os.path.exists(temp_location):
+                        os.remove(temp_location)
+                counts["downloads"] += 1
+
+            for purl, url in bundle.purls.items():
+                download_cache.add_purl(purl, url)
+                counts["purls"] += 1
+
+    return counts
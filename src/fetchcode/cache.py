@@ -0,0 +1,679 @@
+# fetchcode is a free software tool from nexB Inc. and others.
+# Visit https://github.com/aboutcode-org/fetchcode for support and download.
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and http://aboutcode.org
+#
+# This software is licensed under the Apache License version 2.0.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at:
+# http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+
+"""
+On-disk caches for fetched content.
+
+A download cache directory contains an SQLite index and the cached files
+stored by content. A metadata cache is a single SQLite database of API
+responses and a tag cache is a single SQLite database of repository tags.
+SQLite makes it safe to share a cache between several threads and
+processes.
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+from contextlib import contextmanager
+from typing import Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+DOWNLOAD_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    content_type TEXT,
+    etag TEXT,
+    last_modified TEXT
+);
+CREATE TABLE IF NOT EXISTS purls (
+    purl TEXT PRIMARY KEY,
+    url TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS objects (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL,
+    md5 TEXT,
+    sha1 TEXT,
+    sha512 TEXT
+);
+"""
+
+METADATA_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status_code INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    content BLOB NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL
+);
+"""
+
+TAG_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tags (
+    repository TEXT NOT NULL,
+    name TEXT NOT NULL,
+    node TEXT NOT NULL,
+    PRIMARY KEY (repository, name)
+);
+CREATE TABLE IF NOT EXISTS repositories (
+    repository TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL
+);
+"""
+
+# Request headers with credentials that are not part of the cache keys.
+CREDENTIAL_HEADERS = ("authorization",)
+
+# HTTP status codes of the responses cached as missing documents.
+NEGATIVE_STATUS_CODES = (404, 410)
+
+
+def remove_credentials(headers):
+    """
+    Return a mapping of the request `headers` without the credential headers.
+
+    For example:
+    >>> remove_credentials({"Authorization": "Bearer token", "Accept": "text/html"})
+    {'Accept': 'text/html'}
+    >>> remove_credentials(None)
+    {}
+    """
+    return {
+        name: value
+        for name, value in (headers or {}).items()
+        if name.lower() not in CREDENTIAL_HEADERS
+    }
+
+
+def get_file_sha256(location, chunk_size=1024 * 1024):
+    """
+    Return the sha256 hex digest of the file at `location`.
+    """
+    sha256 = hashlib.sha256()
+    with open(location, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def copy_file(source, destination):
+    """
+    Copy the `source` file to a new `destination` file, replacing any existing
+    `destination`. The files are copied rather than hard linked such that a
+    later write to one of them never changes the content of the other.
+    """
+    if os.path.exists(destination):
+        os.remove(destination)
+    shutil.copyfile(source, destination)
+
+
+@dataclasses.dataclass
+class CachedDownload:
+    url: str
+    sha256: str
+    location: str
+    size: int
+    content_type: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    checksums: dict = dataclasses.field(default_factory=dict)
+
+    def get_conditional_headers(self):
+        """
+        Return a mapping of HTTP headers to revalidate this cached download.
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class DownloadCache:
+    """
+    A content-addressed cache of downloaded files.
+
+    Each file is stored once by its sha256 no matter how many URLs it was
+    fetched from. The index maps each URL to a stored file along with the ETag
+    and Last-Modified validators used to revalidate it, and each resolved PURL
+    to its download URL. When the total size of the stored files exceeds
+    `max_size` bytes, the least recently used files are evicted.
+    """
+
+    def __init__(self, location, max_size=None):
+        self.location = location
+        self.max_size = max_size
+        self.objects_location = os.path.join(location, "objects")
+        os.makedirs(self.objects_location, exist_ok=True)
+        self.index_location = os.path.join(location, "index.sqlite3")
+        with self.connect() as connection:
+            connection.executescript(DOWNLOAD_CACHE_SCHEMA)
+
+    @contextmanager
+    def connect(self):
+        """
+        Yield a connection to the index database, committing on success.
+        """
+        with closing(sqlite3.connect(self.index_location, timeout=60)) as connection:
+            connection.row_factory = sqlite3.Row
+            with connection:
+                yield connection
+
+    def get_object_location(self, sha256):
+        """
+        Return the location of the stored file with a `sha256` digest.
+        """
+        return os.path.join(self.objects_location, sha256[:2], sha256)
+
+    def get(self, url):
+        """
+        Return a CachedDownload for `url` or None if `url` is not cached.
+        """
+        with self.connect() as connection:
+            row = connection.execute(
+                "SELECT * FROM urls JOIN objects ON urls.sha256 = objects.sha256 WHERE url = ?",
+                (url,),
+            ).fetchone()
+            return self.get_cached_download(connection, row)
+
+    def get_by_sha256(self, sha256):
+        """
+        Return a CachedDownload for a stored file with a `sha256` digest or None.
+        """
+        with self.connect() as connection:
+            row = connection.execute(
+                "SELECT * FROM objects LEFT JOIN urls ON urls.sha256 = objects.sha256 "
+                "WHERE objects.sha256 = ?",
+                (sha256.lower(),),
+            ).fetchone()
+            return self.get_cached_download(connection, row)
+
+    def get_cached_download(self, connection, row):
+        """
+        Return a CachedDownload from an index `row` or None if there is no row
+        or if the stored file is missing or was changed. Mark the stored file as
+        recently used.
+        """
+        if not row:
+            return
+
+        sha256 = row["sha256"]
+        location = self.get_object_location(sha256)
+        if not os.path.exists(location) or os.path.getsize(location) != row["size"]:
+            connection.execute("DELETE FROM objects WHERE sha256 = ?", (sha256,))
+            connection.execute("DELETE FROM urls WHERE sha256 = ?", (sha256,))
+            if os.path.exists(location):
+                os.remove(location)
+            return
+
+        connection.execute(
+            "UPDATE objects SET last_access = ? WHERE sha256 = ?",
+            (time.time(), sha256),
+        )
+
+        checksums = dict(sha256=sha256)
+        for algorithm in ("md5", "sha1", "sha512"):
+            if row[algorithm]:
+                checksums[algorithm] = row[algorithm]
+
+        return CachedDownload(
+            url=row["url"],
+            sha256=sha256,
+            location=location,
+            size=row["size"],
+            content_type=row["content_type"],
+            etag=row["etag"],
+            last_modified=row["last_modified"],
+            checksums=checksums,
+        )
+
+    def get_purl_url(self, purl):
+        """
+        Return the download URL previously resolved for a `purl` string or None.
+        """
+        with self.connect() as connection:
+            row = connection.execute("SELECT url FROM purls WHERE purl = ?", (purl,)).fetchone()
+        return row and row["url"]
+
+    def add(
+        self,
+        url,
+        location,
+        content_type=None,
+        etag=None,
+        last_modified=None,
+        purl=None,
+        checksums=None,
+    ):
+        """
+        Store the file fetched from `url` at `location` and return a
+        CachedDownload. Index the `purl` string that resolved to `url` if any.
+        The file checksums are computed unless provided in a `checksums`
+        mapping of {algorithm: hex digest}.
+        """
+        checksums = dict(checksums or {})
+        sha256 = checksums.get("sha256") or get_file_sha256(location)
+        checksums["sha256"] = sha256
+        object_location = self.get_object_location(sha256)
+        if not os.path.exists(object_location):
+            object_dir = os.path.dirname(object_location)
+            os.makedirs(object_dir, exist_ok=True)
+            # store in a temporary file first such that concurrent readers
+            # never see a partially written file
+            fd, temp_location = tempfile.mkstemp(dir=object_dir)
+            os.close(fd)
+            copy_file(location, temp_location)
+            os.replace(temp_location, object_location)
+
+        size = os.path.getsize(object_location)
+        with self.connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO objects "
+                "(sha256, size, last_access, md5, sha1, sha512) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    sha256,
+                    size,
+                    time.time(),
+                    checksums.get("md5"),
+                    checksums.get("sha1"),
+                    checksums.get("sha512"),
+                ),
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO urls "
+                "(url, sha256, content_type, etag, last_modified) VALUES (?, ?, ?, ?, ?)",
+                (url, sha256, content_type, etag, last_modified),
+            )
+            if purl:
+                connection.execute(
+                    "INSERT OR REPLACE INTO purls (purl, url) VALUES (?, ?)", (purl, url)
+                )
+
+        self.evict()
+
+        return CachedDownload(
+            url=url,
+            sha256=sha256,
+            location=object_location,
+            size=size,
+            content_type=content_type,
+            etag=etag,
+            last_modified=last_modified,
+            checksums=checksums,
+        )
+
+    def add_purl(self, purl, url):
+        """
+        Index the download `url` resolved for a `purl` string.
+        """
+        with self.connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO purls (purl, url) VALUES (?, ?)", (purl, url)
+            )
+
+    def iter_downloads(self):
+        """
+        Yield a CachedDownload for each cached URL.
+        """
+        with self.connect() as connection:
+            rows = connection.execute(
+                "SELECT * FROM urls JOIN objects ON urls.sha256 = objects.sha256"
+            ).fetchall()
+        for row in rows:
+            checksums = dict(sha256=row["sha256"])
+            for algorithm in ("md5", "sha1", "sha512"):
+                if row[algorithm]:
+                    checksums[algorithm] = row[algorithm]
+            location = self.get_object_location(row["sha256"])
+            if not os.path.exists(location):
+                continue
+            yield CachedDownload(
+                url=row["url"],
+                sha256=row["sha256"],
+                location=location,
+                size=row["size"],
+                content_type=row["content_type"],
+                etag=row["etag"],
+                last_modified=row["last_modified"],
+                checksums=checksums,
+            )
+
+    def iter_purls(self):
+        """
+        Yield a tuple of (purl, url) for each resolved PURL.
+        """
+        with self.connect() as connection:
+            rows = connection.execute("SELECT purl, url FROM purls").fetchall()
+        for row in rows:
+            yield row["purl"], row["url"]
+
+    def get_size(self):
+        """
+        Return the total size in bytes of the stored files.
+        """
+        with self.connect() as connection:
+            return connection.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+
+    def evict(self):
+        """
+        Remove the least recently used files until the total size of the
+        stored files is within `max_size`.
+        """
+        if self.max_size is None:
+            return
+
+        with self.connect() as connection:
+            total_size = connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM objects"
+            ).fetchone()[0]
+            if total_size <= self.max_size:
+                return
+
+            rows = connection.execute(
+                "SELECT sha256, size FROM objects ORDER BY last_access"
+            ).fetchall()
+            for row in rows:
+                if total_size <= self.max_size:
+                    break
+                sha256 = row["sha256"]
+                connection.execute("DELETE FROM objects WHERE sha256 = ?", (sha256,))
+                connection.execute("DELETE FROM urls WHERE sha256 = ?", (sha256,))
+                object_location = self.get_object_location(sha256)
+                if os.path.exists(object_location):
+                    os.remove(object_location)
+                total_size -= row["size"]
+
+
+def get_request_key(url, headers=None, method="GET"):
+    """
+    Return a key for a `method` request on `url` with `headers`. Credentials
+    are not part of the key such that a document is shared by all the API
+    tokens.
+    """
+    request = [url, sorted(remove_credentials(headers).items())]
+    if method != "GET":
+        request.insert(0, method)
+    request = json.dumps(request)
+    return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+
+def make_response(url, status_code, headers, content):
+    """
+    Return a ``requests.Response`` for `url` served from a cache.
+    """
+    response = requests.Response()
+    response.url = url
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = content
+    response.from_cache = True
+    return response
+
+
+class MetadataCache:
+    """
+    A persistent cache of the API and metadata documents fetched with GET
+    requests, such as JSON, YAML, XML and HTML responses.
+
+    A cached document is served without any request for `max_age` seconds,
+    then revalidated with a conditional request using its ETag or
+    Last-Modified validators. A missing document (404 or 410) is cached for
+    `negative_ttl` seconds. When a request fails or the server returns an
+    error, a stale cached document is served if `stale_if_error` is True.
+
+    The SQLite database at `location` uses write-ahead logging such that many
+    processes can read and write the cache at once.
+    """
+
+    def __init__(self, location, max_age=0, negative_ttl=3600, stale_if_error=True):
+        self.location = location
+        self.max_age = max_age
+        self.negative_ttl = negative_ttl
+        self.stale_if_error = stale_if_error
+        parent = os.path.dirname(os.path.abspath(location))
+        os.makedirs(parent, exist_ok=True)
+        with self.connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(METADATA_CACHE_SCHEMA)
+
+    @contextmanager
+    def connect(self):
+        """
+        Yield a connection to the cache database, committing on success.
+        """
+        with closing(sqlite3.connect(self.location, timeout=60)) as connection:
+            connection.row_factory = sqlite3.Row
+            with connection:
+                yield connection
+
+    def get_row(self, key):
+        with self.connect() as connection:
+            return connection.execute("SELECT * FROM responses WHERE key = ?", (key,)).fetchone()
+
+    def store(self, key, url, response, fetched_at=None):
+        """
+        Store a `response` for the request `key` on `url` fetched at the
+        `fetched_at` timestamp or now.
+        """
+        headers = dict(response.headers)
+        with self.connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, url, status_code, headers, content, etag, last_modified, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    url,
+                    response.status_code,
+                    json.dumps(headers),
+                    response.content,
+                    response.headers.get("etag"),
+                    response.headers.get("last-modified"),
+                    fetched_at or time.time(),
+                ),
+            )
+
+    def touch(self, key):
+        """
+        Mark the response of the request `key` as just revalidated.
+        """
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE responses SET fetched_at = ? WHERE key = ?", (time.time(), key)
+            )
+
+    def get(self, url, headers=None, method="GET"):
+        """
+        Return the cached ``requests.Response`` for a `method` request on `url`
+        with `headers` or None.
+        """
+        row = self.get_row(get_request_key(url, headers, method=method))
+        return row and self.get_response(row)
+
+    def add(self, url, response, headers=None, method="GET"):
+        """
+        Store the `response` of a `method` request on `url` with `headers` if
+        it is a success or a missing document.
+        """
+        status_code = response.status_code
+        if 200 <= status_code < 300 or status_code in NEGATIVE_STATUS_CODES:
+            self.store(get_request_key(url, headers, method=method), url, response)
+
+    def get_response(self, row):
+        return make_response(
+            url=row["url"],
+            status_code=row["status_code"],
+            headers=json.loads(row["headers"]),
+            content=row["content"],
+        )
+
+    def is_fresh(self, row):
+        """
+        Return True if a cached `row` can be served without revalidation.
+        """
+        age = time.time() - row["fetched_at"]
+        if row["status_code"] in NEGATIVE_STATUS_CODES:
+            return age < self.negative_ttl
+        return age < self.max_age
+
+    def fetch(self, url, headers=None, get=None):
+        """
+        Return a ``requests.Response`` for a GET request on `url` with
+        `headers` served from the cache or fetched with the `get` function
+        called with a URL and headers keyword arguments.
+        """
+        key = get_request_key(url, headers)
+        row = self.get_row(key)
+        if row and self.is_fresh(row):
+            return self.get_response(row)
+
+        request_headers = dict(headers or {})
+        if row and row["status_code"] == 200:
+            if row["etag"]:
+                request_headers["If-None-Match"] = row["etag"]
+            if row["last_modified"]:
+                request_headers["If-Modified-Since"] = row["last_modified"]
+
+        can_serve_stale = self.stale_if_error and row and row["status_code"] == 200
+        kwargs = dict(headers=request_headers) if request_headers else {}
+        try:
+            response = get(url, **kwargs)
+        except requests.RequestException:
+            if can_serve_stale:
+                return self.get_response(row)
+            raise
+
+        if response.status_code == 304 and row:
+            self.touch(key)
+            return self.get_response(row)
+
+        if response.status_code == 200 or response.status_code in NEGATIVE_STATUS_CODES:
+            self.store(key, url, response)
+        elif response.status_code >= 500 and can_serve_stale:
+            return self.get_response(row)
+
+        return response
+
+    def iter_rows(self):
+        """
+        Yield a mapping for each cached response.
+        """
+        with self.connect() as connection:
+            for row in connection.execute("SELECT * FROM responses"):
+                yield dict(row)
+
+    def clear(self):
+        """
+        Remove all the cached responses.
+        """
+        with self.connect() as connection:
+            connection.execute("DELETE FROM responses")
+
+
+class TagCache:
+    """
+    A persistent cache of the tags of Git repositories, stored as the GitHub
+    GQL tag nodes of each repository, such as "owner/name". A repository is
+    synced once all its tags have been stored at least once.
+    """
+
+    def __init__(self, location):
+        self.location = location
+        parent = os.path.dirname(os.path.abspath(location))
+        os.makedirs(parent, exist_ok=True)
+        with self.connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(TAG_CACHE_SCHEMA)
+
+    @contextmanager
+    def connect(self):
+        """
+        Yield a connection to the cache database, committing on success.
+        """
+        with closing(sqlite3.connect(self.location, timeout=60)) as connection:
+            connection.row_factory = sqlite3.Row
+            with connection:
+                yield connection
+
+    def is_synced(self, repository):
+        """
+        Return True if all the tags of `repository` have been stored.
+        """
+        with self.connect() as connection:
+            row = connection.execute(
+                "SELECT synced_at FROM repositories WHERE repository = ?", (repository,)
+            ).fetchone()
+        return bool(row)
+
+    def get_names(self, repository):
+        """
+        Return a set of the stored tag names of `repository`.
+        """
+        with self.connect() as connection:
+            rows = connection.execute(
+                "SELECT name FROM tags WHERE repository = ?", (repository,)
+            ).fetchall()
+        return {row["name"] for row in rows}
+
+    def get_nodes(self, repository):
+        """
+        Return a list of the stored tag nodes of `repository` sorted by name.
+        """
+        with self.connect() as connection:
+            rows = connection.execute(
+                "SELECT node FROM tags WHERE repository = ? ORDER BY name", (repository,)
+            ).fetchall()
+        return [json.loads(row["node"]) for row in rows]
+
+    def add_nodes(self, repository, nodes):
+        """
+        Store the tag `nodes` of `repository` and mark it as synced.
+        """
+        with self.connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO tags (repository, name, node) VALUES (?, ?, ?)",
+                [(repository, node["name"], json.dumps(node)) for node in nodes],
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO repositories (repository, synced_at) VALUES (?, ?)",
+                (repository, time.time()),
+            )
+
+    def clear(self, repository=None):
+        """
+        Remove the stored tags of `repository` or of all the repositories.
+        """
+        with self.connect() as connection:
+            if repository:
+                connection.execute("DELETE FROM tags WHERE repository = ?", (repository,))
+                connection.execute("DELETE FROM repositories WHERE repository = ?", (repository,))
+            else:
+                connection.execute("DELETE FROM tags")
+                connection.execute("DELETE FROM repositories")
@@ -14,9 +14,8 @@
 # CONDITIONS OF ANY KIND, either express or implied. See the License for the
 # specific language governing permissions and limitations under the License.
 
-from packageurl import PackageURL
-
 from fetchcode import fetch_json_response
+from fetchcode.routing import parse_purl
 
 
 class Composer:
@@ -29,7 +28,7 @@ class Composer:
         """
         Return the download URL for a Composer PURL.
         """
-        purl = PackageURL.from_string(purl)
+        purl = parse_purl(purl)
 
         if not purl.name or not purl.version:
             raise ValueError("Composer PURL must specify a name and version")
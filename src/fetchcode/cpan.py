@@ -15,11 +15,13 @@
 # specific language governing permissions and limitations under the License.
 
 import urllib.parse
-
-from packageurl import PackageURL
+from functools import partial
 
 from fetchcode import fetch_json_response
+from fetchcode.routing import parse_purl
 from fetchcode.utils import _http_exists
+from fetchcode.utils import get_first_existing_url
+from fetchcode.utils import get_first_result
 
 
 class CPAN:
@@ -30,15 +32,19 @@ class CPAN:
         """
         Resolve a CPAN PURL to a verified, downloadable archive URL.
         Strategy: MetaCPAN API -> verified URL; fallback to author-based path if available.
+        The API lookup and the author-based paths are checked concurrently.
         """
-        p = PackageURL.from_string(purl)
+        p = parse_purl(purl)
         if not p.name or not p.version:
             return None
 
         parsed_name = urllib.parse.quote(p.name)
         parsed_version = urllib.parse.quote(p.version)
         api = f"https://fastapi.metacpan.org/v1/release/{parsed_name}/{parsed_version}"
-        if _http_exists(api):
+
+        def get_api_download_url():
+            if not _http_exists(api):
+                return
             # Fetch release data from MetaCPAN API
             # Example: https://fastapi.metacpan.org/v1/release/Some-Module/1.2.3
             data = fetch_json_response(url=api)
@@ -46,13 +52,15 @@ class CPAN:
             if url and _http_exists(url):
                 return url
 
+        candidates = [get_api_download_url]
         author = p.namespace
-        if not author:
-            return
-        auth = author.upper()
-        a = auth[0]
-        ab = auth[:2] if len(auth) >= 2 else auth
-        for ext in (".tar.gz", ".zip"):
-            url = f"https://cpan.metacpan.org/authors/id/{a}/{ab}/{auth}/{p.name}-{p.version}{ext}"
-            if _http_exists(url):
-                return url
+        if author:
+            auth = author.upper()
+            a = auth[0]
+            ab = auth[:2] if len(auth) >= 2 else auth
+            urls = [
+                f"https://cpan.metacpan.org/authors/id/{a}/{ab}/{auth}/{p.name}-{p.version}{ext}"
+                for ext in (".tar.gz", ".zip")
+            ]
+            candidates.append(partial(get_first_existing_url, urls, exists=_http_exists))
+        return get_first_result(candidates)
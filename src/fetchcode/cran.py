@@ -14,9 +14,9 @@
 # CONDITIONS OF ANY KIND, either express or implied. See the License for the
 # specific language governing permissions and limitations under the License.
 
-from packageurl import PackageURL
-
+from fetchcode.routing import parse_purl
 from fetchcode.utils import _http_exists
+from fetchcode.utils import get_first_existing_url
 
 
 class CRAN:
@@ -31,16 +31,12 @@ class CRAN:
     def get_download_url(cls, purl: str):
         """
         Resolve a CRAN PURL to a verified, downloadable source tarball URL.
-        Tries current contrib first, then Archive.
+        Prefers current contrib over Archive, checking both concurrently.
         """
-        p = PackageURL.from_string(purl)
+        p = parse_purl(purl)
         if not p.name or not p.version:
             return None
 
         current_url = f"{cls.base_url}/src/contrib/{p.name}_{p.version}.tar.gz"
-        if _http_exists(current_url):
-            return current_url
-
         archive_url = f"{cls.base_url}/src/contrib/Archive/{p.name}/{p.name}_{p.version}.tar.gz"
-        if _http_exists(archive_url):
-            return archive_url
+        return get_first_existing_url([current_url, archive_url], exists=_http_exists)
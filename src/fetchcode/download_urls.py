@@ -15,17 +15,17 @@
 # specific language governing permissions and limitations under the License.
 
 from packageurl.contrib.route import NoRouteAvailable
-from packageurl.contrib.route import Router
 
 from fetchcode.composer import Composer
 from fetchcode.cpan import CPAN
 from fetchcode.cran import CRAN
 from fetchcode.huggingface import Huggingface
 from fetchcode.pypi import Pypi
+from fetchcode.routing import PurlRouter
 
 package_registry = [Pypi, CRAN, CPAN, Huggingface, Composer]
 
-router = Router()
+router = PurlRouter()
 
 for pkg_class in package_registry:
     router.append(pattern=pkg_class.purl_pattern, endpoint=pkg_class.get_download_url)
@@ -0,0 +1,301 @@
+# fetchcode is a free software tool from nexB Inc. and others.
+# Visit https://github.com/aboutcode-org/fetchcode for support and download.
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and http://aboutcode.org
+#
+# This software is licensed under the Apache License version 2.0.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at:
+# http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+
+"""
+Fetch archives and extract them while they are downloaded.
+
+Tar archives are read as a stream: the fetched chunks are fed through a
+bounded pipe to ``tarfile`` running in the calling thread, such that member
+files are extracted as bytes arrive. Zip archives need random access to their
+central directory at the end of the file and are extracted once fetched.
+"""
+
+import io
+import os
+import queue
+import shutil
+import tarfile
+import tempfile
+import threading
+import zipfile
+from urllib.parse import urlparse
+
+from fetchcode import fetch_to_callback
+from fetchcode import fetch_to_file
+from fetchcode import get_resolved_url
+from fetchcode import get_url_scheme
+
+TAR_EXTENSIONS = (
+    ".tar",
+    ".tar.gz",
+    ".tgz",
+    ".tar.bz2",
+    ".tbz",
+    ".tbz2",
+    ".tar.xz",
+    ".txz",
+)
+
+ZIP_EXTENSIONS = (".zip",)
+
+# Maximum number of fetched chunks waiting to be extracted.
+PIPE_MAX_CHUNKS = 16
+
+
+class UnsafeArchiveError(Exception):
+    pass
+
+
+class ExtractionAborted(Exception):
+    pass
+
+
+def get_archive_type(url):
+    """
+    Return the archive type "tar" or "zip" of a `url` based on its file name or
+    None if this is not a known archive type.
+
+    For example:
+    >>> get_archive_type("https://example.com/foo-1.0.tar.gz")
+    'tar'
+    >>> get_archive_type("https://example.com/foo-1.0.ZIP?download=1")
+    'zip'
+    >>> get_archive_type("https://example.com/foo-1.0.gem")
+    """
+    name = os.path.basename(urlparse(url).path).lower()
+    if name.endswith(TAR_EXTENSIONS):
+        return "tar"
+    if name.endswith(ZIP_EXTENSIONS):
+        return "zip"
+
+
+def get_member_location(target, name):
+    """
+    Return the location of an archive member `name` extracted in a `target`
+    directory. Raise an UnsafeArchiveError if `name` is absolute or would be
+    extracted outside of `target`.
+
+    For example:
+    >>> get_member_location("/tmp/x", "foo/bar.c")
+    '/tmp/x/foo/bar.c'
+    >>> get_member_location("/tmp/x", "../bar.c")
+    Traceback (most recent call last):
+    ...
+    fetchcode.extract.UnsafeArchiveError: Unsafe archive member path: ../bar.c
+    """
+    target = os.path.abspath(target)
+    location = os.path.abspath(os.path.join(target, name))
+    if os.path.isabs(name) or os.path.commonpath([target, location]) != target:
+        raise UnsafeArchiveError(f"Unsafe archive member path: {name}")
+    return location
+
+
+class ChunkPipe(io.RawIOBase):
+    """
+    A readable binary stream of the chunks written from another thread.
+
+    The writer blocks when `max_chunks` chunks are waiting to be read. The
+    reader gets the error the writer finished with, if any. Once the reader
+    aborts the pipe, the writer gets an ExtractionAborted error.
+    """
+
+    def __init__(self, max_chunks=PIPE_MAX_CHUNKS):
+        super().__init__()
+        self.chunks = queue.Queue(maxsize=max_chunks)
+        self.aborted = threading.Event()
+        self.pending = b""
+        self.finished = False
+
+    def readable(self):
+        return True
+
+    def write_chunk(self, chunk):
+        """
+        Add a `chunk` of bytes to the pipe, waiting for the reader if needed.
+        """
+        self.put(bytes(chunk))
+
+    def finish(self, error=None):
+        """
+        Mark the end of the stream, with the `error` exception if the writer failed.
+        """
+        try:
+            self.put(error)
+        except ExtractionAborted:
+            pass
+
+    def put(self, item):
+        while True:
+            if self.aborted.is_set():
+                raise ExtractionAborted()
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def abort(self):
+        """
+        Stop the writer such that it does not wait for a reader that is gone.
+        """
+        self.aborted.set()
+
+    def readinto(self, buffer):
+        while not self.pending and not self.finished:
+            item = self.chunks.get()
+            if item is None:
+                self.finished = True
+            elif isinstance(item, BaseException):
+                self.finished = True
+                raise item
+            else:
+                self.pending = item
+
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+
+def extract_tar_member(tar, member, target=None, callback=None):
+    """
+    Extract a tar `member` of the `tar` TarFile in the `target` directory or
+    call `callback` with the member name and a readable file-like object.
+    Only regular files and directories are extracted; links and special files
+    are skipped.
+    """
+    if member.isdir():
+        if target:
+            os.makedirs(get_member_location(target, member.name), exist_ok=True)
+        return
+
+    if not member.isfile():
+        return
+
+    fileobj = tar.extractfile(member)
+    if callback:
+        callback(member.name, fileobj)
+        return
+
+    location = get_member_location(target, member.name)
+    os.makedirs(os.path.dirname(location), exist_ok=True)
+    with open(location, "wb") as output:
+        shutil.copyfileobj(fileobj, output)
+
+
+def fetch_and_extract_tar(url, target=None, callback=None, **kwargs):
+    """
+    Return a `Response` object built from fetching the tar archive at `url` and
+    extracting its members while the content is fetched.
+    """
+    pipe = ChunkPipe()
+    result = {}
+
+    def fetch_content():
+        try:
+            result["response"] = fetch_to_callback(url, pipe.write_chunk, **kwargs)
+        except BaseException as e:
+            pipe.finish(error=e)
+        else:
+            pipe.finish()
+
+    fetcher = threading.Thread(target=fetch_content, daemon=True)
+    fetcher.start()
+    try:
+        stream = io.BufferedReader(pipe)
+        with tarfile.open(fileobj=stream, mode="r|*") as tar:
+            for member in tar:
+                extract_tar_member(tar, member, target=target, callback=callback)
+        # read the padding after the end of the archive such that the whole
+        # content is fetched and checksummed
+        while stream.read(io.DEFAULT_BUFFER_SIZE):
+            pass
+    except BaseException:
+        pipe.abort()
+        raise
+    finally:
+        fetcher.join()
+
+    return result["response"]
+
+
+def fetch_and_extract_zip(url, target=None, callback=None, **kwargs):
+    """
+    Return a `Response` object built from fetching the zip archive at `url` in
+    an anonymous temporary file and extracting its members.
+    """
+    with tempfile.TemporaryFile() as archive:
+        response = fetch_to_file(url, archive, **kwargs)
+        archive.seek(0)
+        with zipfile.ZipFile(archive) as zip_file:
+            for info in zip_file.infolist():
+                if info.is_dir():
+                    if target:
+                        os.makedirs(get_member_location(target, info.filename), exist_ok=True)
+                    continue
+
+                with zip_file.open(info) as fileobj:
+                    if callback:
+                        callback(info.filename, fileobj)
+                        continue
+
+                    location = get_member_location(target, info.filename)
+                    os.makedirs(os.path.dirname(location), exist_ok=True)
+                    with open(location, "wb") as output:
+                        shutil.copyfileobj(fileobj, output)
+
+    return response
+
+
+def fetch_and_extract(url, target=None, callback=None, archive_type=None, **kwargs):
+    """
+    Return a `Response` object built from fetching the archive at the `url` URL
+    or PURL string and extracting its members as they are fetched, either as
+    files in a `target` directory or by calling `callback` with the name and a
+    readable file-like object of each member file. With a tar archive, the
+    file-like object must be read before `callback` returns.
+
+    The `archive_type` is either "tar" for tar, tar.gz, tar.bz2 and tar.xz
+    archives or "zip" and is guessed from the `url` file name if not provided.
+    Tar archives are extracted while they are fetched. Zip archives are
+    extracted once fetched as their index is at the end of the file. Extra
+    `kwargs` such as `checksums` are passed to `fetchcode.fetch_to_callback`.
+    The checksums are verified once the whole archive is fetched and extracted.
+
+    Only regular files and directories are extracted. Raise an
+    UnsafeArchiveError for a member path outside of the `target` directory.
+    The returned `Response` has the `target` as `location`.
+    """
+    if bool(target) == bool(callback):
+        raise ValueError("Exactly one of target or callback must be provided.")
+
+    if get_url_scheme(url) == "pkg":
+        url, _scheme = get_resolved_url(url, "pkg")
+
+    archive_type = archive_type or get_archive_type(url)
+    if archive_type == "tar":
+        extractor = fetch_and_extract_tar
+    elif archive_type == "zip":
+        extractor = fetch_and_extract_zip
+    else:
+        raise ValueError(f"Not a supported/known archive type: {url}")
+
+    if target:
+        os.makedirs(target, exist_ok=True)
+
+    response = extractor(url, target=target, callback=callback, **kwargs)
+    response.location = target
+    return response
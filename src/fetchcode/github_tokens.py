@@ -0,0 +1,364 @@
+# fetchcode is a free software tool from nexB Inc. and others.
+# Visit https://github.com/aboutcode-org/fetchcode for support and download.
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and http://aboutcode.org
+#
+# This software is licensed under the Apache License version 2.0.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at:
+# http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+
+"""
+A pool of GitHub API tokens with rate limit aware scheduling.
+
+The tokens are read from the GH_TOKENS environment variable, a comma or
+whitespace separated list, and from the GH_TOKEN environment variable. A
+.env file is loaded once if neither is set.
+
+The rate limit of each token is tracked per API resource, such as "core" for
+the REST API and "graphql" for the GraphQL API, from the X-RateLimit-*
+headers of the responses. Each request uses the token with the most remaining
+requests. When all the tokens are exhausted, a request waits for the earliest
+rate limit reset instead of failing.
+"""
+
+import dataclasses
+import math
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from datetime import timezone
+from typing import Optional
+
+# Seconds to wait past a rate limit reset before retrying.
+RESET_MARGIN = 1
+
+# Maximum number of attempts of a request that is rate limited.
+MAX_ATTEMPTS = 10
+
+# Seconds a rate limited token is not used when the response has no reset time.
+DEFAULT_RETRY_AFTER = 60
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+@dataclasses.dataclass
+class RateLimit:
+    limit: Optional[int] = None
+    remaining: Optional[int] = None
+    # rate limit reset time in seconds since the epoch
+    reset: Optional[float] = None
+
+    def refresh(self, now):
+        """
+        Forget the remaining requests once the rate limit reset time is past.
+        """
+        if not self.reset or self.reset <= now:
+            self.remaining = None
+            self.reset = None
+
+    def is_exhausted(self):
+        return self.remaining is not None and self.remaining <= 0
+
+    def get_budget(self):
+        """
+        Return the number of remaining requests, infinite if unknown.
+        """
+        return math.inf if self.remaining is None else self.remaining
+
+
+def get_header_number(headers, name):
+    value = headers.get(name)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return
+
+
+def mask_token(token):
+    """
+    Return a `token` masked for display.
+
+    For example:
+    >>> mask_token("ghp_1234567890abcdef")
+    '...cdef'
+    """
+    return f"...{token[-4:]}"
+
+
+class GitHubTokenPool:
+    """
+    A pool of GitHub API `tokens`. A request waits for at most `max_wait`
+    seconds for a rate limit reset, or without limit if `max_wait` is None,
+    and raises a RateLimitExceeded otherwise.
+    """
+
+    def __init__(self, tokens, max_wait=None):
+        self.tokens = list(dict.fromkeys(token for token in tokens if token))
+        self.max_wait = max_wait
+        self.rate_limits = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def get_rate_limit(self, token, resource):
+        """
+        Return the RateLimit of `token` for `resource`. The caller must hold
+        the pool lock.
+        """
+        key = (token, resource)
+        rate_limit = self.rate_limits.get(key)
+        if not rate_limit:
+            rate_limit = self.rate_limits[key] = RateLimit()
+        return rate_limit
+
+    def get_best(self, resource, now):
+        """
+        Return a tuple of (token, RateLimit) for the token with the most
+        remaining requests for `resource` or (None, None) if all the tokens are
+        exhausted. The caller must hold the pool lock.
+        """
+        best_token = None
+        best_rate_limit = None
+        for token in self.tokens:
+            rate_limit = self.get_rate_limit(token, resource)
+            rate_limit.refresh(now)
+            if rate_limit.is_exhausted():
+                continue
+            if not best_token or rate_limit.get_budget() > best_rate_limit.get_budget():
+                best_token = token
+                best_rate_limit = rate_limit
+        return best_token, best_rate_limit
+
+    def get_token(self, resource):
+        """
+        Return the token with the most remaining requests for `resource`
+        without counting a request nor waiting for a rate limit reset. Return
+        the token with the earliest rate limit reset if all the tokens are
+        exhausted, or None if the pool has no tokens.
+        """
+        if not self.tokens:
+            return
+
+        with self.lock:
+            now = time.time()
+            best_token, _rate_limit = self.get_best(resource, now)
+            if best_token:
+                return best_token
+            return min(
+                self.tokens, key=lambda token: self.get_rate_limit(token, resource).reset or now
+            )
+
+    def acquire(self, resource):
+        """
+        Return the token with the most remaining requests for `resource`,
+        waiting for a rate limit reset if all the tokens are exhausted. Return
+        None if the pool has no tokens.
+        """
+        if not self.tokens:
+            return
+
+        while True:
+            with self.lock:
+                now = time.time()
+                best_token, best_rate_limit = self.get_best(resource, now)
+                if best_token:
+                    if best_rate_limit.remaining is not None:
+                        # count the request before its response such that
+                        # concurrent requests are spread over the tokens
+                        best_rate_limit.remaining -= 1
+                    return best_token
+
+                resets = [self.get_rate_limit(token, resource).reset for token in self.tokens]
+                wait = min(reset or now for reset in resets) - now + RESET_MARGIN
+
+            if self.max_wait is not None and wait > self.max_wait:
+                raise RateLimitExceeded(
+                    f"GitHub {resource} rate limit exceeded for all tokens: "
+                    f"reset in {int(wait)} seconds."
+                )
+            time.sleep(wait)
+
+    def update(self, token, resource, headers):
+        """
+        Update the rate limit of `token` for `resource` from the `headers`
+        of a response.
+        """
+        remaining = get_header_number(headers, "X-RateLimit-Remaining")
+        reset = get_header_number(headers, "X-RateLimit-Reset")
+        limit = get_header_number(headers, "X-RateLimit-Limit")
+
+        retry_after = get_header_number(headers, "Retry-After")
+        if retry_after is not None:
+            # a secondary rate limit
+            remaining = 0
+            reset = time.time() + retry_after
+
+        if not token or remaining is None:
+            return
+
+        with self.lock:
+            rate_limit = self.get_rate_limit(token, resource)
+            if rate_limit.reset and reset and reset < rate_limit.reset:
+                # an older response
+                return
+            if reset == rate_limit.reset and rate_limit.remaining is not None:
+                remaining = min(remaining, rate_limit.remaining)
+            rate_limit.limit = limit or rate_limit.limit
+            rate_limit.remaining = remaining
+            rate_limit.reset = reset
+
+    def exhaust(self, token, resource, headers):
+        """
+        Mark `token` as exhausted for `resource` until the rate limit reset
+        time of the response `headers`, or for DEFAULT_RETRY_AFTER seconds.
+        """
+        reset = get_header_number(headers, "X-RateLimit-Reset")
+        reset = reset or time.time() + DEFAULT_RETRY_AFTER
+        with self.lock:
+            rate_limit = self.get_rate_limit(token, resource)
+            rate_limit.remaining = 0
+            rate_limit.reset = max(reset, rate_limit.reset or 0)
+
+    def request(self, send, resource, is_limited=None):
+        """
+        Return the response of calling `send` with a token for `resource`,
+        or with None if the pool has no tokens. A rate limited request, as
+        told by the `is_limited` callable or by `is_rate_limited`, is sent
+        again with another token or after a rate limit reset.
+        """
+        is_limited = is_limited or is_rate_limited
+        for _attempt in range(MAX_ATTEMPTS):
+            token = self.acquire(resource)
+            response = send(token)
+            if not getattr(response, "from_cache", False):
+                self.update(token, resource, response.headers)
+            if not token or not is_limited(response):
+                return response
+            self.exhaust(token, resource, response.headers)
+        raise RateLimitExceeded(f"GitHub {resource} rate limit exceeded.")
+
+    def get_quota(self):
+        """
+        Return a list of mappings with the known rate limit of each token and
+        resource.
+        """
+        quota = []
+        with self.lock:
+            for (token, resource), rate_limit in self.rate_limits.items():
+                reset = rate_limit.reset
+                quota.append(
+                    dict(
+                        token=mask_token(token),
+                        resource=resource,
+                        limit=rate_limit.limit,
+                        remaining=rate_limit.remaining,
+                        reset=reset and datetime.fromtimestamp(reset, tz=timezone.utc),
+                    )
+                )
+        return quota
+
+
+def is_rate_limited(response):
+    """
+    Return True if a GitHub API `response` failed because of a rate limit.
+    """
+    if response.status_code not in (403, 429):
+        return False
+    headers = response.headers
+    return headers.get("X-RateLimit-Remaining") == "0" or "Retry-After" in headers
+
+
+def is_graphql_rate_limited(response):
+    """
+    Return True if a GitHub GraphQL API `response` failed because of a rate
+    limit. A GraphQL rate limit is reported with a 200 status and an error of
+    type RATE_LIMITED.
+    """
+    if is_rate_limited(response):
+        return True
+    if response.status_code != 200:
+        return False
+    try:
+        errors = response.json().get("errors")
+    except ValueError:
+        return False
+    return any(error.get("type") == "RATE_LIMITED" for error in errors or [])
+
+
+_pool = GitHubTokenPool([])
+_pool_lock = threading.Lock()
+_configured = False
+_dotenv_loaded = False
+
+
+def get_environment_tokens():
+    """
+    Return a list of the tokens set in the environment, loading a .env file
+    once if there are none.
+    """
+    global _dotenv_loaded
+
+    def get_tokens():
+        tokens = re.split(r"[,\s]+", os.environ.get("GH_TOKENS", ""))
+        tokens.append(os.environ.get("GH_TOKEN", ""))
+        return list(dict.fromkeys(token for token in tokens if token))
+
+    tokens = get_tokens()
+    if not tokens and not _dotenv_loaded:
+        _dotenv_loaded = True
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        tokens = get_tokens()
+    return tokens
+
+
+def configure(tokens=None, max_wait=None):
+    """
+    Configure the pool of GitHub API `tokens` used by fetchcode instead of
+    the tokens of the environment. A request waits for at most `max_wait`
+    seconds for a rate limit reset. Return the new GitHubTokenPool.
+    """
+    global _pool, _configured
+    with _pool_lock:
+        if tokens is None:
+            _pool = GitHubTokenPool(get_environment_tokens(), max_wait=max_wait)
+            _configured = False
+        else:
+            _pool = GitHubTokenPool(tokens, max_wait=max_wait)
+            _configured = True
+        return _pool
+
+
+def get_pool():
+    """
+    Return the GitHubTokenPool used by fetchcode, with the tokens of the
+    environment unless configured with `configure`.
+    """
+    global _pool
+    with _pool_lock:
+        if not _configured:
+            tokens = get_environment_tokens()
+            if tokens != _pool.tokens:
+                _pool = GitHubTokenPool(tokens, max_wait=_pool.max_wait)
+        return _pool
+
+
+def get_quota():
+    """
+    Return a list of mappings with the known rate limit of each GitHub API
+    token and resource.
+    """
+    return get_pool().get_quota()
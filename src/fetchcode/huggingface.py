@@ -14,9 +14,8 @@
 # CONDITIONS OF ANY KIND, either express or implied. See the License for the
 # specific language governing permissions and limitations under the License.
 
-from packageurl import PackageURL
-
 from fetchcode import fetch_json_response
+from fetchcode.routing import parse_purl
 
 
 class Huggingface:
@@ -31,7 +30,7 @@ class Huggingface:
         """
         Return the download URL for a Hugging Face PURL.
         """
-        p = PackageURL.from_string(purl)
+        p = parse_purl(purl)
         if not p.name:
             return None
 
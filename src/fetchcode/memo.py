@@ -0,0 +1,201 @@
+# fetchcode is a free software tool from nexB Inc. and others.
+# Visit https://github.com/aboutcode-org/fetchcode for support and download.
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and http://aboutcode.org
+#
+# This software is licensed under the Apache License version 2.0.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at:
+# http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+
+"""
+In-process memoization of the HTTP API requests.
+
+The same API document is often needed several times to resolve a purl, such
+as by the package, package_versions and download_urls modules. The GET
+requests made with `get` are memoized:
+
+- in a request scope, opened with the `request_scope` context manager, where
+  each document is fetched at most once for the duration of the scope, and
+- in the process scope, where concurrent requests for the same document share
+  a single in-flight request and where documents are kept for `ttl` seconds
+  once enabled with `configure`.
+
+Only successful responses are kept. The memoized ``requests.Response``
+objects are shared between callers and must not be modified.
+"""
+
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from functools import partial
+
+from fetchcode import transport
+from fetchcode.cache import remove_credentials
+
+# Default maximum number of responses kept in a memo.
+DEFAULT_MAX_SIZE = 1024
+
+
+class Memo:
+    """
+    A thread-safe memo of up to `max_size` values kept for `ttl` seconds,
+    or for the lifetime of the memo if `ttl` is None. Values are not kept if
+    `ttl` is 0, but concurrent computations of the same key are still shared.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.flights = {}
+        self.lock = threading.Lock()
+
+    def get_or_compute(self, key, compute, keep=None, get_ttl=None):
+        """
+        Return the value of `key`, calling `compute` to compute this value if
+        it is not in the memo. A caller asking for a `key` that is being
+        computed by another thread waits for and gets the same value or error.
+        The value is kept in the memo if the `keep` callable returns True for
+        this value, or always if `keep` is not provided. The value is kept for
+        the number of seconds returned by the `get_ttl` callable for this value
+        if provided, or for the memo `ttl` otherwise.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self.entries.move_to_end(key)
+                    return value
+                del self.entries[key]
+
+            flight = self.flights.get(key)
+            if flight:
+                leader = False
+            else:
+                flight = self.flights[key] = Future()
+                leader = True
+
+        if not leader:
+            return flight.result()
+
+        try:
+            value = compute()
+            keep_value = keep is None or keep(value)
+            ttl = self.ttl if get_ttl is None else get_ttl(value)
+        except BaseException as e:
+            with self.lock:
+                del self.flights[key]
+            flight.set_exception(e)
+            raise
+
+        with self.lock:
+            if keep_value:
+                self.store(key, value, ttl)
+            del self.flights[key]
+        flight.set_result(value)
+        return value
+
+    def store(self, key, value, ttl):
+        """
+        Keep `value` for `key` for `ttl` seconds, or without expiration if
+        `ttl` is None, evicting the least recently used values beyond
+        `max_size`. The caller must hold the memo lock.
+        """
+        if ttl == 0 or not self.max_size:
+            return
+        expires = None if ttl is None else time.monotonic() + ttl
+        self.entries[key] = (value, expires)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all the values of the memo.
+        """
+        with self.lock:
+            self.entries.clear()
+
+
+_process_memo = Memo(ttl=0)
+_request_memo = contextvars.ContextVar("fetchcode_request_memo", default=None)
+
+
+def configure(ttl=0, max_size=DEFAULT_MAX_SIZE):
+    """
+    Configure the process scope memo to keep up to `max_size` responses for
+    `ttl` seconds. A `ttl` of 0 disables keeping responses but concurrent
+    requests for the same document are still shared.
+    """
+    global _process_memo
+    _process_memo = Memo(max_size=max_size, ttl=ttl)
+
+
+@contextmanager
+def request_scope(max_size=DEFAULT_MAX_SIZE):
+    """
+    Memoize the requests made in this context such that each document is
+    fetched at most once until the context exits. Yield the Memo of the
+    scope.
+
+    Threads started in this context use the scope only when running in a
+    copy of this context such as with ``contextvars.copy_context().run``.
+    """
+    memo = Memo(max_size=max_size, ttl=None)
+    token = _request_memo.set(memo)
+    try:
+        yield memo
+    finally:
+        _request_memo.reset(token)
+
+
+def get_memo():
+    """
+    Return the Memo of the current request scope or the process scope Memo.
+    """
+    return _request_memo.get() or _process_memo
+
+
+def freeze(value):
+    """
+    Return a hashable version of a mapping `value`.
+
+    For example:
+    >>> freeze({"b": "2", "a": "1"})
+    (('a', '1'), ('b', '2'))
+    >>> freeze(None)
+    """
+    if value:
+        return tuple(sorted(value.items()))
+
+
+def get(url, headers=None):
+    """
+    Return a ``requests.Response`` for a GET request on `url` with `headers`,
+    memoized in the current scope. Requests that differ only by their
+    credentials share the same response.
+    """
+    key = ("GET", url, freeze(remove_credentials(headers)))
+    return get_memo().get_or_compute(
+        key,
+        partial(transport.get_metadata, url, headers=headers),
+        keep=is_success,
+    )
+
+
+def is_success(response):
+    """
+    Return True if `response` is a successful ``requests.Response``.
+    """
+    return getattr(response, "status_code", None) == 200
@@ -18,13 +18,15 @@ import dataclasses
 import re
 import time
 from typing import List
+from urllib.parse import quote
 from urllib.parse import urljoin
 
+import bs4
 import htmllistparse
 from packageurl import PackageURL
 from packageurl.contrib.route import NoRouteAvailable
-from packageurl.contrib.route import Router
 
+from fetchcode import memo
 from fetchcode.package_util import GITHUB_SOURCE_BY_PACKAGE
 from fetchcode.package_util import IPKG_RELEASES
 from fetchcode.package_util import UDHCP_RELEASES
@@ -35,20 +37,30 @@ from fetchcode.package_util import OpenSSLGitHubSource
 from fetchcode.package_util import construct_cocoapods_package
 from fetchcode.package_util import get_cocoapod_tags
 from fetchcode.packagedcode_models import Package
+from fetchcode.routing import PurlRouter
+from fetchcode.routing import parse_purl
 from fetchcode.utils import get_hashed_path
 from fetchcode.utils import get_response
+from fetchcode.utils import get_response_if_exists
+from fetchcode.utils import map_ordered
 
-router = Router()
+router = PurlRouter()
 
+# Maximum number of concurrent requests to the rubygems version API.
+RUBYGEMS_MAX_WORKERS = 8
 
-def info(url):
+
+def info(url, **kwargs):
     """
     Return package metadata for a URL or PURL.
     Return None if there is no URL, or the URL or PURL is not supported.
+    Extra `kwargs` are passed to the handler of the PURL type if it accepts
+    them, such as `details=False` or `max_workers` for rubygems, and ignored
+    otherwise.
     """
     if url:
         try:
-            return router.process(url)
+            return router.process_with_options(url, **kwargs)
         except NoRouteAvailable:
             return
 
@@ -76,7 +88,13 @@ def get_cargo_data_from_purl(purl):
     """
     Generate `Package` object from the `purl` string of cargo type
     """
-    purl = PackageURL.from_string(purl)
+    purl = parse_purl(purl)
+    if purl.version:
+        package = get_cargo_package_for_version(purl)
+        if package:
+            yield package
+        return
+
     base_url = "https://crates.io"
     name = purl.name
     version = purl.version
@@ -113,12 +131,45 @@ def get_cargo_data_from_purl(purl):
             break
 
 
+def get_cargo_package_for_version(purl):
+    """
+    Return a `Package` for the version of a cargo `purl` or None, using the
+    crate version API instead of the list of all the versions.
+    """
+    base_url = "https://crates.io"
+    name = purl.name
+    api_url = f"{base_url}/api/v1/crates/{name}"
+    response = get_response_if_exists(f"{api_url}/{quote(purl.version)}")
+    version = response and response.get("version")
+    if not version:
+        return
+
+    # the crate data without its list of versions
+    crate = get_response(f"{api_url}?include=").get("crate") or {}
+    dl_path = version.get("dl_path")
+    version_purl = PackageURL(type=purl.type, name=name, version=version.get("num"))
+    return Package(
+        homepage_url=crate.get("homepage"),
+        api_url=api_url,
+        code_view_url=crate.get("repository"),
+        download_url=dl_path and f"{base_url}/{dl_path}",
+        declared_license=version.get("license"),
+        **version_purl.to_dict(),
+    )
+
+
 @router.route("pkg:npm/.*")
 def get_npm_data_from_purl(purl):
     """
     Generate `Package` object from the `purl` string of npm type
     """
-    purl = PackageURL.from_string(purl)
+    purl = parse_purl(purl)
+    if purl.version:
+        package = get_npm_package_for_version(purl)
+        if package:
+            yield package
+        return
+
     base_path = "http://registry.npmjs.org"
     name = purl.name
     version = purl.version
@@ -162,12 +213,45 @@ def get_npm_data_from_purl(purl):
             break
 
 
+def get_npm_package_for_version(purl):
+    """
+    Return a `Package` for the version of an npm `purl` or None, using the
+    manifest of this version instead of the document of all the versions.
+    """
+    base_path = "http://registry.npmjs.org"
+    name = purl.name
+    api_url = f"{base_path}/{name}/{quote(purl.version)}"
+    manifest = get_response_if_exists(api_url)
+    if not manifest:
+        return
+
+    repository = manifest.get("repository") or {}
+    bugs = manifest.get("bugs") or {}
+    dist = manifest.get("dist") or {}
+    version_purl = PackageURL(type=purl.type, name=name, version=manifest.get("version"))
+    return Package(
+        homepage_url=manifest.get("homepage"),
+        api_url=api_url,
+        vcs_url=repository.get("url") if isinstance(repository, dict) else repository,
+        bug_tracking_url=bugs.get("url") if isinstance(bugs, dict) else bugs,
+        download_url=dist.get("tarball"),
+        declared_license=manifest.get("license"),
+        **version_purl.to_dict(),
+    )
+
+
 @router.route("pkg:pypi/.*")
 def get_pypi_data_from_purl(purl):
     """
     Generate `Package` object from the `purl` string of npm type
     """
-    purl = PackageURL.from_string(purl)
+    purl = parse_purl(purl)
+    if purl.version:
+        package = get_pypi_package_for_version(purl)
+        if package:
+            yield package
+        return
+
     name = purl.name
 
     base_path = "https://pypi.org/pypi"
@@ -202,12 +286,38 @@ def get_pypi_data_from_purl(purl):
             break
 
 
+def get_pypi_package_for_version(purl):
+    """
+    Return a `Package` for the version of a pypi `purl` or None, using the
+    release API instead of the project API with all the releases.
+    """
+    name = purl.name
+    api_url = f"https://pypi.org/pypi/{name}/{quote(purl.version)}/json"
+    response = get_response_if_exists(api_url)
+    if not response:
+        return
+
+    info = response.get("info") or {}
+    project_urls = info.get("project_urls") or {}
+    release = (response.get("urls") or [{}])[0]
+    version_purl = PackageURL(type=purl.type, name=name, version=purl.version)
+    return Package(
+        homepage_url=info.get("home_page"),
+        api_url=api_url,
+        bug_tracking_url=get_pypi_bugtracker_url(project_urls),
+        code_view_url=get_pypi_codeview_url(project_urls),
+        download_url=release.get("url"),
+        declared_license=info.get("license"),
+        **version_purl.to_dict(),
+    )
+
+
 @router.route("pkg:github/.*")
 def get_github_data_from_purl(purl):
     """
     Yield `Package` object from the `purl` string of github type
     """
-    purl = PackageURL.from_string(purl)
+    purl = parse_purl(purl)
     name = purl.name
     namespace = purl.namespace
 
@@ -226,7 +336,7 @@ def get_github_data_for_miniupnp(purl):
     """
     Yield `Package` object for miniupnp packages from GitHub.
     """
-    generic_purl = PackageURL.from_string(purl)
+    generic_purl = parse_purl(purl)
     github_repo_purl = PackageURL(
         type="github",
         namespace="miniupnp",
@@ -246,7 +356,7 @@ def get_github_data_for_openssl(purl):
     """
     Yield `Package` object for OpenSSL package from GitHub.
     """
-    generic_purl = PackageURL.from_string(purl)
+    generic_purl = parse_purl(purl)
     github_repo_purl = PackageURL(
         type="github",
         namespace="openssl",
@@ -262,7 +372,7 @@ def get_github_data_for_erofs_utils(purl):
     """
     Yield `Package` object for erofs-utils package from GitHub.
     """
-    generic_purl = PackageURL.from_string(purl)
+    generic_purl = parse_purl(purl)
     github_repo_purl = PackageURL(
         type="github",
         namespace="erofs",
@@ -278,7 +388,13 @@ def get_bitbucket_data_from_purl(purl):
     """
     Generate `Package` object from the `purl` string of bitbucket type
     """
-    purl = PackageURL.from_string(purl)
+    purl = parse_purl(purl)
+    if purl.version:
+        package = get_bitbucket_package_for_version(purl)
+        if package:
+            yield package
+        return
+
     name = purl.name
     namespace = purl.namespace
     base_path = "https://api.bitbucket.org/2.0/repositories"
@@ -317,51 +433,117 @@ def get_bitbucket_data_from_purl(purl):
             break
 
 
+def get_bitbucket_package_for_version(purl):
+    """
+    Return a `Package` for the version of a bitbucket `purl` or None, using
+    the tag ref of this version instead of the list of all the tags.
+    """
+    name = purl.name
+    namespace = purl.namespace
+    version = purl.version
+    base_path = "https://api.bitbucket.org/2.0/repositories"
+    api_url = f"{base_path}/{namespace}/{name}"
+    tag = get_response_if_exists(f"{api_url}/refs/tags/{quote(version, safe='')}")
+    if not tag:
+        return
+
+    bitbucket_url = "https://bitbucket.org"
+    version_purl = PackageURL(type=purl.type, namespace=namespace, name=name, version=version)
+    return Package(
+        api_url=api_url,
+        bug_tracking_url=f"{bitbucket_url}/{namespace}/{name}/issues",
+        code_view_url=f"{bitbucket_url}/{namespace}/{name}/src/{version}",
+        download_url=f"{base_path}/{namespace}/{name}/downloads/{name}-{version}.tar.gz",
+        **version_purl.to_dict(),
+    )
+
+
 @router.route("pkg:rubygems/.*")
-def get_rubygems_data_from_purl(purl):
+def get_rubygems_data_from_purl(purl, details=True, max_workers=RUBYGEMS_MAX_WORKERS):
     """
     Generate `Package` object from the `purl` string of rubygems type
+
+    The version API of each version is fetched with up to `max_workers`
+    concurrent requests. Without `details`, the packages are built from the
+    list of versions only, without homepage and code view URLs.
     """
-    purl = PackageURL.from_string(purl)
+    purl = parse_purl(purl)
     name = purl.name
+    if purl.version and details:
+        package = get_rubygems_package_for_version(purl, purl.version)
+        if package:
+            yield package
+        return
+
     all_versions_url = f"https://rubygems.org/api/v1/versions/{name}.json"
     all_versions = get_response(all_versions_url)
+    if purl.version:
+        all_versions = [vers for vers in all_versions if vers.get("number") == purl.version]
 
-    for vers in all_versions:
-        version_purl = PackageURL(type=purl.type, name=name, version=vers.get("number"))
+    if not details:
+        for vers in all_versions:
+            yield get_rubygems_package_from_versions_list(purl, vers, api_url=all_versions_url)
+        return
 
-        if purl.version and version_purl.version != purl.version:
-            continue
+    def get_package(vers):
+        return get_rubygems_package_for_version(purl, vers.get("number"), get=get_response)
 
-        number = vers.get("number")
-        version_api = f"https://rubygems.org/api/v2/rubygems/{name}/versions/{number}.json"
-        version_api_response = get_response(version_api)
-        declared_license = version_api_response.get("licenses") or None
-        homepage_url = version_api_response.get("homepage_uri")
-        code_view_url = version_api_response.get("source_code_uri")
-        bug_tracking_url = version_api_response.get("bug_tracker_uri")
-        download_url = version_api_response.get("gem_uri")
-        repository_homepage_url = version_api_response.get("project_uri")
+    for package in map_ordered(get_package, all_versions, max_workers=max_workers):
+        if package:
+            yield package
 
-        yield Package(
-            homepage_url=homepage_url,
-            api_url=version_api,
-            bug_tracking_url=bug_tracking_url,
-            code_view_url=code_view_url,
-            declared_license=declared_license,
-            download_url=download_url,
-            repository_homepage_url=repository_homepage_url,
-            **version_purl.to_dict(),
-        )
 
-        if purl.version:
-            break
+def get_rubygems_package_from_versions_list(purl, vers, api_url):
+    """
+    Return a `Package` for a `vers` mapping of the rubygems list of versions
+    fetched from `api_url`.
+    """
+    name = purl.name
+    number = vers.get("number")
+    platform = vers.get("platform")
+    gem_name = f"{name}-{number}"
+    if platform and platform != "ruby":
+        gem_name = f"{gem_name}-{platform}"
+    version_purl = PackageURL(type=purl.type, name=name, version=number)
+    return Package(
+        api_url=api_url,
+        declared_license=vers.get("licenses") or None,
+        download_url=f"https://rubygems.org/gems/{gem_name}.gem",
+        repository_homepage_url=f"https://rubygems.org/gems/{name}",
+        sha256=vers.get("sha"),
+        **version_purl.to_dict(),
+    )
+
+
+def get_rubygems_package_for_version(purl, number, get=None):
+    """
+    Return a `Package` for the `number` version of a rubygems `purl` from the
+    rubygems version API or None, using the `get` function to fetch the API.
+    """
+    get = get or get_response_if_exists
+    name = purl.name
+    version_api = f"https://rubygems.org/api/v2/rubygems/{name}/versions/{quote(number)}.json"
+    version_api_response = get(version_api)
+    if not version_api_response:
+        return
+
+    version_purl = PackageURL(type=purl.type, name=name, version=number)
+    return Package(
+        homepage_url=version_api_response.get("homepage_uri"),
+        api_url=version_api,
+        bug_tracking_url=version_api_response.get("bug_tracker_uri"),
+        code_view_url=version_api_response.get("source_code_uri"),
+        declared_license=version_api_response.get("licenses") or None,
+        download_url=version_api_response.get("gem_uri"),
+        repository_homepage_url=version_api_response.get("project_uri"),
+        **version_purl.to_dict(),
+    )
 
 
 @router.route("pkg:gnu/.*")
 def get_gnu_data_from_purl(purl):
     """Generate `Package` object from the `purl` string of gnu type"""
-    purl = PackageURL.from_string(purl)
+    purl = parse_purl(purl)
     source_archive_url = f"https://ftp.gnu.org/pub/gnu/{purl.name}/"
     version_regex_template = r"^({}-)(?P<version>[\w.-]*)(.tar.gz)$"
     version_regex = re.compile(version_regex_template.format(re.escape(purl.name)))
@@ -371,7 +553,7 @@ def get_gnu_data_from_purl(purl):
 
 @router.route("pkg:cocoapods/.*")
 def get_cocoapods_data_from_purl(purl):
-    purl = PackageURL.from_string(purl)
+    purl = parse_purl(purl)
     name = purl.name
     cocoapods_org_url = f"https://cocoapods.org/pods/{name}"
     api = "https://cdn.cocoapods.org"
@@ -793,15 +975,26 @@ DIR_LISTED_SOURCE_BY_PACKAGE_NAME = {
 @router.route(*DIR_SUPPORTED_PURLS)
 def get_htmllisting_data_from_purl(purl):
     """Generate `Package` object from the `purl` having directory listed source"""
-    package_url = PackageURL.from_string(purl)
+    package_url = parse_purl(purl)
     return DIR_LISTED_SOURCE_BY_PACKAGE_NAME[package_url.name].get_package_info(package_url)
 
 
+def fetch_listing(url):
+    """
+    Return a tuple of (cwd, listing) parsed from the HTML directory listing at `url`
+    like ``htmllistparse.fetch_listing`` but using the memoized fetchcode transport.
+    """
+    response = memo.get(url)
+    response.raise_for_status()
+    soup = bs4.BeautifulSoup(response.content, "html5lib")
+    return htmllistparse.parse(soup)
+
+
 def get_packages_from_listing(purl, source_archive_url, regex, ignored_files_and_dir):
     """
     Return list of package data from a directory listing based on the specified regex.
     """
-    _, listing = htmllistparse.fetch_listing(source_archive_url)
+    _, listing = fetch_listing(source_archive_url)
 
     packages = []
     for file in listing:
@@ -859,7 +1052,7 @@ def extract_package_from_nested_listing(purl, source_url, regex, ignored_files_a
     """
     Yield package data from a nested directory listing for the given source_url.
     """
-    _, listing = htmllistparse.fetch_listing(source_url)
+    _, listing = fetch_listing(source_url)
     for directory in listing:
         if not directory.name.endswith("/") or directory.name in ignored_files_and_dir:
             continue
@@ -21,8 +21,10 @@ from pathlib import Path
 
 import attr
 
+from fetchcode import transport
 from fetchcode import utils
 from fetchcode.packagedcode_models import Package
+from fetchcode.routing import get_literal_prefix
 
 DATA = Path(__file__).parent / "data"
 
@@ -47,6 +49,10 @@ class GitHubSource:
         default=None,
         metadata={"help_text": "Regex to ignore tag."},
     )
+    tag_templates: list = dataclasses.field(
+        default=None,
+        metadata={"help_text": "Templates of the tag names of a version with a {version} field."},
+    )
 
     @classmethod
     def get_default_package(cls, purl):
@@ -55,7 +61,9 @@ class GitHubSource:
         namespace = purl.namespace
         base_path = "https://api.github.com/repos"
         api_url = f"{base_path}/{namespace}/{name}"
-        response = utils.get_github_rest(api_url)
+        response = utils.get_github_repository(namespace, name)
+        if response is None:
+            raise Exception(f"Failed to fetch: {api_url}")
         homepage_url = response.get("homepage")
         vcs_url = response.get("git_url")
         github_url = "https://github.com"
@@ -82,13 +90,31 @@ class GitHubSource:
             cls.version_regex,
             cls.ignored_tag_regex,
             cls.get_default_package(package_url),
+            tag_templates=cls.tag_templates,
         )
 
 
-def get_github_packages(purl, version_regex, ignored_tag_regex, default_package):
+def get_github_packages(
+    purl, version_regex, ignored_tag_regex, default_package, tag_templates=None
+):
     """
     Yield package data from a directory listing for the given source_archive_url.
     """
+    if purl.version and not transport.is_offline():
+        # look up the tags that may be this version first
+        queries = get_tag_queries(purl.version, version_regex, tag_templates)
+        tags = utils.fetch_github_tags_by_name_gql(purl, queries)
+        # the full scan lists the tags by name: pick the same tag when several
+        # tags are this version, such as 1.0 and v1.0
+        tags = sorted(tags, key=lambda tag: tag[0])
+        packages = _get_github_packages(
+            purl, version_regex, ignored_tag_regex, default_package, tags=tags
+        )
+        for package in packages:
+            if package.version == purl.version:
+                yield package
+                return
+
     for package in _get_github_packages(purl, version_regex, ignored_tag_regex, default_package):
         # Don't yield all packages when a specific version is requested.
         if purl.version and package.version != purl.version:
@@ -102,12 +128,48 @@ def get_github_packages(purl, version_regex, ignored_tag_regex, default_package)
             break
 
 
-def _get_github_packages(purl, version_regex, ignored_tag_regex, default_package):
-    "Yield package for GitHub purl"
+# Templates of the tag names of a version for sources without tag templates.
+DEFAULT_TAG_TEMPLATES = ["v{version}", "{version}"]
+
+
+def get_tag_queries(version, version_regex=None, tag_templates=None):
+    """
+    Return a list of tag name queries to look up the Git tags of a `version`
+    from a list of `tag_templates` with a {version} field, or from the literal
+    prefix of an optional `version_regex` otherwise.
+
+    For example:
+    >>> get_tag_queries("1.1.1w", tag_templates=["OpenSSL_{version}", "openssl-{version}"])
+    ['OpenSSL_1.1.1w', 'OpenSSL_1_1_1w', 'openssl-1.1.1w', 'openssl-1_1_1w']
+    >>> get_tag_queries("17.0.1", re.compile(r"llvmorg-(?P<version>.+)"))
+    ['llvmorg-17.0.1', 'llvmorg-17_0_1', 'v17.0.1', 'v17_0_1', '17.0.1', '17_0_1']
+    >>> get_tag_queries("1.0")
+    ['v1.0', 'v1_0', '1.0', '1_0']
+    """
+    if not tag_templates:
+        prefix = version_regex and get_literal_prefix(version_regex.pattern) or ""
+        tag_templates = [prefix + "{version}"] if prefix else []
+        tag_templates += DEFAULT_TAG_TEMPLATES
+
+    variants = list(dict.fromkeys([version, version.replace(".", "_")]))
+    queries = [
+        template.format(version=variant) for template in tag_templates for variant in variants
+    ]
+    return list(dict.fromkeys(queries))
+
+
+def _get_github_packages(purl, version_regex, ignored_tag_regex, default_package, tags=None):
+    """
+    Yield package for GitHub purl from a `tags` list of (tag name, date) or
+    from all the tags of the repository.
+    """
     archive_download_url = "https://github.com/{org}/{name}/archive/refs/tags/{tag_name}.tar.gz"
 
+    if tags is None:
+        tags = utils.fetch_github_tags_gql(purl)
+
     package_dict = default_package.to_dict()
-    for tag, date in utils.fetch_github_tags_gql(purl):
+    for tag, date in tags:
         if ignored_tag_regex and ignored_tag_regex.match(tag):
             continue
 
@@ -146,6 +208,7 @@ def _get_github_packages(purl, version_regex, ignored_tag_regex, default_package
 class UBootGitHubSource(GitHubSource):
     version_regex = re.compile(r"(?P<version>v\d{4}\.\d{2})(?![\w.-])")
     ignored_tag_regex = None
+    tag_templates = ["v{version}"]
 
 
 class Genext2fsGitHubSource(GitHubSource):
@@ -161,6 +224,7 @@ class SquashfsToolsGitHubSource(GitHubSource):
 class PupnpGitHubSource(GitHubSource):
     version_regex = re.compile(r"\brelease-?(?P<version>(?:\d+(\.\d+){1,2}))\b")
     ignored_tag_regex = None
+    tag_templates = ["release-{version}", "release{version}"]
 
 
 class BrotliGitHubSource(GitHubSource):
@@ -176,16 +240,20 @@ class BpftoolGitHubSource(GitHubSource):
 class SqliteGitHubSource(GitHubSource):
     version_regex = re.compile(r"\bversion-?(?P<version>(?:\d+(\.\d+){1,2}))\b")
     ignored_tag_regex = None
+    tag_templates = ["version-{version}", "version{version}"]
 
 
 class LlvmGitHubSource(GitHubSource):
     version_regex = re.compile(r"llvmorg-(?P<version>.+)")
     ignored_tag_regex = None
+    tag_templates = ["llvmorg-{version}"]
 
 
 class RpmGitHubSource(GitHubSource):
     version_regex = re.compile(r"rpm-(?P<version>[^-]+(?:-(?!release).*)?|-release)")
     ignored_tag_regex = None
+    # a query matches the tag names starting with it, such as rpm-4.19.0-release
+    tag_templates = ["rpm-{version}"]
 
 
 GITHUB_SOURCE_BY_PACKAGE = {
@@ -211,6 +279,7 @@ GITHUB_SOURCE_BY_PACKAGE = {
 class OpenSSLGitHubSource(GitHubSource):
     version_regex = re.compile(r"(OpenSSL_|openssl-)(?P<version>.+)")
     ignored_tag_regex = None
+    tag_templates = ["OpenSSL_{version}", "openssl-{version}"]
 
     @classmethod
     def get_package_info(cls, gh_purl):
@@ -220,6 +289,7 @@ class OpenSSLGitHubSource(GitHubSource):
             cls.version_regex,
             cls.ignored_tag_regex,
             cls.get_default_package(gh_purl),
+            tag_templates=cls.tag_templates,
         )
 
         for package in packages:
@@ -244,6 +314,7 @@ class ErofsUtilsGitHubSource(GitHubSource):
             cls.version_regex,
             cls.ignored_tag_regex,
             cls.get_default_package(gh_purl),
+            tag_templates=cls.tag_templates,
         )
 
         for package in packages:
@@ -270,6 +341,7 @@ class MiniupnpPackagesGitHubSource(GitHubSource):
             cls.version_regex,
             cls.ignored_tag_regex,
             cls.get_default_package(gh_purl),
+            tag_templates=cls.tag_templates,
         )
 
         for package in packages:
@@ -321,13 +393,9 @@ def construct_cocoapods_package(
     primary_language = None
 
     if gh_repo_owner and gh_repo_name:
-        base_path = "https://api.github.com/repos"
-        api_url = f"{base_path}/{gh_repo_owner}/{gh_repo_name}"
-        gh_repo_api_response = utils.get_github_rest(api_url)
-        gh_repo_api_head_request = utils.make_head_request(api_url)
-        gh_repo_api_status_code = gh_repo_api_head_request.status_code
+        gh_repo_api_response = utils.get_github_repository(gh_repo_owner, gh_repo_name)
 
-        if gh_repo_api_status_code == 200:
+        if gh_repo_api_response:
             homepage_url = gh_repo_api_response.get("homepage")
             vcs_url = gh_repo_api_response.get("git_url")
             license_data = gh_repo_api_response.get("license") or {}
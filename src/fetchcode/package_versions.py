@@ -26,15 +26,20 @@ from urllib.parse import urlparse
 import requests
 import yaml
 from dateutil import parser as dateparser
-from packageurl import PackageURL
 from packageurl.contrib.route import NoRouteAvailable
-from packageurl.contrib.route import Router
 
+from fetchcode import memo
+from fetchcode.routing import PurlRouter
+from fetchcode.routing import parse_purl
 from fetchcode.utils import fetch_github_tags_gql
 
 logger = logging.getLogger(__name__)
 
-router = Router()
+router = PurlRouter()
+
+# Request the abbreviated npm metadata documents, also used by npm install,
+# with the versions and their dist data but without READMEs and release times.
+NPM_ABBREVIATED_HEADERS = {"Accept": "application/vnd.npm.install-v1+json"}
 
 SUPPORTED_ECOSYSTEMS = [
     "cargo",
@@ -52,11 +57,15 @@ SUPPORTED_ECOSYSTEMS = [
 ]
 
 
-def versions(purl):
-    """Return all version for a PURL."""
+def versions(purl, **kwargs):
+    """
+    Return all version for a PURL.
+    Extra `kwargs` are passed to the handler of the PURL type if it accepts
+    them, such as `release_dates=False` for npm, and ignored otherwise.
+    """
     if purl:
         try:
-            return router.process(purl)
+            return router.process_with_options(purl, **kwargs)
         except NoRouteAvailable:
             logger.error(f"Unsupported purl: {purl}")
             raise
@@ -76,7 +85,7 @@ class PackageVersion:
 @router.route("pkg:deb/ubuntu/.*")
 def get_launchpad_versions_from_purl(purl):
     """Fetch versions of Ubuntu debian packages from Launchpad."""
-    purl = PackageURL.from_string(purl)
+    purl = parse_purl(purl)
     url = (
         f"https://api.launchpad.net/1.0/ubuntu/+archive/primary?"
         f"ws.op=getPublishedSources&source_name={purl.name}&exact_match=true"
@@ -114,7 +123,7 @@ def get_launchpad_versions_from_purl(purl):
 @router.route("pkg:pypi/.*")
 def get_pypi_versions_from_purl(purl):
     """Fetch versions of Python pypi packages from the PyPI API."""
-    purl = PackageURL.from_string(purl)
+    purl = parse_purl(purl)
     response = get_response(url=f"https://pypi.org/pypi/{purl.name}/json")
     if not response:
         return
@@ -132,7 +141,7 @@ def get_pypi_versions_from_purl(purl):
 @router.route("pkg:cargo/.*")
 def get_cargo_versions_from_purl(purl):
     """Fetch versions of Rust cargo packages from the crates.io API."""
-    purl = PackageURL.from_string(purl)
+    purl = parse_purl(purl)
     url = f"https://crates.io/api/v1/crates/{purl.name}"
     response = get_response(url=url, content_type="json", headers={"User-Agent": "pm_bot"})
 
@@ -146,7 +155,7 @@ def get_cargo_versions_from_purl(purl):
 @router.route("pkg:gem/.*")
 def get_gem_versions_from_purl(purl):
     """Fetch versions of Rubygems packages from the rubygems API."""
-    purl = PackageURL.from_string(purl)
+    purl = parse_purl(purl)
     url = f"https://rubygems.org/api/v1/versions/{purl.name}.json"
     response = get_response(url=url, content_type="json")
     if not response:
@@ -169,11 +178,19 @@ def get_gem_versions_from_purl(purl):
 
 
 @router.route("pkg:npm/.*")
-def get_npm_versions_from_purl(purl):
-    """Fetch versions of npm packages from the npm registry API."""
-    purl = PackageURL.from_string(purl)
+def get_npm_versions_from_purl(purl, release_dates=True):
+    """
+    Fetch versions of npm packages from the npm registry API. Without
+    `release_dates`, fetch only the abbreviated metadata document which is
+    much smaller than the full document of popular packages but has no
+    release times.
+    """
+    purl = parse_purl(purl)
     url = get_npm_registry_url(purl)
-    response = get_response(url=url, content_type="json")
+    if release_dates:
+        response = get_response(url=url, content_type="json")
+    else:
+        response = get_response(url=url, content_type="json", headers=NPM_ABBREVIATED_HEADERS)
     if not response:
         logger.error(f"Failed to fetch {url}")
         return
@@ -188,7 +205,7 @@ def get_deb_versions_from_purl(purl):
     """
     Fetch versions of Debian debian packages from the sources.debian.org API.
     """
-    purl = PackageURL.from_string(purl)
+    purl = parse_purl(purl)
     # Need to set the headers, because the Debian API upgrades
     # the connection to HTTP 2.0
     response = get_response(
@@ -208,7 +225,7 @@ def get_deb_versions_from_purl(purl):
 @router.route("pkg:maven/.*")
 def get_maven_versions_from_purl(purl):
     """Fetch versions of Maven packages from Maven Central maven-metadata.xml data."""
-    purl = PackageURL.from_string(purl)
+    purl = parse_purl(purl)
     group_id = purl.namespace
     artifact_id = purl.name
     if not group_id:
@@ -225,7 +242,7 @@ def get_maven_versions_from_purl(purl):
 @router.route("pkg:nuget/.*")
 def get_nuget_versions_from_purl(purl):
     """Fetch versions of NuGet packages from the nuget.org API."""
-    purl = PackageURL.from_string(purl)
+    purl = parse_purl(purl)
     pkg = purl.name.lower()
     url = f"https://api.nuget.org/v3/registration5-semver1/{pkg}/index.json"
     resp = get_response(url=url)
@@ -236,7 +253,7 @@ def get_nuget_versions_from_purl(purl):
 @router.route("pkg:composer/.*")
 def get_composer_versions_from_purl(purl):
     """Fetch versions of PHP Composer packages from the packagist.org API."""
-    purl = PackageURL.from_string(purl)
+    purl = parse_purl(purl)
     if not purl.namespace:
         return
 
@@ -249,7 +266,7 @@ def get_composer_versions_from_purl(purl):
 @router.route("pkg:hex/.*")
 def get_hex_versions_from_purl(purl):
     """Fetch versions of Erlang packages from the hex API."""
-    purl = PackageURL.from_string(purl)
+    purl = parse_purl(purl)
     response = get_response(
         url=f"https://hex.pm/api/packages/{purl.name}",
         content_type="json",
@@ -264,7 +281,7 @@ def get_hex_versions_from_purl(purl):
 @router.route("pkg:conan/.*")
 def get_conan_versions_from_purl(purl):
     """Fetch versions of ``conan`` packages from the Conan API."""
-    purl = PackageURL.from_string(purl)
+    purl = parse_purl(purl)
     response = get_response(
         url=(
             "https://raw.githubusercontent.com/conan-io/conan-center-index/"
@@ -279,7 +296,7 @@ def get_conan_versions_from_purl(purl):
 @router.route("pkg:github/.*")
 def get_github_versions_from_purl(purl):
     """Fetch versions of ``github`` packages using GitHub REST API."""
-    purl = PackageURL.from_string(purl)
+    purl = parse_purl(purl)
 
     for version, date in fetch_github_tags_gql(purl):
         yield PackageVersion(value=version, release_date=date)
@@ -288,7 +305,7 @@ def get_github_versions_from_purl(purl):
 @router.route("pkg:golang/.*")
 def get_golang_versions_from_purl(purl):
     """Fetch versions of Go "golang" packages from the Go proxy API."""
-    purl = PackageURL.from_string(purl)
+    purl = parse_purl(purl)
     package_slug = f"{purl.namespace}/{purl.name}"
     # escape uppercase in module path
     escaped_pkg = escape_path(package_slug)
@@ -515,7 +532,7 @@ def get_response(url, content_type="json", headers=None):
     one of binary, text, yaml or json.
     """
     try:
-        resp = requests.get(url)
+        resp = memo.get(url, headers=headers)
         resp.raise_for_status()
     except requests.HTTPError as http_err:
         logger.error(f"Error while fetching {url!r}: {resp.status_code!r}")
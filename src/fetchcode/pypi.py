@@ -14,9 +14,8 @@
 # CONDITIONS OF ANY KIND, either express or implied. See the License for the
 # specific language governing permissions and limitations under the License.
 
-from packageurl import PackageURL
-
 from fetchcode import fetch_json_response
+from fetchcode.routing import parse_purl
 
 
 class Pypi:
@@ -38,7 +37,7 @@ class Pypi:
         Returns:
             The full JSON response from PyPI API.
         """
-        parsed_purl = PackageURL.from_string(purl)
+        parsed_purl = parse_purl(purl)
 
         if parsed_purl.version:
             api_url = f"{cls.base_url}/{parsed_purl.name}/{parsed_purl.version}/json"
@@ -0,0 +1,226 @@
+# fetchcode is a free software tool from nexB Inc. and others.
+# Visit https://github.com/aboutcode-org/fetchcode for support and download.
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and http://aboutcode.org
+#
+# This software is licensed under the Apache License version 2.0.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at:
+# http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+
+"""
+Fast routing of purl strings to their handlers.
+
+``packageurl.contrib.route.Router`` tries every route regex on each string.
+The PurlRouter indexes its routes by the literal purl type and name prefix of
+their pattern such that only the few routes that can match a purl are tried.
+"""
+
+import inspect
+from functools import lru_cache
+
+from packageurl import PackageURL
+from packageurl.contrib.route import MultipleRoutesDefined
+from packageurl.contrib.route import NoRouteAvailable
+from packageurl.contrib.route import Router
+
+# Maximum number of parsed purls kept by parse_purl.
+PURL_CACHE_SIZE = 10000
+
+REGEX_SPECIAL_CHARACTERS = set(".^$*+?{}[]\\|()")
+
+
+@lru_cache(maxsize=PURL_CACHE_SIZE)
+def _parse_purl_string(purl):
+    return PackageURL.from_string(purl)
+
+
+def parse_purl(purl):
+    """
+    Return a PackageURL parsed from a `purl` string, or `purl` itself if this
+    is already a PackageURL. Parsed purls are cached such that handlers of the
+    same purl do not parse it again.
+
+    For example:
+    >>> purl = parse_purl("pkg:pypi/django@5.0")
+    >>> purl.name, purl.version
+    ('django', '5.0')
+    >>> parse_purl(purl) is purl
+    True
+    >>> parse_purl("pkg:pypi/django@5.0") is purl
+    True
+    """
+    if isinstance(purl, PackageURL):
+        return purl
+    return _parse_purl_string(purl)
+
+
+def get_literal_prefix(pattern):
+    """
+    Return the literal prefix of a route regex `pattern`, i.e. the prefix that
+    every matched string starts with.
+
+    For example:
+    >>> get_literal_prefix("pkg:generic/busybox.*")
+    'pkg:generic/busybox'
+    >>> get_literal_prefix("pkg:npms?/.*")
+    'pkg:npm'
+    >>> get_literal_prefix("pkg:(npm|pypi)/.*")
+    ''
+    """
+    if "|" in pattern:
+        # an alternation may apply to the whole pattern
+        return ""
+
+    prefix = []
+    for character in pattern:
+        if character in REGEX_SPECIAL_CHARACTERS:
+            if character in "*?{" and prefix:
+                # the previous character is optional
+                prefix.pop()
+            break
+        prefix.append(character)
+    return "".join(prefix)
+
+
+def split_purl_prefix(string):
+    """
+    Return a tuple of (type, remainder) for a `string` starting with a purl
+    scheme and type or None.
+
+    For example:
+    >>> split_purl_prefix("pkg:generic/busybox@1.0")
+    ('generic', 'busybox@1.0')
+    >>> split_purl_prefix("pkg:generic")
+    >>> split_purl_prefix("https://example.com")
+    """
+    if not string.startswith("pkg:"):
+        return
+    purl_type, slash, remainder = string[4:].partition("/")
+    if slash:
+        return purl_type, remainder
+
+
+def get_accepted_options(endpoint, options):
+    """
+    Return a mapping of the `options` keyword arguments accepted by the
+    `endpoint` function.
+
+    For example:
+    >>> def endpoint(purl, details=True):
+    ...     pass
+    >>> get_accepted_options(endpoint, dict(details=False, release_dates=False))
+    {'details': False}
+    """
+    parameters = inspect.signature(endpoint).parameters.values()
+    if any(parameter.kind == parameter.VAR_KEYWORD for parameter in parameters):
+        return dict(options)
+    names = {parameter.name for parameter in parameters}
+    return {name: value for name, value in options.items() if name in names}
+
+
+class PurlRouter(Router):
+    """
+    A Router that indexes its routes by purl type and by the literal prefix of
+    the rest of their pattern, typically a name or a namespace. Routing a purl
+    tries only the routes of its type whose prefix matches, with the same
+    results as a Router.
+    """
+
+    def __init__(self, route_map=None):
+        super().__init__(route_map=route_map)
+        self._index = None
+
+    def append(self, pattern, endpoint):
+        super().append(pattern, endpoint)
+        self._index = None
+
+    def get_index(self):
+        """
+        Return a tuple of ({type: ({prefix: [(position, rule)]}, prefix lengths)},
+        [(position, rule)]) where the unindexed rules are routes without a
+        literal purl type.
+        """
+        index = self._index
+        if index is not None:
+            return index
+
+        rules_by_type = {}
+        unindexed = []
+        for position, rule in enumerate(self.route_map.values()):
+            type_and_prefix = split_purl_prefix(get_literal_prefix(rule.pattern))
+            if not type_and_prefix:
+                unindexed.append((position, rule))
+                continue
+            purl_type, prefix = type_and_prefix
+            rules_by_prefix = rules_by_type.setdefault(purl_type, {})
+            rules_by_prefix.setdefault(prefix, []).append((position, rule))
+
+        rules_by_type = {
+            purl_type: (rules_by_prefix, sorted({len(prefix) for prefix in rules_by_prefix}))
+            for purl_type, rules_by_prefix in rules_by_type.items()
+        }
+        index = self._index = rules_by_type, unindexed
+        return index
+
+    def get_candidates(self, string):
+        """
+        Return a list of the rules that may match `string` in route order.
+        """
+        rules_by_type, unindexed = self.get_index()
+        candidates = list(unindexed)
+
+        type_and_remainder = split_purl_prefix(string)
+        if type_and_remainder:
+            purl_type, remainder = type_and_remainder
+            rules_by_prefix, prefix_lengths = rules_by_type.get(purl_type, ({}, []))
+            for length in prefix_lengths:
+                if length > len(remainder):
+                    break
+                candidates.extend(rules_by_prefix.get(remainder[:length], []))
+
+        return [rule for _position, rule in sorted(candidates, key=lambda item: item[0])]
+
+    def resolve(self, string):
+        """
+        Return the endpoint function for a `string` purl. Raise a
+        NoRouteAvailable if no route matches or a MultipleRoutesDefined if more
+        than one route matches.
+        """
+        candidates = [rule for rule in self.get_candidates(string) if rule.match(string)]
+
+        if not candidates:
+            raise NoRouteAvailable(string)
+
+        if len(candidates) > 1:
+            pats = repr([r.pattern for r in candidates])
+            raise MultipleRoutesDefined(f"{string!r} matches multiple patterns {pats!r}")
+
+        return candidates[0].endpoint
+
+    def process(self, purl, *args, **kwargs):
+        """
+        Call the endpoint of a `purl` string or PackageURL with the purl
+        string and the extra `args` and `kwargs`.
+        """
+        if isinstance(purl, PackageURL):
+            purl = purl.to_string()
+        return super().process(purl, *args, **kwargs)
+
+    def process_with_options(self, purl, **options):
+        """
+        Call the endpoint of a `purl` string or PackageURL with the purl
+        string and the `options` keyword arguments that this endpoint accepts.
+        Other options are ignored such that an option of some purl types can be
+        passed for any purl.
+        """
+        if isinstance(purl, PackageURL):
+            purl = purl.to_string()
+        endpoint = self.resolve(purl)
+        return endpoint(purl, **get_accepted_options(endpoint, options))
@@ -0,0 +1,223 @@
+# fetchcode is a free software tool from nexB Inc. and others.
+# Visit https://github.com/aboutcode-org/fetchcode for support and download.
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and http://aboutcode.org
+#
+# This software is licensed under the Apache License version 2.0.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at:
+# http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+
+"""
+Shared HTTP transport used by all fetchcode modules.
+
+All HTTP requests go through a single ``requests.Session`` that keeps alive
+connections in per-host pools such that successive requests to the same host
+reuse the same TCP and TLS connection. A default timeout is applied to every
+request that does not provide its own.
+"""
+
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Default (connect, read) timeout in seconds of every request.
+DEFAULT_TIMEOUT = (10, 60)
+
+# Number of per-host connection pools kept alive.
+DEFAULT_POOL_CONNECTIONS = 32
+
+# Maximum number of connections kept alive in each per-host pool.
+DEFAULT_POOL_MAXSIZE = 16
+
+_settings = dict(
+    pool_connections=DEFAULT_POOL_CONNECTIONS,
+    pool_maxsize=DEFAULT_POOL_MAXSIZE,
+    timeout=DEFAULT_TIMEOUT,
+    max_retries=0,
+)
+
+_session = None
+_session_lock = threading.Lock()
+
+_metadata_cache = None
+
+# When offline, no network request is made and API and metadata documents are
+# served only from the metadata cache.
+_offline = os.environ.get("FETCHCODE_OFFLINE", "").lower() in ("1", "true", "yes")
+
+
+class OfflineError(Exception):
+    pass
+
+
+def set_offline(offline=True):
+    """
+    Enable or disable the `offline` mode. In offline mode, API and metadata
+    documents are served only from the metadata cache, downloads only from a
+    download cache, and an OfflineError is raised instead of making any
+    network request. The offline mode can also be enabled with a
+    FETCHCODE_OFFLINE=1 environment variable.
+    """
+    global _offline
+    _offline = offline
+
+
+def is_offline():
+    """
+    Return True if the offline mode is enabled.
+    """
+    return _offline
+
+
+def check_online(url):
+    """
+    Raise an OfflineError for a request on `url` in offline mode.
+    """
+    if _offline:
+        raise OfflineError(f"Cannot fetch {url} in offline mode: not cached.")
+
+
+def configure(pool_connections=None, pool_maxsize=None, timeout=None, max_retries=None):
+    """
+    Configure the shared transport with:
+    - `pool_connections`: the number of per-host connection pools to keep
+    - `pool_maxsize`: the maximum number of connections kept in each pool
+    - `timeout`: the default timeout in seconds, either a number or a
+      (connect, read) tuple
+    - `max_retries`: the number of retries of failed connections
+
+    Arguments left to None are unchanged. The current session is closed and
+    a new session is created on the next request.
+    """
+    global _session
+    settings = dict(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        timeout=timeout,
+        max_retries=max_retries,
+    )
+    with _session_lock:
+        _settings.update({key: value for key, value in settings.items() if value is not None})
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def create_session(pool_connections, pool_maxsize, max_retries=0):
+    """
+    Return a new ``requests.Session`` with connection pools of the provided sizes.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=max_retries,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session():
+    """
+    Return the ``requests.Session`` shared by all fetchcode modules.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session(
+                pool_connections=_settings["pool_connections"],
+                pool_maxsize=_settings["pool_maxsize"],
+                max_retries=_settings["max_retries"],
+            )
+        return _session
+
+
+def request(method, url, **kwargs):
+    """
+    Return a ``requests.Response`` for a `method` HTTP request on `url` sent
+    with the shared session. `kwargs` are passed to ``requests.Session.request``.
+    """
+    check_online(url)
+    kwargs.setdefault("timeout", _settings["timeout"])
+    return get_session().request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    """
+    Return a ``requests.Response`` for a GET request on `url`.
+    """
+    return request("GET", url, **kwargs)
+
+
+def head(url, **kwargs):
+    """
+    Return a ``requests.Response`` for a HEAD request on `url`.
+    Redirects are not followed unless `allow_redirects` is True.
+    """
+    kwargs.setdefault("allow_redirects", False)
+    return request("HEAD", url, **kwargs)
+
+
+def set_metadata_cache(metadata_cache):
+    """
+    Use the `metadata_cache` ``fetchcode.cache.MetadataCache`` for the API and
+    metadata requests made with `get_metadata`, or no cache if None.
+    """
+    global _metadata_cache
+    _metadata_cache = metadata_cache
+
+
+def get_metadata(url, headers=None):
+    """
+    Return a ``requests.Response`` for a GET request on an API or metadata
+    document `url` with `headers`, served from the metadata cache if one is set.
+    In offline mode, a cached document is served even if stale, or an
+    OfflineError is raised.
+    """
+    if _offline:
+        cached = _metadata_cache and _metadata_cache.get(url, headers=headers)
+        if not cached:
+            raise OfflineError(f"Cannot fetch {url} in offline mode: not cached.")
+        return cached
+
+    if _metadata_cache is not None:
+        return _metadata_cache.fetch(url, headers=headers, get=get)
+
+    if headers:
+        return get(url, headers=headers)
+    return get(url)
+
+
+def head_metadata(url, headers=None):
+    """
+    Return a ``requests.Response`` for a HEAD request on `url` with `headers`,
+    such as an existence check, stored in the metadata cache if one is set. In
+    offline mode, a cached response is served or an OfflineError is raised.
+    """
+    if _offline:
+        cached = _metadata_cache and _metadata_cache.get(url, headers=headers, method="HEAD")
+        if not cached:
+            raise OfflineError(f"Cannot fetch {url} in offline mode: not cached.")
+        return cached
+
+    response = head(url, headers=headers)
+    if _metadata_cache is not None:
+        _metadata_cache.add(url, response, headers=headers, method="HEAD")
+    return response
+
+
+def post(url, **kwargs):
+    """
+    Return a ``requests.Response`` for a POST request on `url`.
+    """
+    return request("POST", url, **kwargs)
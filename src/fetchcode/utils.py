@@ -14,37 +14,50 @@
 # CONDITIONS OF ANY KIND, either express or implied. See the License for the
 # specific language governing permissions and limitations under the License.
 
+import contextvars
 import hashlib
-import os
 import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 
 import requests
 from dateutil import parser as dateparser
 from dateutil.parser import ParserError
 
+from fetchcode import github_tokens
+from fetchcode import memo
+from fetchcode import transport
+
 
 def fetch_github_tags_gql(purl):
     """
     Yield PackageVersion for given github ``purl`` using the GitHub GQL API.
     """
     for node in fetch_github_tag_nodes(purl):
-        name = node["name"]
-        target = node["target"]
+        yield get_tag_name_and_date(node)
+
+
+def get_tag_name_and_date(node):
+    """
+    Return a tuple of (tag name, release date) for a GitHub GQL tag `node`.
+    """
+    name = node["name"]
+    target = node["target"]
 
-        # in case the tag is a signed tag, then the commit info is in target['target']
-        if "committedDate" not in target:
-            target = target["target"]
+    # in case the tag is a signed tag, then the commit info is in target['target']
+    if "committedDate" not in target:
+        target = target["target"]
 
-        committed_date = target.get("committedDate")
-        release_date = None
-        if committed_date:
-            try:
-                release_date = dateparser.parse(committed_date)
-            except ParserError as e:
-                pass
+    committed_date = target.get("committedDate")
+    release_date = None
+    if committed_date:
+        try:
+            release_date = dateparser.parse(committed_date)
+        except ParserError as e:
+            pass
 
-        yield name, release_date
+    return name, release_date
 
 
 GQL_QUERY = """
@@ -77,10 +90,32 @@ query getTags($name: String!, $owner: String!, $after: String)
 }"""
 
 
+# Query tags newest first, by the date of their commit, to sync only the new
+# tags of a repository.
+GQL_TAGS_BY_DATE_QUERY = GQL_QUERY.replace(
+    "first: 100, after: $after)",
+    "first: 100, after: $after, orderBy: {field: TAG_COMMIT_DATE, direction: DESC})",
+)
+
+_github_tag_cache = None
+
+
+def set_github_tag_cache(cache):
+    """
+    Set a `fetchcode.cache.TagCache` to sync the GitHub tags incrementally,
+    or None to fetch all the tags on each call.
+    """
+    global _github_tag_cache
+    _github_tag_cache = cache
+
+
 def fetch_github_tag_nodes(purl):
     """
     Yield node name/target mappings for Git tags of the ``purl``.
 
+    If a tag cache is set with `set_github_tag_cache`, the new tags are
+    synced in the cache and all the cached tags are yielded.
+
     Each node has this shape:
         {
         "name": "v2.6.24-rc5",
@@ -91,6 +126,11 @@ def fetch_github_tag_nodes(purl):
         }
         },
     """
+    tag_cache = _github_tag_cache
+    if tag_cache is not None:
+        yield from sync_github_tag_nodes(purl, tag_cache)
+        return
+
     variables = {
         "owner": purl.namespace,
         "name": purl.name,
@@ -114,6 +154,195 @@ def fetch_github_tag_nodes(purl):
         variables["after"] = page_info["endCursor"]
 
 
+def sync_github_tag_nodes(purl, tag_cache):
+    """
+    Store the new Git tags of the ``purl`` GitHub repository in the
+    `tag_cache` TagCache and return a list of all its tag nodes.
+
+    The tags are fetched newest first and paging stops at the first page with
+    an already known tag. A new tag of an old commit may therefore be missed
+    until the repository is cleared from the cache and synced again.
+
+    In offline mode, the cached tag nodes of a synced repository are returned
+    without any request, or an OfflineError is raised.
+    """
+    repository = f"{purl.namespace}/{purl.name}"
+    synced = tag_cache.is_synced(repository)
+    if transport.is_offline():
+        if not synced:
+            raise transport.OfflineError(
+                f"Cannot fetch the tags of {repository} in offline mode: not cached."
+            )
+        return tag_cache.get_nodes(repository)
+
+    known_names = tag_cache.get_names(repository) if synced else set()
+
+    variables = {
+        "owner": purl.namespace,
+        "name": purl.name,
+    }
+    graphql_query = {
+        "query": GQL_TAGS_BY_DATE_QUERY,
+        "variables": variables,
+    }
+
+    new_nodes = []
+    while True:
+        response = github_response(graphql_query)
+        refs = response["data"]["repository"]["refs"]
+        nodes = refs["nodes"]
+        page_new_nodes = [node for node in nodes if node["name"] not in known_names]
+        new_nodes.extend(page_new_nodes)
+
+        if synced and len(page_new_nodes) < len(nodes):
+            # reached the known tags
+            break
+
+        page_info = refs["pageInfo"]
+        if not page_info["hasNextPage"]:
+            break
+        variables["after"] = page_info["endCursor"]
+
+    tag_cache.add_nodes(repository, new_nodes)
+    return tag_cache.get_nodes(repository)
+
+
+# Maximum number of repositories queried in a single batched GQL request.
+GQL_BATCH_SIZE = 25
+
+GQL_TAGS_FRAGMENT = """
+fragment tags on RefConnection {
+    totalCount
+    pageInfo {
+        endCursor
+        hasNextPage
+    }
+    nodes {
+        name
+        target {
+            ... on Commit {
+                committedDate
+            }
+            ... on Tag {
+                target {
+                    ... on Commit {
+                        committedDate
+                    }
+                }
+            }
+        }
+    }
+}"""
+
+
+def get_batched_tags_query(repositories):
+    """
+    Return a GQL query mapping to fetch a page of tags of each of the
+    `repositories` list of (owner, name, after cursor) tuples, using one
+    repository alias per repository.
+    """
+    parameters = []
+    aliases = []
+    variables = {}
+    for index, (owner, name, after) in enumerate(repositories):
+        parameters.append(f"$owner{index}: String!, $name{index}: String!, $after{index}: String")
+        aliases.append(
+            f"    repo{index}: repository(owner: $owner{index}, name: $name{index}) {{\n"
+            f'        refs(refPrefix: "refs/tags/", first: 100, after: $after{index}) '
+            "{ ...tags }\n"
+            "    }"
+        )
+        variables.update({f"owner{index}": owner, f"name{index}": name, f"after{index}": after})
+
+    query = f"query getTags({', '.join(parameters)}) {{\n" + "\n".join(aliases) + "\n}"
+    return {"query": query + GQL_TAGS_FRAGMENT, "variables": variables}
+
+
+def fetch_github_tags_by_name_gql(purl, queries):
+    """
+    Return a list of (tag name, release date) for the Git tags of the
+    ``purl`` with a name matching any of the `queries` strings, fetched with
+    a single GitHub GQL request.
+    """
+    parameters = ["$owner: String!", "$name: String!"]
+    aliases = []
+    variables = {"owner": purl.namespace, "name": purl.name}
+    for index, query in enumerate(queries):
+        parameters.append(f"$query{index}: String!")
+        aliases.append(
+            f"        query{index}: "
+            f'refs(refPrefix: "refs/tags/", first: 100, query: $query{index}) {{ ...tags }}'
+        )
+        variables[f"query{index}"] = query
+
+    aliases = "\n".join(aliases)
+    query = (
+        f"query getTagsByName({', '.join(parameters)}) {{\n"
+        "    repository(owner: $owner, name: $name) {\n"
+        f"{aliases}\n"
+        "    }\n"
+        "}"
+    )
+    response = github_response({"query": query + GQL_TAGS_FRAGMENT, "variables": variables})
+    repository = response["data"]["repository"] or {}
+
+    tags = {}
+    for index in range(len(queries)):
+        refs = repository.get(f"query{index}") or {}
+        for node in refs.get("nodes") or []:
+            tags[node["name"]] = get_tag_name_and_date(node)
+    return list(tags.values())
+
+
+def fetch_github_tag_nodes_batch(purls, batch_size=GQL_BATCH_SIZE):
+    """
+    Return a mapping of {(namespace, name): [tag nodes]} for the GitHub
+    repositories of the ``purls``, with the tag nodes of
+    `fetch_github_tag_nodes`. The first page of tags of up to `batch_size`
+    repositories is fetched with a single GQL request, then only the
+    repositories with more tags are fetched again. A repository that does not
+    exist has no tags.
+    """
+    nodes_by_repository = {(purl.namespace, purl.name): [] for purl in purls}
+    cursors = {repository: None for repository in nodes_by_repository}
+
+    while cursors:
+        batch = list(cursors)[:batch_size]
+        graphql_query = get_batched_tags_query(
+            [(owner, name, cursors[(owner, name)]) for owner, name in batch]
+        )
+        response = github_response(graphql_query, ignore_not_found=True)
+        data = response.get("data") or {}
+
+        for index, repository in enumerate(batch):
+            repository_data = data.get(f"repo{index}")
+            if not repository_data:
+                del cursors[repository]
+                continue
+
+            refs = repository_data["refs"]
+            nodes_by_repository[repository].extend(refs["nodes"])
+            page_info = refs["pageInfo"]
+            if page_info["hasNextPage"]:
+                cursors[repository] = page_info["endCursor"]
+            else:
+                del cursors[repository]
+
+    return nodes_by_repository
+
+
+def fetch_github_tags_gql_batch(purls, batch_size=GQL_BATCH_SIZE):
+    """
+    Return a mapping of {(namespace, name): [(tag name, release date)]} for
+    the GitHub repositories of the ``purls`` using batched GitHub GQL requests.
+    """
+    nodes_by_repository = fetch_github_tag_nodes_batch(purls, batch_size=batch_size)
+    return {
+        repository: [get_tag_name_and_date(node) for node in nodes]
+        for repository, nodes in nodes_by_repository.items()
+    }
+
+
 class GitHubTokenError(Exception):
     pass
 
@@ -123,35 +352,42 @@ class GraphQLError(Exception):
 
 
 def get_github_token():
-    gh_token = os.environ.get("GH_TOKEN", None)
-    if not gh_token:
-        from dotenv import load_dotenv
-
-        load_dotenv()
-        gh_token = os.environ.get("GH_TOKEN", None)
-    return gh_token
+    """
+    Return the GitHub API token with the most remaining REST API requests or
+    None. The token is not reserved: requests sent with
+    `GitHubTokenPool.request` are scheduled by the pool instead.
+    """
+    return github_tokens.get_pool().get_token("core")
 
 
-def github_response(graphql_query):
-    gh_token = get_github_token()
+def github_response(graphql_query, ignore_not_found=False):
+    pool = github_tokens.get_pool()
 
-    if not gh_token:
+    if not pool.tokens:
         msg = (
             "GitHub API Token Not Set\n"
             "Set your GitHub token in the GH_TOKEN environment variable."
         )
         raise GitHubTokenError(msg)
 
-    headers = {"Authorization": f"bearer {gh_token}"}
-
     endpoint = "https://api.github.com/graphql"
-    response = requests.post(endpoint, headers=headers, json=graphql_query).json()
+
+    def send(gh_token):
+        headers = {"Authorization": f"bearer {gh_token}"}
+        return transport.post(endpoint, headers=headers, json=graphql_query)
+
+    response = pool.request(
+        send, resource="graphql", is_limited=github_tokens.is_graphql_rate_limited
+    ).json()
 
     message = response.get("message")
     if message and message == "Bad credentials":
         raise GitHubTokenError(f"Invalid GitHub token: {message}")
 
     errors = response.get("errors")
+    if ignore_not_found and errors:
+        # missing repositories of a batched query have a null value
+        errors = [error for error in errors if error.get("type") != "NOT_FOUND"]
     if errors:
         raise GraphQLError(errors)
 
@@ -159,26 +395,69 @@ def github_response(graphql_query):
 
 
 def get_github_rest(url):
-    headers = None
-    gh_token = get_github_token()
-    if gh_token:
-        headers = {
-            "Authorization": f"Bearer {gh_token}",
-        }
+    def send(gh_token):
+        headers = None
+        if gh_token:
+            headers = {
+                "Authorization": f"Bearer {gh_token}",
+            }
+        return memo.get(url, headers=headers)
+
+    resp = github_tokens.get_pool().request(send, resource="core")
+    if resp.status_code == 200:
+        return resp.json()
+
+    raise Exception(f"Failed to fetch: {url}")
+
 
-    return get_response(url, headers)
+def get_github_repository(owner, name):
+    """
+    Return the metadata mapping of the ``owner``/``name`` GitHub repository
+    from the GitHub REST API or None if the repository does not exist.
+
+    The request is memoized and served from the metadata cache if one is set,
+    where it is revalidated with its ETag.
+    """
+    api_url = f"https://api.github.com/repos/{owner}/{name}"
+
+    def send(gh_token):
+        headers = None
+        if gh_token:
+            headers = {"Authorization": f"Bearer {gh_token}"}
+        return memo.get(api_url, headers=headers)
+
+    resp = github_tokens.get_pool().request(send, resource="core")
+    if resp.status_code == 200:
+        return resp.json()
+    if resp.status_code == 404:
+        return
+
+    raise Exception(f"Failed to fetch: {api_url}")
 
 
 def get_response(url, headers=None):
-    resp = requests.get(url, headers=headers)
+    resp = memo.get(url, headers=headers)
     if resp.status_code == 200:
         return resp.json()
 
     raise Exception(f"Failed to fetch: {url}")
 
 
+def get_response_if_exists(url, headers=None):
+    """
+    Return the JSON content of `url` or None if `url` does not exist.
+    """
+    resp = memo.get(url, headers=headers)
+    if resp.status_code == 200:
+        return resp.json()
+    if resp.status_code == 404:
+        return
+
+    raise Exception(f"Failed to fetch: {url}")
+
+
 def get_text_response(url, headers=None):
-    resp = requests.get(url, headers=headers)
+    resp = memo.get(url, headers=headers)
     if resp.status_code == 200:
         return resp.text
 
@@ -187,8 +466,10 @@ def get_text_response(url, headers=None):
 
 def make_head_request(url, headers=None):
     try:
-        resp = requests.head(url, headers=headers)
+        resp = transport.head_metadata(url, headers=headers)
         return resp
+    except transport.OfflineError:
+        raise
     except requests.RequestException:
         raise Exception(f"Failed to fetch: {url}")
 
@@ -226,6 +507,46 @@ else:
     md5_hasher = hashlib.md5
 
 
+# Checksums computed for fetched content
+CHECKSUM_ALGORITHMS = ("md5", "sha1", "sha256", "sha512")
+
+
+def get_hasher(algorithm):
+    """
+    Return a new hashlib hash object for an `algorithm` name such as "sha256".
+    """
+    if algorithm == "md5":
+        return md5_hasher()
+    return hashlib.new(algorithm)
+
+
+class MultiHasher:
+    """
+    Compute the checksums of a content with several algorithms in a single pass.
+    """
+
+    def __init__(self, algorithms=CHECKSUM_ALGORITHMS):
+        self.hashers = {algorithm: get_hasher(algorithm) for algorithm in algorithms}
+
+    def update(self, data):
+        for hasher in self.hashers.values():
+            hasher.update(data)
+
+    def update_from_file(self, location, chunk_size=1024 * 1024):
+        """
+        Update the checksums with the content of the file at `location`.
+        """
+        with open(location, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                self.update(chunk)
+
+    def hexdigests(self):
+        """
+        Return a mapping of {algorithm: hex digest}.
+        """
+        return {algorithm: hasher.hexdigest() for algorithm, hasher in self.hashers.items()}
+
+
 def get_podname_proper(podname):
     """
     Podnames in cocoapods sometimes are files inside a pods package (like 'OHHTTPStubs/Default')
@@ -245,12 +566,123 @@ def get_first_three_md5_hash_characters(podname):
     return md5_hasher(podname.encode("utf-8")).hexdigest()[0:3]
 
 
+# Number of seconds an existence check result is cached by _http_exists.
+EXISTS_CACHE_TTL = 600
+
+# Number of seconds a missing URL is cached by _http_exists.
+EXISTS_NEGATIVE_CACHE_TTL = 120
+
+# Maximum number of existence check results cached by _http_exists.
+EXISTS_CACHE_SIZE = 4096
+
+_exists_memo = memo.Memo(max_size=EXISTS_CACHE_SIZE, ttl=EXISTS_CACHE_TTL)
+
+
+def clear_exists_cache():
+    """
+    Clear the existence check results cached by _http_exists.
+    """
+    _exists_memo.clear()
+
+
 def _http_exists(url: str) -> bool:
     """
     Lightweight existence check using a ranged GET so CDNs/servers that ignore HEAD still work.
+
+    Results are cached for EXISTS_CACHE_TTL seconds, or EXISTS_NEGATIVE_CACHE_TTL
+    seconds for a missing URL, keeping at most EXISTS_CACHE_SIZE recently used
+    results. Failed requests are not cached. Raise an OfflineError in offline
+    mode if the result is not cached.
+    """
+    exists = _exists_memo.get_or_compute(
+        url,
+        partial(check_exists, url),
+        keep=lambda exists: exists is not None,
+        get_ttl=lambda exists: EXISTS_CACHE_TTL if exists else EXISTS_NEGATIVE_CACHE_TTL,
+    )
+    return bool(exists)
+
+
+def check_exists(url):
+    """
+    Return True if `url` exists, False if it does not exist or None if the
+    request failed.
     """
     try:
         resp = make_head_request(url, headers={"Range": "bytes=0-0"})
-        return resp is not None and resp.status_code in (200, 206)
+    except transport.OfflineError:
+        raise
     except Exception:
-        return False
+        return
+
+    return resp is not None and resp.status_code in (200, 206)
+
+
+def get_first_result(functions):
+    """
+    Call each of the `functions` callables concurrently and return the first
+    non-empty result in the order of `functions`, or None. Return as soon as
+    this result is known without waiting for the later functions. An exception
+    raised by a function is raised if all the previous functions returned an
+    empty result.
+
+    For example:
+    >>> get_first_result([lambda: None, lambda: "b", lambda: "c"])
+    'b'
+    >>> get_first_result([lambda: None])
+    """
+    functions = list(functions)
+    if not functions:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=len(functions))
+    try:
+        # run in copies of the current context to share its request scope memo
+        futures = [
+            executor.submit(contextvars.copy_context().run, function) for function in functions
+        ]
+        for future in futures:
+            result = future.result()
+            if result:
+                return result
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def map_ordered(function, items, max_workers=8):
+    """
+    Yield the results of calling `function` on each of the `items`, with up
+    to `max_workers` calls running concurrently. Results are yielded in the
+    order of `items` as soon as they are available. An exception raised by a
+    call is raised when its result is due.
+
+    For example:
+    >>> list(map_ordered(lambda x: x * 2, [1, 2, 3], max_workers=2))
+    [2, 4, 6]
+    """
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        pending = deque()
+        for item in items:
+            # run in copies of the current context to share its request scope memo
+            pending.append(executor.submit(contextvars.copy_context().run, function, item))
+            # keep a bounded number of calls queued ahead of the yielded results
+            if len(pending) >= max_workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_first_existing_url(urls, exists=_http_exists):
+    """
+    Return the first URL of a `urls` list that exists according to the
+    `exists` callable, checking all the URLs concurrently, or None.
+    """
+
+    def get_url_if_exists(url):
+        if exists(url):
+            return url
+
+    return get_first_result(partial(get_url_if_exists, url) for url in urls)
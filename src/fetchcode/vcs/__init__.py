@@ -16,7 +16,6 @@
 
 import os
 import shutil
-import tempfile
 from urllib.parse import urlparse
 
 from fetchcode.vcs.pip._internal.utils import misc
@@ -25,6 +24,7 @@ from fetchcode.vcs.pip._internal.vcs.bazaar import Bazaar
 from fetchcode.vcs.pip._internal.vcs.git import Git
 from fetchcode.vcs.pip._internal.vcs.mercurial import Mercurial
 from fetchcode.vcs.pip._internal.vcs.subversion import Subversion
+from fetchcode.workspace import get_workspace
 
 
 class VCSResponse:
@@ -33,18 +33,33 @@ class VCSResponse:
     - `dest_dir`: destination of directory
     - `vcs_type`: VCS Type of URL (git,bzr,hg,svn)
     - `domain` : Source of git VCS (GitHub, Gitlab, Bitbucket)
+    - `workspace` and `workspace_entry`: the Workspace and entry directory
+      containing `dest_dir`, released on delete, if any
     """
 
-    def __init__(self, dest_dir, vcs_type, domain):
+    def __init__(self, dest_dir, vcs_type, domain, workspace=None, workspace_entry=None):
         self.dest_dir = dest_dir
         self.vcs_type = vcs_type
         self.domain = domain
+        self.workspace = workspace
+        self.workspace_entry = workspace_entry
+
+    def __enter__(self):
+        if self.workspace_entry:
+            self.workspace.pin(self.workspace_entry)
+        return self
+
+    def __exit__(self, *args):
+        self.delete()
 
     def delete(self):
         """
         Delete the temporary directory.
         """
-        if os.path.isdir(self.dest_dir):
+        if self.workspace_entry:
+            self.workspace.release(self.workspace_entry)
+            self.workspace_entry = None
+        elif os.path.isdir(self.dest_dir):
             shutil.rmtree(path=self.dest_dir)
 
 
@@ -56,7 +71,6 @@ def fetch_via_vcs(url):
     parsed_url = urlparse(url)
     scheme = parsed_url.scheme
     domain = parsed_url.netloc
-    dest_dir = os.path.join(tempfile.mkdtemp(), "checkout")
     if scheme not in vcs.all_schemes:
         raise Exception("Not a supported/known scheme.")
 
@@ -64,7 +78,21 @@ def fetch_via_vcs(url):
         if scheme in vcs_backend.schemes:
             vcs_type = vcs_name
 
-    backend = vcs.get_backend_for_scheme(scheme)
-    backend.obtain(dest=dest_dir, url=misc.hide_url(url), verbosity=1)
+    workspace = get_workspace()
+    workspace_entry = workspace.make_entry()
+    dest_dir = os.path.join(workspace_entry, "checkout")
+    try:
+        backend = vcs.get_backend_for_scheme(scheme)
+        backend.obtain(dest=dest_dir, url=misc.hide_url(url), verbosity=1)
+    except BaseException:
+        workspace.release(workspace_entry)
+        raise
 
-    return VCSResponse(dest_dir=dest_dir, vcs_type=vcs_type, domain=domain)
+    workspace.unpin(workspace_entry)
+    return VCSResponse(
+        dest_dir=dest_dir,
+        vcs_type=vcs_type,
+        domain=domain,
+        workspace=workspace,
+        workspace_entry=workspace_entry,
+    )
@@ -15,25 +15,37 @@
 # specific language governing permissions and limitations under the License.
 
 import os
-import tempfile
 from urllib.parse import urlparse
 
 from fetchcode.vcs import VCSResponse
 from fetchcode.vcs.pip._internal.utils import misc
 from fetchcode.vcs.pip._internal.vcs import vcs
 from fetchcode.vcs.pip._internal.vcs.git import Git
+from fetchcode.workspace import get_workspace
 
 
 def fetch_via_git(url):
     parsed_url = urlparse(url)
     scheme = parsed_url.scheme
     domain = parsed_url.netloc
-    temp = tempfile.mkdtemp()
-    os.rmdir(temp)
     if scheme not in Git.schemes:
         raise Exception("Not a Git based scheme.")
 
-    backend = vcs.get_backend(name="git")
-    backend.obtain(dest=temp, url=misc.hide_url(url))
+    workspace = get_workspace()
+    workspace_entry = workspace.make_entry()
+    dest_dir = os.path.join(workspace_entry, "checkout")
+    try:
+        backend = vcs.get_backend(name="git")
+        backend.obtain(dest=dest_dir, url=misc.hide_url(url))
+    except BaseException:
+        workspace.release(workspace_entry)
+        raise
 
-    return VCSResponse(dest_dir=temp, vcs_type="git", domain=domain)
+    workspace.unpin(workspace_entry)
+    return VCSResponse(
+        dest_dir=dest_dir,
+        vcs_type="git",
+        domain=domain,
+        workspace=workspace,
+        workspace_entry=workspace_entry,
+    )
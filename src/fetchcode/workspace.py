@@ -0,0 +1,307 @@
+# fetchcode is a free software tool from nexB Inc. and others.
+# Visit https://github.com/aboutcode-org/fetchcode for support and download.
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and http://aboutcode.org
+#
+# This software is licensed under the Apache License version 2.0.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at:
+# http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+
+"""
+Managed workspace for the files and checkouts fetched without an explicit
+location.
+
+Each fetch gets its own entry directory under the workspace root. An entry is
+removed when its `Response` or `VCSResponse` is deleted or closed as a context
+manager. An entry is pinned while it is being fetched and while its response
+is used as a context manager. When the total size of the workspace exceeds its
+quota, the least recently used entries that are not pinned are removed before
+a new entry is created, including the entries of responses that were never
+released.
+
+A workspace root can be shared by several processes: each entry has a lease
+file next to it with the id of the process that created it, whether it is
+pinned and its size once fetched. The quota cleanup reads the sizes from the
+leases instead of walking the entries, and removes the entries of a process
+that exited whether they are pinned or not.
+"""
+
+import json
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+
+# Default workspace root directory.
+DEFAULT_ROOT = os.path.join(tempfile.gettempdir(), "fetchcode")
+
+# Suffix of the lease file of an entry.
+LEASE_SUFFIX = ".lease"
+
+
+def get_tree_size(location):
+    """
+    Return the total size in bytes of the files under the `location` directory.
+    """
+    size = 0
+    for top, _dirs, files in os.walk(location):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(top, name)).st_size
+            except OSError:
+                pass
+    return size
+
+
+def is_process_alive(pid):
+    """
+    Return True if the process with a `pid` id is running.
+    """
+    if os.name == "nt":
+        # os.kill would terminate the process on Windows
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def remove_location(location):
+    """
+    Remove the file or directory at `location` if it exists.
+    """
+    if os.path.isdir(location):
+        shutil.rmtree(location, ignore_errors=True)
+    elif os.path.exists(location):
+        try:
+            os.remove(location)
+        except OSError:
+            pass
+
+
+class Workspace:
+    """
+    A directory of fetch entries with an optional `max_size` quota in bytes.
+    """
+
+    def __init__(self, root=DEFAULT_ROOT, max_size=None):
+        self.root = root
+        self.max_size = max_size
+        # mapping of {entry: number of pins} of the entries pinned by this process
+        self.pins = {}
+        self.lock = threading.Lock()
+
+    def make_entry(self):
+        """
+        Return the location of a new empty entry directory, pinned until
+        `unpin` is called, removing old entries first if the workspace is over
+        its quota.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        self.cleanup()
+        # write the lease before creating the entry such that the entry is
+        # never seen unpinned by the cleanup of another process
+        fd, lease = tempfile.mkstemp(dir=self.root, suffix=LEASE_SUFFIX)
+        with os.fdopen(fd, "w") as f:
+            json.dump(dict(pid=os.getpid(), pinned=True, size=None), f)
+        entry = lease[: -len(LEASE_SUFFIX)]
+        os.mkdir(entry)
+        with self.lock:
+            self.pins[entry] = 1
+        return entry
+
+    def pin(self, entry):
+        """
+        Pin the `entry` directory such that it is not removed by the quota
+        cleanup and mark it as recently used. Raise a FileNotFoundError if the
+        entry was already removed.
+        """
+        with self.lock:
+            lease = self.read_lease(entry)
+            if not lease or not os.path.isdir(entry):
+                raise FileNotFoundError(f"Workspace entry was removed: {entry}")
+            self.pins[entry] = self.pins.get(entry, 0) + 1
+            if not lease["pinned"]:
+                lease.update(pid=os.getpid(), pinned=True)
+                self.write_lease(entry, lease)
+        self.touch(entry)
+
+    def unpin(self, entry):
+        """
+        Unpin the `entry` directory such that the quota cleanup can remove it.
+        The first time, record the size of the entry in its lease and remove
+        other entries if the workspace is over its quota.
+        """
+        with self.lock:
+            pins = self.pins.get(entry, 0) - 1
+            if pins > 0:
+                self.pins[entry] = pins
+                return
+            self.pins.pop(entry, None)
+            lease = self.read_lease(entry)
+        if not lease:
+            return
+
+        if lease["size"] is None:
+            lease["size"] = get_tree_size(entry)
+            self.write_lease(entry, lease)
+            self.cleanup()
+
+        with self.lock:
+            if entry not in self.pins:
+                lease.update(pid=os.getpid(), pinned=False)
+                self.write_lease(entry, lease)
+
+    def release(self, entry):
+        """
+        Remove the `entry` directory and its content.
+        """
+        with self.lock:
+            self.pins.pop(entry, None)
+        shutil.rmtree(entry, ignore_errors=True)
+        remove_location(entry + LEASE_SUFFIX)
+
+    def read_lease(self, entry):
+        """
+        Return the lease mapping of `entry` with its process id, pinned flag
+        and size, None if there is no lease or an empty mapping if the lease
+        is being written.
+        """
+        try:
+            with open(entry + LEASE_SUFFIX) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            return {}
+
+    def write_lease(self, entry, lease):
+        with open(entry + LEASE_SUFFIX, "w") as f:
+            json.dump(lease, f)
+
+    def is_pinned(self, lease):
+        """
+        Return True if an entry with a `lease` mapping is pinned by a running
+        process.
+        """
+        if lease is None:
+            return False
+        if not lease:
+            # a lease being written
+            return True
+        return lease["pinned"] and is_process_alive(lease["pid"])
+
+    def get_entries(self):
+        """
+        Return a list of the entry directory locations, least recently
+        used first.
+        """
+        entries = []
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return entries
+
+        for name in names:
+            if name.endswith(LEASE_SUFFIX):
+                continue
+            location = os.path.join(self.root, name)
+            try:
+                st = os.stat(location)
+            except OSError:
+                continue
+            if stat.S_ISDIR(st.st_mode):
+                entries.append((st.st_mtime, location))
+        return [location for _mtime, location in sorted(entries)]
+
+    def get_size(self):
+        """
+        Return the total size in bytes of the workspace entries.
+        """
+        return sum(get_tree_size(entry) for entry in self.get_entries())
+
+    def cleanup(self, max_size=None):
+        """
+        Remove the least recently used entries that are not pinned until the
+        workspace size is within `max_size` or within the workspace quota if
+        not provided.
+        """
+        max_size = self.max_size if max_size is None else max_size
+        if max_size is None:
+            return
+
+        entries = []
+        total_size = 0
+        for entry in self.get_entries():
+            lease = self.read_lease(entry)
+            pinned = self.is_pinned(lease)
+            size = lease and lease.get("size")
+            if size is None and pinned:
+                # an entry being fetched
+                size = 0
+            elif size is None:
+                # an entry left behind by a process that exited
+                size = get_tree_size(entry)
+                self.write_lease(entry, dict(pid=None, pinned=False, size=size))
+            total_size += size
+            entries.append((entry, pinned, size))
+
+        for entry, pinned, size in entries:
+            if total_size <= max_size:
+                break
+            if pinned:
+                continue
+            remove_location(entry)
+            remove_location(entry + LEASE_SUFFIX)
+            total_size -= size
+
+    def touch(self, entry):
+        """
+        Mark the `entry` directory as recently used.
+        """
+        now = time.time()
+        try:
+            os.utime(entry, (now, now))
+        except OSError:
+            pass
+
+
+_workspace = Workspace()
+_workspace_lock = threading.Lock()
+
+
+def configure(root=None, max_size=None):
+    """
+    Configure the workspace used by fetchcode for fetches without an explicit
+    location with:
+    - `root`: the workspace root directory such as a directory on a fast local
+      disk or a tmpfs
+    - `max_size`: the maximum total size in bytes of the workspace
+
+    Return the new Workspace. Entries of the previous workspace are kept until
+    released.
+    """
+    global _workspace
+    with _workspace_lock:
+        _workspace = Workspace(root=root or DEFAULT_ROOT, max_size=max_size)
+        return _workspace
+
+
+def get_workspace():
+    """
+    Return the Workspace used by fetchcode.
+    """
+    with _workspace_lock:
+        return _workspace
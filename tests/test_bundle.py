@@ -0,0 +1,150 @@
+# fetchcode is a free software tool from nexB Inc. and others.
+# Visit https://github.com/aboutcode-org/fetchcode for support and download.
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and http://aboutcode.org
+#
+# This software is licensed under the Apache License version 2.0.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at:
+# http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+
+import os
+from unittest import mock
+
+import pytest
+import requests
+
+from fetchcode import transport
+from fetchcode.bundle import Bundle
+from fetchcode.bundle import BundleError
+from fetchcode.bundle import export_bundle
+from fetchcode.bundle import import_bundle
+from fetchcode.cache import DownloadCache
+from fetchcode.cache import MetadataCache
+from fetchcode.cache import get_request_key
+
+
+def make_metadata_response(status_code, content=b"", headers=None):
+    response = mock.Mock(status_code=status_code, content=content)
+    response.headers = requests.structures.CaseInsensitiveDict(headers or {})
+    return response
+
+
+@pytest.fixture
+def warm_caches(tmp_path):
+    metadata_cache = MetadataCache(str(tmp_path / "warm" / "metadata.sqlite3"))
+    url = "https://pypi.org/pypi/fetchcode/json"
+    metadata_cache.store(
+        get_request_key(url),
+        url,
+        make_metadata_response(200, b'{"info": {}}' * 100, {"etag": '"abc"'}),
+        fetched_at=1000,
+    )
+    url = "https://pypi.org/pypi/missing/json"
+    metadata_cache.store(get_request_key(url), url, make_metadata_response(404))
+
+    download_cache = DownloadCache(str(tmp_path / "warm" / "downloads"))
+    archive = tmp_path / "fetchcode-0.1.tar.gz"
+    archive.write_bytes(os.urandom(5000))
+    download_cache.add(
+        url="https://example.com/fetchcode-0.1.tar.gz",
+        location=str(archive),
+        etag='"def"',
+        purl="pkg:pypi/fetchcode@0.1",
+    )
+    download_cache.add(url="https://mirror.example.com/fetchcode-0.1.tar.gz", location=str(archive))
+    return metadata_cache, download_cache, archive.read_bytes()
+
+
+def test_export_bundle_and_read_with_memory_map(tmp_path, warm_caches):
+    metadata_cache, download_cache, archive_content = warm_caches
+    location = str(tmp_path / "warm.bundle")
+
+    counts = export_bundle(location, metadata_cache, download_cache)
+
+    assert dict(responses=2, objects=1, urls=2, purls=1) == counts
+    with Bundle(location) as bundle:
+        response = bundle.get("https://pypi.org/pypi/fetchcode/json")
+        assert 200 == response.status_code
+        assert b'{"info": {}}' * 100 == response.content
+        assert '"abc"' == response.headers["ETag"]
+        assert 404 == bundle.get("https://pypi.org/pypi/missing/json").status_code
+        assert not bundle.get("https://pypi.org/pypi/other/json")
+
+        sha256 = bundle.urls["https://example.com/fetchcode-0.1.tar.gz"]["sha256"]
+        assert bundle.extract_object(sha256, str(tmp_path / "extracted"))
+        assert archive_content == (tmp_path / "extracted").read_bytes()
+
+
+def test_import_bundle_seeds_caches(tmp_path, warm_caches):
+    location = str(tmp_path / "warm.bundle")
+    export_bundle(location, *warm_caches[:2])
+    metadata_cache = MetadataCache(str(tmp_path / "cold" / "metadata.sqlite3"))
+    download_cache = DownloadCache(str(tmp_path / "cold" / "downloads"))
+
+    counts = import_bundle(location, metadata_cache, download_cache)
+
+    assert dict(responses=2, downloads=2, purls=1) == counts
+    url = "https://pypi.org/pypi/fetchcode/json"
+    assert b'{"info": {}}' * 100 == metadata_cache.get(url).content
+    assert 1000 == metadata_cache.get_row(get_request_key(url))["fetched_at"]
+
+    download = download_cache.get("https://mirror.example.com/fetchcode-0.1.tar.gz")
+    assert warm_caches[2] == open(download.location, "rb").read()
+    assert '"def"' == download_cache.get("https://example.com/fetchcode-0.1.tar.gz").etag
+    assert "https://example.com/fetchcode-0.1.tar.gz" == download_cache.get_purl_url(
+        "pkg:pypi/fetchcode@0.1"
+    )
+    assert {"index.sqlite3", "objects"} == set(os.listdir(download_cache.location))
+
+
+@mock.patch("fetchcode.transport.get")
+def test_bundle_as_metadata_cache(mock_get, tmp_path, warm_caches):
+    location = str(tmp_path / "warm.bundle")
+    export_bundle(location, metadata_cache=warm_caches[0])
+    mock_get.return_value = make_metadata_response(200, b"{}")
+
+    with Bundle(location) as bundle:
+        transport.set_metadata_cache(bundle)
+        try:
+            cached = transport.get_metadata("https://pypi.org/pypi/fetchcode/json")
+            fetched = transport.get_metadata("https://pypi.org/pypi/other/json")
+        finally:
+            transport.set_metadata_cache(None)
+
+    assert cached.from_cache
+    assert b"{}" == fetched.content
+    mock_get.assert_called_once_with("https://pypi.org/pypi/other/json")
+
+
+def test_import_bundle_rejects_corrupted_file(tmp_path, warm_caches):
+    location = tmp_path / "warm.bundle"
+    export_bundle(str(location), download_cache=warm_caches[1])
+    with Bundle(str(location)) as bundle:
+        [blob] = bundle.objects.values()
+    # tamper with the stored archive
+    data = bytearray(location.read_bytes())
+    data[blob["offset"]] ^= 0xFF
+    location.write_bytes(bytes(data))
+    download_cache = DownloadCache(str(tmp_path / "cold" / "downloads"))
+
+    with pytest.raises(BundleError):
+        import_bundle(str(location), download_cache=download_cache)
+
+    assert not download_cache.get("https://example.com/fetchcode-0.1.tar.gz")
+    stored_files = [files for _top, _dirs, files in os.walk(download_cache.location)]
+    assert ["index.sqlite3"] == sum(stored_files, [])
+
+
+def test_bundle_rejects_invalid_file(tmp_path):
+    location = tmp_path / "invalid.bundle"
+    location.write_bytes(b"not a bundle" * 10)
+
+    with pytest.raises(BundleError):
+        Bundle(str(location))
@@ -0,0 +1,285 @@
+# fetchcode is a free software tool from nexB Inc. and others.
+# Visit https://github.com/aboutcode-org/fetchcode for support and download.
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and http://aboutcode.org
+#
+# This software is licensed under the Apache License version 2.0.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at:
+# http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+
+import json
+import os
+from unittest import mock
+
+import pytest
+import requests
+
+from fetchcode import fetch
+from fetchcode import fetch_many
+from fetchcode import transport
+from fetchcode.cache import DownloadCache
+from fetchcode.cache import MetadataCache
+from fetchcode.utils import get_response
+
+
+def make_response(status_code, content=b"", headers=None):
+    response = mock.Mock(status_code=status_code)
+    response.headers = headers or {}
+    response.iter_content.return_value = [content] if content else []
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.HTTPError(f"{status_code} Error")
+    return response
+
+
+def test_download_cache_stores_identical_content_once(tmp_path):
+    cache = DownloadCache(tmp_path / "cache")
+    archive = tmp_path / "archive.tar.gz"
+    archive.write_bytes(b"content")
+
+    first = cache.add(url="https://example.com/a.tar.gz", location=archive, etag='"a"')
+    second = cache.add(url="https://mirror.example.com/a.tar.gz", location=archive)
+
+    assert first.sha256 == second.sha256
+    assert first.location == second.location
+    assert 7 == cache.get_size()
+    assert '"a"' == cache.get("https://example.com/a.tar.gz").etag
+    assert {"If-None-Match": '"a"'} == first.get_conditional_headers()
+
+
+def test_download_cache_evicts_least_recently_used(tmp_path):
+    cache = DownloadCache(tmp_path / "cache", max_size=10)
+    for name in ("a", "b", "c"):
+        archive = tmp_path / name
+        archive.write_bytes(name.encode() * 4)
+        cache.add(url=f"https://example.com/{name}", location=archive)
+        # make "a" the most recently used file
+        cache.get("https://example.com/a")
+
+    assert cache.get("https://example.com/a")
+    assert not cache.get("https://example.com/b")
+    assert cache.get("https://example.com/c")
+    assert 8 == cache.get_size()
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_with_cache_revalidates(mock_get, tmp_path):
+    cache = DownloadCache(tmp_path / "cache")
+    url = "https://example.com/archive.tar.gz"
+    mock_get.return_value = make_response(
+        200, b"content", {"etag": '"abc"', "content-type": "application/gzip"}
+    )
+
+    response = fetch(url, location=tmp_path / "first", cache=cache)
+    assert 7 == response.size
+    mock_get.assert_called_once_with(url, stream=True)
+
+    mock_get.return_value = make_response(304)
+    response = fetch(url, location=tmp_path / "second", cache=cache)
+
+    mock_get.assert_called_with(url, headers={"If-None-Match": '"abc"'}, stream=True)
+    assert b"content" == (tmp_path / "second").read_bytes()
+    assert 7 == response.size
+    assert "application/gzip" == response.content_type
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_with_cache_replaces_changed_content(mock_get, tmp_path):
+    cache = DownloadCache(tmp_path / "cache")
+    url = "https://example.com/archive.tar.gz"
+    mock_get.return_value = make_response(200, b"old", {"etag": '"old"'})
+    fetch(url, location=tmp_path / "first", cache=cache)
+
+    mock_get.return_value = make_response(200, b"new content", {"etag": '"new"'})
+    response = fetch(url, location=tmp_path / "second", cache=cache)
+
+    assert 11 == response.size
+    cached = cache.get(url)
+    assert '"new"' == cached.etag
+    with open(cached.location, "rb") as f:
+        assert b"new content" == f.read()
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_with_cache_does_not_share_files_with_locations(mock_get, tmp_path):
+    cache = DownloadCache(tmp_path / "cache")
+    location = tmp_path / "archive.tar.gz"
+    mock_get.return_value = make_response(200, b"content", {"etag": '"abc"'})
+    fetch("https://example.com/a.tar.gz", location=location, cache=cache)
+
+    mock_get.return_value = make_response(200, b"other")
+    fetch("https://example.com/b.tar.gz", location=location)
+
+    assert b"other" == location.read_bytes()
+    cached = cache.get("https://example.com/a.tar.gz")
+    with open(cached.location, "rb") as f:
+        assert b"content" == f.read()
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_with_cache_does_not_cache_errors(mock_get, tmp_path):
+    cache = DownloadCache(tmp_path / "cache")
+    url = "https://example.com/archive.tar.gz"
+    mock_get.return_value = make_response(404, b"<html>Not Found</html>", {"etag": '"abc"'})
+
+    with pytest.raises(requests.HTTPError):
+        fetch(url, location=tmp_path / "archive.tar.gz", cache=cache)
+
+    assert not cache.get(url)
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_with_cache_reuses_download_on_server_error(mock_get, tmp_path):
+    cache = DownloadCache(tmp_path / "cache")
+    url = "https://example.com/archive.tar.gz"
+    mock_get.return_value = make_response(200, b"content", {"etag": '"abc"'})
+    fetch(url, location=tmp_path / "first", cache=cache)
+
+    mock_get.return_value = make_response(503, b"<html>Unavailable</html>")
+    response = fetch(url, location=tmp_path / "second", cache=cache)
+
+    assert b"content" == (tmp_path / "second").read_bytes()
+    assert 7 == response.size
+    assert '"abc"' == cache.get(url).etag
+
+
+@mock.patch("fetchcode._http_exists")
+@mock.patch("fetchcode.transport.get")
+def test_fetch_purl_with_cache_reuses_resolved_url(mock_get, mock_http_exists, tmp_path):
+    cache = DownloadCache(tmp_path / "cache")
+    mock_http_exists.return_value = True
+    mock_get.return_value = make_response(200, b"content", {"etag": '"abc"'})
+
+    fetch("pkg:pub/http@0.13.3", location=tmp_path / "first", cache=cache)
+    assert 1 == mock_http_exists.call_count
+    assert "https://pub.dev/api/archives/http-0.13.3.tar.gz" == cache.get_purl_url(
+        "pkg:pub/http@0.13.3"
+    )
+
+    mock_get.return_value = make_response(304)
+    response = fetch("pkg:pub/http@0.13.3", location=tmp_path / "second", cache=cache)
+
+    assert 1 == mock_http_exists.call_count
+    assert "https://pub.dev/api/archives/http-0.13.3.tar.gz" == response.url
+    assert os.path.exists(tmp_path / "second")
+
+
+@mock.patch("fetchcode._http_exists")
+@mock.patch("fetchcode.transport.get")
+def test_fetch_many_purls_with_cache_reuses_resolved_url(mock_get, mock_http_exists, tmp_path):
+    cache = DownloadCache(tmp_path / "cache")
+    mock_http_exists.return_value = True
+    mock_get.return_value = make_response(200, b"content", {"etag": '"abc"'})
+    purl = "pkg:pub/http@0.13.3"
+
+    [result] = fetch_many([purl], cache=cache)
+    assert result.response
+    assert "https://pub.dev/api/archives/http-0.13.3.tar.gz" == cache.get_purl_url(purl)
+
+    mock_get.return_value = make_response(304)
+    [result] = fetch_many([purl], cache=cache)
+
+    assert result.response
+    assert 1 == mock_http_exists.call_count
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_with_cache_reuses_file_with_expected_sha256(mock_get, tmp_path):
+    cache = DownloadCache(tmp_path / "cache")
+    archive = tmp_path / "archive.tar.gz"
+    archive.write_bytes(b"abcdef")
+    sha256 = "bef57ec7f53a6d40beb640a780a639c83bc29ac8a9816f1fc6c5c6dcd93c4721"
+    cache.add(url="https://example.com/archive.tar.gz", location=archive)
+
+    response = fetch(
+        "https://mirror.example.com/archive.tar.gz",
+        location=tmp_path / "fetched",
+        cache=cache,
+        checksums={"sha256": sha256},
+    )
+
+    assert not mock_get.called
+    assert sha256 == response.sha256
+    assert b"abcdef" == (tmp_path / "fetched").read_bytes()
+
+
+def make_metadata_response(status_code, content=b"", headers=None):
+    response = mock.Mock(status_code=status_code, content=content)
+    response.headers = requests.structures.CaseInsensitiveDict(headers or {})
+    response.json.side_effect = lambda: json.loads(content)
+    return response
+
+
+@pytest.fixture
+def metadata_cache(tmp_path):
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite3"))
+    transport.set_metadata_cache(cache)
+    yield cache
+    transport.set_metadata_cache(None)
+
+
+@mock.patch("fetchcode.transport.get")
+def test_metadata_cache_revalidates_with_etag(mock_get, metadata_cache):
+    url = "https://pypi.org/pypi/django/json"
+    mock_get.return_value = make_metadata_response(200, b'{"a": 1}', {"ETag": '"v1"'})
+    assert {"a": 1} == get_response(url)
+    mock_get.assert_called_once_with(url)
+
+    mock_get.return_value = make_metadata_response(304)
+    assert {"a": 1} == get_response(url)
+    mock_get.assert_called_with(url, headers={"If-None-Match": '"v1"'})
+
+
+@mock.patch("fetchcode.transport.get")
+def test_metadata_cache_serves_fresh_documents_without_request(mock_get, metadata_cache):
+    metadata_cache.max_age = 60
+    mock_get.return_value = make_metadata_response(200, b"[]")
+
+    get_response("https://example.com/a.json")
+    get_response("https://example.com/a.json")
+
+    assert 1 == mock_get.call_count
+
+
+@mock.patch("fetchcode.transport.get")
+def test_metadata_cache_caches_missing_documents(mock_get, metadata_cache):
+    mock_get.return_value = make_metadata_response(404)
+
+    for _ in range(2):
+        with pytest.raises(Exception):
+            get_response("https://example.com/missing.json")
+
+    assert 1 == mock_get.call_count
+
+
+@mock.patch("fetchcode.transport.get")
+def test_metadata_cache_serves_stale_document_on_error(mock_get, metadata_cache):
+    url = "https://example.com/a.json"
+    mock_get.return_value = make_metadata_response(200, b'{"a": 1}')
+    get_response(url)
+
+    mock_get.return_value = make_metadata_response(503)
+    assert {"a": 1} == get_response(url)
+
+    mock_get.side_effect = requests.ConnectionError
+    assert {"a": 1} == get_response(url)
+
+
+def test_metadata_cache_is_shared_between_instances(tmp_path):
+    location = str(tmp_path / "metadata.sqlite3")
+    first = MetadataCache(location, max_age=60)
+    second = MetadataCache(location, max_age=60)
+    get = mock.Mock(return_value=make_metadata_response(200, b"content"))
+
+    first.fetch("https://example.com/a", get=get)
+    response = second.fetch("https://example.com/a", get=get)
+
+    assert b"content" == response.content
+    assert response.from_cache
+    assert 1 == get.call_count
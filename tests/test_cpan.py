@@ -14,6 +14,7 @@
 # CONDITIONS OF ANY KIND, either express or implied. See the License for the
 # specific language governing permissions and limitations under the License.
 
+import threading
 from unittest.mock import patch
 
 import pytest
@@ -39,7 +40,8 @@ def test_success_from_metacpan_api(valid_purl):
         result = get_download_url(valid_purl)
         assert result == expected_url
         mock_fetch.assert_called_once()
-        assert mock_exists.call_count == 2
+        # the author path candidates are checked concurrently with the API
+        assert mock_exists.call_count >= 2
 
 
 def test_fallback_to_author_path(valid_purl):
@@ -84,3 +86,20 @@ def test_neither_api_nor_fallback_works(valid_purl):
 
 def test_missing_name_or_version():
     assert get_download_url("pkg:cpan/EXAMPLE/Some-Module") is None
+
+
+def test_api_and_author_path_are_checked_concurrently(valid_purl):
+    api_url = "https://cpan.metacpan.org/authors/id/E/EX/EXAMPLE/Some-Module-1.2.3.tgz"
+    started = threading.Barrier(2, timeout=5)
+
+    def exists(url):
+        if url.startswith("https://fastapi.metacpan.org/") or url.endswith(".tar.gz"):
+            # wait for the API and the author path checks to run together
+            started.wait()
+        return True
+
+    with patch("fetchcode.cpan.fetch_json_response") as mock_fetch, patch(
+        "fetchcode.cpan._http_exists", side_effect=exists
+    ):
+        mock_fetch.return_value = {"download_url": api_url}
+        assert api_url == get_download_url(valid_purl)
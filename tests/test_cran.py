@@ -34,7 +34,7 @@ def test_current_url_exists(valid_purl):
     with patch("fetchcode.cran._http_exists", return_value=True) as mock_check:
         result = get_download_url(valid_purl)
         assert result == current_url
-        mock_check.assert_called_once_with(current_url)
+        mock_check.assert_any_call(current_url)
 
 
 def test_fallback_to_archive(valid_purl):
@@ -70,9 +70,7 @@ def test_version_with_dash():
     with patch("fetchcode.cran._http_exists", return_value=True) as mock_check:
         result = get_download_url(purl)
         assert result == "https://cran.r-project.org/src/contrib/somepkg_1.2-3.tar.gz"
-        mock_check.assert_called_once_with(
-            "https://cran.r-project.org/src/contrib/somepkg_1.2-3.tar.gz"
-        )
+        mock_check.assert_any_call("https://cran.r-project.org/src/contrib/somepkg_1.2-3.tar.gz")
 
 
 def test_name_with_dot():
@@ -81,6 +79,4 @@ def test_name_with_dot():
     with patch("fetchcode.cran._http_exists", return_value=True) as mock_check:
         result = get_download_url(purl)
         assert result == "https://cran.r-project.org/src/contrib/foo.bar_2.0.1.tar.gz"
-        mock_check.assert_called_once_with(
-            "https://cran.r-project.org/src/contrib/foo.bar_2.0.1.tar.gz"
-        )
+        mock_check.assert_any_call("https://cran.r-project.org/src/contrib/foo.bar_2.0.1.tar.gz")
@@ -31,7 +31,7 @@ def test_right_class_being_called_for_the_purls():
         "pkg:cran/dplyr@1.0.0",
     ]
 
-    with patch("fetchcode.download_urls.Router.process") as mock_fetch:
+    with patch("fetchcode.download_urls.PurlRouter.process") as mock_fetch:
         for purl in purls:
             assert download_url(purl) is not None, f"Failed for purl: {purl}"
 
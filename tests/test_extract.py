@@ -0,0 +1,113 @@
+# fetchcode is a free software tool from nexB Inc. and others.
+# Visit https://github.com/aboutcode-org/fetchcode for support and download.
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and http://aboutcode.org
+#
+# This software is licensed under the Apache License version 2.0.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at:
+# http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+
+import io
+import tarfile
+import zipfile
+from unittest import mock
+
+import pytest
+
+from fetchcode import ChecksumMismatchError
+from fetchcode.extract import UnsafeArchiveError
+from fetchcode.extract import fetch_and_extract
+
+
+def make_tar(members, mode="w:gz"):
+    content = io.BytesIO()
+    with tarfile.open(fileobj=content, mode=mode) as tar:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return content.getvalue()
+
+
+def make_zip(members):
+    content = io.BytesIO()
+    with zipfile.ZipFile(content, "w") as zip_file:
+        for name, data in members.items():
+            zip_file.writestr(name, data)
+    return content.getvalue()
+
+
+def mock_content(mock_get, content, chunk_size=100):
+    chunks = [content[i : i + chunk_size] for i in range(0, len(content), chunk_size)]
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.headers = {}
+    mock_get.return_value.iter_content.return_value = chunks
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_and_extract_tar_to_target(mock_get, tmp_path):
+    members = {"foo-1.0/setup.py": b"setup()", "foo-1.0/src/foo.py": b"x = 1\n" * 1000}
+    mock_content(mock_get, make_tar(members))
+
+    response = fetch_and_extract("https://example.com/foo-1.0.tar.gz", target=tmp_path)
+
+    assert b"setup()" == (tmp_path / "foo-1.0" / "setup.py").read_bytes()
+    assert b"x = 1\n" * 1000 == (tmp_path / "foo-1.0" / "src" / "foo.py").read_bytes()
+    assert tmp_path == response.location
+    assert response.sha256
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_and_extract_tar_to_callback(mock_get):
+    members = {"a.txt": b"a", "b.txt": b"b" * 5000}
+    mock_content(mock_get, make_tar(members, mode="w:xz"))
+    extracted = {}
+
+    def callback(name, fileobj):
+        extracted[name] = fileobj.read()
+
+    fetch_and_extract("https://example.com/foo.tar.xz", callback=callback)
+
+    assert members == extracted
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_and_extract_zip(mock_get, tmp_path):
+    members = {"foo/a.txt": b"a", "foo/b.txt": b"b"}
+    mock_content(mock_get, make_zip(members))
+
+    fetch_and_extract("https://example.com/foo.zip", target=tmp_path)
+
+    assert b"a" == (tmp_path / "foo" / "a.txt").read_bytes()
+    assert b"b" == (tmp_path / "foo" / "b.txt").read_bytes()
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_and_extract_rejects_unsafe_member(mock_get, tmp_path):
+    mock_content(mock_get, make_tar({"../evil.txt": b"evil"}))
+
+    with pytest.raises(UnsafeArchiveError):
+        fetch_and_extract("https://example.com/foo.tar.gz", target=tmp_path / "x")
+    assert not (tmp_path / "evil.txt").exists()
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_and_extract_checksum_mismatch(mock_get, tmp_path):
+    mock_content(mock_get, make_tar({"a.txt": b"a"}))
+
+    with pytest.raises(ChecksumMismatchError):
+        fetch_and_extract(
+            "https://example.com/foo.tar.gz", target=tmp_path, checksums={"sha256": "0" * 64}
+        )
+
+
+def test_fetch_and_extract_unknown_archive_type(tmp_path):
+    with pytest.raises(ValueError):
+        fetch_and_extract("https://example.com/foo.gem", target=tmp_path)
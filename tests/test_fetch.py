@@ -14,31 +14,399 @@
 # CONDITIONS OF ANY KIND, either express or implied. See the License for the
 # specific language governing permissions and limitations under the License.
 
+import io
+import json
+import threading
+import time
 from unittest import mock
 
 import pytest
+import requests
 
+from fetchcode import ChecksumMismatchError
+from fetchcode import MaxSizeExceeded
 from fetchcode import fetch
+from fetchcode import fetch_ftp
+from fetchcode import fetch_ftp_many
+from fetchcode import fetch_http
+from fetchcode import fetch_many
+from fetchcode import fetch_to_callback
+from fetchcode import fetch_to_file
+from fetchcode import fetch_to_memory
+from fetchcode import ftp_pool
 from fetchcode import resolve_purl
 from fetchcode import resolve_url_from_purl
+from fetchcode import utils
 
 
-@mock.patch("fetchcode.requests.get")
+@pytest.fixture(autouse=True)
+def close_ftp_pool():
+    ftp_pool.close()
+    yield
+    ftp_pool.close()
+
+
+@mock.patch("fetchcode.transport.get")
 def test_fetch_http_with_tempfile(mock_get):
+    mock_get.return_value.status_code = 200
     mock_get.return_value.headers = {
         "content-type": "image/png",
         "content-length": "1000999",
     }
+    mock_get.return_value.iter_content.return_value = [b"a" * 1000, b"b" * 999]
 
     with mock.patch("fetchcode.open", mock.mock_open()) as mocked_file:
         url = "https://raw.githubusercontent.com/TG1999/converge/master/assets/Group%2022.png"
         response = fetch(url=url)
         assert response is not None
-        assert 1000999 == response.size
+        assert 1999 == response.size
         assert url == response.url
         assert "image/png" == response.content_type
 
 
+@mock.patch("fetchcode.transport.get")
+def test_fetch_http_streams_content_in_chunks(mock_get, tmp_path):
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.headers = {"content-type": "application/gzip"}
+    mock_get.return_value.iter_content.return_value = [b"abc", b"de", b"f"]
+
+    location = tmp_path / "archive.tar.gz"
+    url = "https://example.com/archive.tar.gz"
+    response = fetch_http(url=url, location=location, chunk_size=3)
+
+    mock_get.assert_called_once_with(url, stream=True)
+    mock_get.return_value.iter_content.assert_called_once_with(chunk_size=3)
+    assert mock_get.return_value.close.called
+    assert 6 == response.size
+    assert b"abcdef" == location.read_bytes()
+
+
+def make_range_response(content, headers):
+    """
+    Return a mock streamed response for a GET request on `content` honoring the
+    Range header found in the request `headers`.
+    """
+    response = mock.Mock()
+    range_header = (headers or {}).get("Range")
+    if range_header:
+        start, end = range_header[len("bytes=") :].split("-")
+        content = content[int(start) : int(end) + 1]
+        response.status_code = 206
+    else:
+        response.status_code = 200
+    response.headers = {"content-type": "application/gzip"}
+    response.iter_content.return_value = [content[i : i + 2] for i in range(0, len(content), 2)]
+    return response
+
+
+@mock.patch("fetchcode.MIN_SEGMENT_SIZE", 4)
+@mock.patch("fetchcode.transport.get")
+@mock.patch("fetchcode.transport.head")
+def test_fetch_http_segmented(mock_head, mock_get, tmp_path):
+    content = b"0123456789abcdefghij"
+    url = "https://example.com/archive.tar.gz"
+    mock_head.return_value.status_code = 200
+    mock_head.return_value.url = url
+    mock_head.return_value.headers = {
+        "accept-ranges": "bytes",
+        "content-length": str(len(content)),
+        "content-type": "application/gzip",
+        "etag": '"abc"',
+    }
+    mock_get.side_effect = lambda url, headers=None, stream=False: make_range_response(
+        content, headers
+    )
+
+    location = tmp_path / "archive.tar.gz"
+    response = fetch_http(url=url, location=location, segments=3)
+
+    assert 3 == mock_get.call_count
+    requested_ranges = sorted(call.kwargs["headers"]["Range"] for call in mock_get.call_args_list)
+    assert ["bytes=0-6", "bytes=14-19", "bytes=7-13"] == requested_ranges
+    assert all(call.kwargs["headers"]["If-Range"] == '"abc"' for call in mock_get.call_args_list)
+    assert content == location.read_bytes()
+    assert len(content) == response.size
+    assert "application/gzip" == response.content_type
+
+
+@mock.patch("fetchcode.MIN_SEGMENT_SIZE", 4)
+@mock.patch("fetchcode.transport.get")
+@mock.patch("fetchcode.transport.head")
+def test_fetch_http_segmented_falls_back_to_single_stream(mock_head, mock_get, tmp_path):
+    content = b"0123456789abcdefghij"
+    url = "https://example.com/archive.tar.gz"
+    mock_head.return_value.status_code = 200
+    mock_head.return_value.headers = {"content-length": str(len(content))}
+    mock_get.side_effect = lambda url, headers=None, stream=False: make_range_response(
+        content, headers
+    )
+
+    location = tmp_path / "archive.tar.gz"
+    response = fetch_http(url=url, location=location, segments=3)
+
+    mock_get.assert_called_once_with(url, stream=True)
+    assert content == location.read_bytes()
+    assert len(content) == response.size
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_http_resume_interrupted_download(mock_get, tmp_path):
+    content = b"0123456789"
+    url = "https://example.com/archive.tar.gz"
+    location = tmp_path / "archive.tar.gz"
+
+    def interrupted_content(chunk_size):
+        yield content[:4]
+        raise ConnectionError("connection reset")
+
+    first = mock.Mock(status_code=200)
+    first.headers = {"content-length": "10", "etag": '"abc"', "content-type": "application/gzip"}
+    first.iter_content.side_effect = interrupted_content
+    mock_get.return_value = first
+
+    with pytest.raises(ConnectionError):
+        fetch(url, location=location, resume=True)
+    assert not location.exists()
+    assert b"0123" == (tmp_path / "archive.tar.gz.part").read_bytes()
+
+    second = mock.Mock(status_code=206)
+    second.headers = {"content-length": "6", "content-range": "bytes 4-9/10"}
+    second.iter_content.return_value = [content[4:]]
+    mock_get.return_value = second
+
+    response = fetch(url, location=location, resume=True)
+
+    mock_get.assert_called_with(
+        url, headers={"Range": "bytes=4-", "If-Range": '"abc"'}, stream=True
+    )
+    assert content == location.read_bytes()
+    assert 10 == response.size
+    assert "application/gzip" == response.content_type
+    assert not (tmp_path / "archive.tar.gz.part").exists()
+    assert not (tmp_path / "archive.tar.gz.part.json").exists()
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_http_resume_starts_over_when_content_changed(mock_get, tmp_path):
+    url = "https://example.com/archive.tar.gz"
+    location = tmp_path / "archive.tar.gz"
+    (tmp_path / "archive.tar.gz.part").write_bytes(b"old")
+    (tmp_path / "archive.tar.gz.part.json").write_text(
+        '{"url": "https://example.com/archive.tar.gz", "etag": "\\"old\\"", "size": 10}'
+    )
+
+    response = mock.Mock(status_code=200)
+    response.headers = {"content-length": "3", "etag": '"new"'}
+    response.iter_content.return_value = [b"new"]
+    mock_get.return_value = response
+
+    response = fetch(url, location=location, resume=True)
+
+    assert b"new" == location.read_bytes()
+    assert 3 == response.size
+
+
+def write_partial(tmp_path, content, **state):
+    (tmp_path / "archive.tar.gz.part").write_bytes(content)
+    (tmp_path / "archive.tar.gz.part.json").write_text(json.dumps(state))
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_http_resume_without_validator_on_size_match(mock_get, tmp_path):
+    url = "https://example.com/archive.tar.gz"
+    location = tmp_path / "archive.tar.gz"
+    write_partial(tmp_path, b"0123", url=url, size=10)
+
+    response = mock.Mock(status_code=206)
+    response.headers = {"content-length": "6", "content-range": "bytes 4-9/10"}
+    response.iter_content.return_value = [b"456789"]
+    mock_get.return_value = response
+
+    response = fetch(url, location=location, resume=True)
+
+    mock_get.assert_called_once_with(url, headers={"Range": "bytes=4-"}, stream=True)
+    assert b"0123456789" == location.read_bytes()
+    assert 10 == response.size
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_http_resume_starts_over_when_range_does_not_match(mock_get, tmp_path):
+    url = "https://example.com/archive.tar.gz"
+    location = tmp_path / "archive.tar.gz"
+    write_partial(tmp_path, b"0123", url=url, etag='"abc"', size=10)
+
+    ignored_offset = mock.Mock(status_code=206)
+    ignored_offset.headers = {"content-range": "bytes 0-9/10"}
+    full = mock.Mock(status_code=200)
+    full.headers = {"content-length": "10", "etag": '"abc"'}
+    full.iter_content.return_value = [b"0123456789"]
+    mock_get.side_effect = [ignored_offset, full]
+
+    response = fetch(url, location=location, resume=True)
+
+    assert mock.call(url, headers={}, stream=True) == mock_get.call_args
+    ignored_offset.iter_content.assert_not_called()
+    assert b"0123456789" == location.read_bytes()
+    assert 10 == response.size
+
+
+@mock.patch("fetchcode.FTP", autospec=True)
+def test_fetch_ftp_resume_interrupted_download(mock_ftp_constructor, tmp_path):
+    mock_ftp = mock_ftp_constructor.return_value
+    mock_ftp.size.return_value = 10
+    mock_ftp.sendcmd.return_value = "213 20200101000000"
+    mock_ftp.retrbinary.side_effect = lambda command, callback, rest=None: callback(b"456789")
+
+    url = "ftp://ftp.example.com/pub/archive.tar.gz"
+    location = tmp_path / "archive.tar.gz"
+    (tmp_path / "archive.tar.gz.part").write_bytes(b"0123")
+    (tmp_path / "archive.tar.gz.part.json").write_text(
+        '{"url": "ftp://ftp.example.com/pub/archive.tar.gz", "size": 10, '
+        '"modified": "20200101000000"}'
+    )
+
+    response = fetch(url, location=location, resume=True)
+
+    mock_ftp.retrbinary.assert_called_once_with("RETR archive.tar.gz", mock.ANY, rest=4)
+    assert b"0123456789" == location.read_bytes()
+    assert 10 == response.size
+
+
+@mock.patch("fetchcode.FTP", autospec=True)
+def test_fetch_ftp_resume_rejects_size_mismatch(mock_ftp_constructor, tmp_path):
+    mock_ftp = mock_ftp_constructor.return_value
+    mock_ftp.size.return_value = 10
+    mock_ftp.sendcmd.return_value = "213 20200101000000"
+    mock_ftp.retrbinary.side_effect = lambda command, callback, rest=None: callback(b"45")
+
+    url = "ftp://ftp.example.com/pub/archive.tar.gz"
+    location = tmp_path / "archive.tar.gz"
+    write_partial(tmp_path, b"0123", url=url, size=10, modified="20200101000000")
+
+    with pytest.raises(Exception, match="Incomplete download"):
+        fetch(url, location=location, resume=True)
+
+    assert not location.exists()
+    assert not (tmp_path / "archive.tar.gz.part").exists()
+
+
+@mock.patch("fetchcode._http_exists")
+@mock.patch("fetchcode.fetch")
+def test_fetch_many(mock_fetch, mock_http_exists):
+    mock_http_exists.return_value = True
+
+    def fake_fetch(url, **kwargs):
+        if "missing" in url:
+            raise Exception(f"Failed to fetch: {url}")
+        return url
+
+    mock_fetch.side_effect = fake_fetch
+    urls = [
+        "https://example.com/a.tar.gz",
+        "ftp://ftp.example.com/missing.tar.gz",
+        "pkg:pub/http@0.13.3",
+    ]
+
+    results = {result.url: result for result in fetch_many(urls, max_workers=2)}
+
+    assert set(urls) == set(results)
+    assert "https://example.com/a.tar.gz" == results["https://example.com/a.tar.gz"].response
+    assert "https://pub.dev/api/archives/http-0.13.3.tar.gz" == (
+        results["pkg:pub/http@0.13.3"].response
+    )
+    failed = results["ftp://ftp.example.com/missing.tar.gz"]
+    assert failed.response is None
+    assert "Failed to fetch: ftp://ftp.example.com/missing.tar.gz" == str(failed.error)
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_many_reports_http_errors(mock_get):
+    def fake_get(url, stream=False):
+        response = mock.Mock(status_code=404 if "missing" in url else 200, headers={})
+        response.raise_for_status.side_effect = requests.HTTPError(f"404 Not Found: {url}")
+        response.iter_content.return_value = [b"abc"]
+        return response
+
+    mock_get.side_effect = fake_get
+    urls = ["https://example.com/a.zip", "https://example.com/missing.zip"]
+
+    results = {result.url: result for result in fetch_many(urls)}
+
+    assert 3 == results["https://example.com/a.zip"].response.size
+    failed = results["https://example.com/missing.zip"]
+    assert failed.response is None
+    assert isinstance(failed.error, requests.HTTPError)
+
+
+@mock.patch("fetchcode.fetch")
+def test_fetch_many_limits_concurrency_per_host(mock_fetch):
+    lock = threading.Lock()
+    running = []
+    max_running = []
+
+    def fake_fetch(url, **kwargs):
+        with lock:
+            running.append(url)
+            max_running.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(url)
+        return url
+
+    mock_fetch.side_effect = fake_fetch
+    urls = [f"https://example.com/{i}.tar.gz" for i in range(10)]
+
+    results = list(fetch_many(urls, max_workers=8, per_host_limit=2))
+
+    assert 10 == len(results)
+    assert max(max_running) <= 2
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_http_computes_checksums(mock_get, tmp_path):
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.headers = {}
+    mock_get.return_value.iter_content.return_value = [b"abc", b"def"]
+
+    response = fetch_http(url="https://example.com/a", location=tmp_path / "a")
+
+    assert "e80b5017098950fc58aad83c8c14978e" == response.md5
+    assert "1f8ac10f23c5b5bc1167bda84b833e5c057a77d2" == response.sha1
+    assert "bef57ec7f53a6d40beb640a780a639c83bc29ac8a9816f1fc6c5c6dcd93c4721" == response.sha256
+    assert response.sha512.startswith("e32ef19623e8ed9d267f657a81944b3d")
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_http_checksum_mismatch(mock_get, tmp_path):
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.headers = {}
+    mock_get.return_value.iter_content.return_value = [b"abc", b"def"]
+    location = tmp_path / "a"
+
+    with pytest.raises(ChecksumMismatchError):
+        fetch(url="https://example.com/a", location=location, checksums={"sha256": "0" * 64})
+    assert not location.exists()
+
+    response = fetch(
+        url="https://example.com/a",
+        location=location,
+        checksums={"sha1": "1F8AC10F23C5B5BC1167BDA84B833E5C057A77D2"},
+    )
+    assert location.exists()
+    assert 6 == response.size
+
+
+@mock.patch("fetchcode.FTP", autospec=True)
+def test_fetch_ftp_computes_checksums(mock_ftp_constructor, tmp_path):
+    mock_ftp = mock_ftp_constructor.return_value
+    mock_ftp.size.return_value = 6
+    mock_ftp.retrbinary.side_effect = lambda command, callback: callback(b"abcdef")
+
+    response = fetch_ftp("ftp://ftp.example.com/pub/a.tar.gz", location=tmp_path / "a")
+
+    assert "bef57ec7f53a6d40beb640a780a639c83bc29ac8a9816f1fc6c5c6dcd93c4721" == response.sha256
+
+
 @mock.patch("fetchcode.FTP")
 def test_fetch_with_wrong_url(mock_get):
     with pytest.raises(Exception) as e_info:
@@ -60,6 +428,124 @@ def test_fetch_ftp_with_tempfile(mock_ftp_constructor):
         assert mock_ftp.retrbinary.called
 
 
+@mock.patch("fetchcode.FTP", autospec=True)
+def test_fetch_ftp_reuses_pooled_connection(mock_ftp_constructor, tmp_path):
+    mock_ftp = mock_ftp_constructor.return_value
+    mock_ftp.size.return_value = 3
+    mock_ftp.retrbinary.side_effect = lambda command, callback: callback(b"abc")
+
+    fetch_ftp("ftp://ftp.example.com/pub/a.tar.gz", location=tmp_path / "a")
+    fetch_ftp("ftp://ftp.example.com/pub/b.tar.gz", location=tmp_path / "b")
+
+    mock_ftp_constructor.assert_called_once_with("ftp.example.com")
+    assert 1 == mock_ftp.login.call_count
+    assert not mock_ftp.close.called
+    mock_ftp.retrbinary.assert_called_with("RETR b.tar.gz", mock.ANY)
+
+
+@mock.patch("fetchcode.FTP", autospec=True)
+def test_fetch_ftp_retries_stale_pooled_connection(mock_ftp_constructor, tmp_path):
+    stale_ftp = mock.Mock()
+    stale_ftp.size.side_effect = EOFError
+    ftp_pool.release("ftp.example.com", stale_ftp)
+    mock_ftp = mock_ftp_constructor.return_value
+    mock_ftp.size.return_value = 3
+    mock_ftp.retrbinary.side_effect = lambda command, callback: callback(b"abc")
+
+    response = fetch_ftp("ftp://ftp.example.com/pub/a.tar.gz", location=tmp_path / "a")
+
+    assert stale_ftp.close.called
+    mock_ftp_constructor.assert_called_once_with("ftp.example.com")
+    assert b"abc" == (tmp_path / "a").read_bytes()
+    assert 3 == response.size
+
+
+@mock.patch("fetchcode.FTP", autospec=True)
+def test_fetch_ftp_many(mock_ftp_constructor, tmp_path):
+    mock_ftp = mock_ftp_constructor.return_value
+    mock_ftp.size.return_value = 3
+    mock_ftp.retrbinary.side_effect = lambda command, callback: callback(b"abc")
+    urls = [f"ftp://ftp.example.com/pub/{i}.tar.gz" for i in range(6)]
+
+    results = list(fetch_ftp_many(urls, max_sessions=2))
+
+    assert set(urls) == {result.url for result in results}
+    assert all(result.response.size == 3 for result in results)
+    assert mock_ftp_constructor.call_count <= 2
+    assert 6 == mock_ftp.retrbinary.call_count
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_to_callback(mock_get):
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.headers = {"content-type": "application/gzip"}
+    mock_get.return_value.iter_content.return_value = [b"abc", b"def"]
+    chunks = []
+
+    response = fetch_to_callback("https://example.com/a.tar.gz", chunks.append, chunk_size=3)
+
+    mock_get.return_value.iter_content.assert_called_once_with(chunk_size=3)
+    assert [b"abc", b"def"] == chunks
+    assert response.location is None
+    assert 6 == response.size
+    assert "application/gzip" == response.content_type
+    assert "bef57ec7f53a6d40beb640a780a639c83bc29ac8a9816f1fc6c5c6dcd93c4721" == response.sha256
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_to_file(mock_get):
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.headers = {}
+    mock_get.return_value.iter_content.return_value = [b"abc", b"def"]
+    fileobj = io.BytesIO()
+
+    with mock.patch("fetchcode.open") as mocked_open:
+        response = fetch_to_file("https://example.com/a", fileobj)
+        assert not mocked_open.called
+
+    assert b"abcdef" == fileobj.getvalue()
+    assert 6 == response.size
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_to_memory(mock_get):
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.headers = {"content-type": "application/json"}
+    mock_get.return_value.iter_content.return_value = [b'{"a":', b" 1}"]
+
+    response = fetch_to_memory("https://example.com/a.json", max_size=100)
+
+    assert b'{"a": 1}' == response.content
+    assert response.location is None
+
+    with pytest.raises(MaxSizeExceeded):
+        fetch_to_memory("https://example.com/a.json", max_size=4)
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_to_memory_checksum_mismatch(mock_get):
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.headers = {}
+    mock_get.return_value.iter_content.return_value = [b"abc"]
+
+    with pytest.raises(ChecksumMismatchError):
+        fetch_to_memory("https://example.com/a", checksums={"md5": "0" * 32})
+
+
+@mock.patch("fetchcode.FTP", autospec=True)
+def test_fetch_to_memory_ftp(mock_ftp_constructor):
+    mock_ftp = mock_ftp_constructor.return_value
+    mock_ftp.size.return_value = 6
+    mock_ftp.retrbinary.side_effect = lambda command, callback: callback(b"abcdef")
+
+    response = fetch_to_memory("ftp://ftp.example.com/pub/a.tar.gz")
+
+    assert b"abcdef" == response.content
+    assert 6 == response.size
+    mock_ftp.retrbinary.assert_called_once_with("RETR a.tar.gz", mock.ANY)
+    mock_ftp.cwd.assert_called_with("/pub")
+
+
 def test_fetch_with_scheme_not_present():
     with pytest.raises(Exception) as e_info:
         url = "abc://speedtest/1KB.zip"
@@ -71,7 +557,7 @@ def test_fetch_with_scheme_not_present():
 @mock.patch("fetchcode.fetch_http")
 @mock.patch("fetchcode.pypi.fetch_json_response")
 def test_fetch_purl_with_fetchcode(mock_fetch_json_response, mock_fetch_http, mock_http_exists):
-    mock_fetch_http.return_value = "mocked_purl_response"
+    mock_fetch_http.return_value = mock.Mock(name="mocked_purl_response")
     mock_http_exists.return_value = True
     mock_fetch_json_response.return_value = {
         "urls": [{"url": "https://example.com/sample-1.0.0.zip"}]
@@ -79,7 +565,7 @@ def test_fetch_purl_with_fetchcode(mock_fetch_json_response, mock_fetch_http, mo
 
     response = fetch("pkg:pypi/sample@1.0.0")
 
-    assert response == "mocked_purl_response"
+    assert response == mock_fetch_http.return_value
     mock_http_exists.assert_called_once()
     mock_fetch_http.assert_called_once()
 
@@ -87,12 +573,12 @@ def test_fetch_purl_with_fetchcode(mock_fetch_json_response, mock_fetch_http, mo
 @mock.patch("fetchcode._http_exists")
 @mock.patch("fetchcode.fetch_http")
 def test_fetch_purl_with_purl2url(mock_fetch_http, mock_http_exists):
-    mock_fetch_http.return_value = "mocked_purl_response"
+    mock_fetch_http.return_value = mock.Mock(name="mocked_purl_response")
     mock_http_exists.return_value = True
 
     response = fetch("pkg:alpm/sample@1.0.0")
 
-    assert response == "mocked_purl_response"
+    assert response == mock_fetch_http.return_value
     mock_http_exists.assert_called_once()
     mock_fetch_http.assert_called_once()
 
@@ -177,3 +663,58 @@ def test_resolve_purl_using_fetchcode_url_does_not_exists(
     mock_http_exists.return_value = False
     url = resolve_purl("pkg:pypi/example@1.0.0")
     assert url is None
+
+
+@mock.patch("fetchcode._http_exists")
+@mock.patch("fetchcode.download_urls.download_url")
+@mock.patch("fetchcode.purl2url.get_download_url")
+def test_resolve_purl_skips_fetchcode_resolver_when_purl2url_url_exists(
+    mock_purl2url, mock_download_url, mock_http_exists
+):
+    mock_purl2url.return_value = "https://example.com/purl2url.tar.gz"
+    mock_download_url.return_value = "https://example.com/fetchcode.tar.gz"
+    mock_http_exists.return_value = True
+
+    assert "https://example.com/purl2url.tar.gz" == resolve_purl("pkg:pypi/example@1.0.0")
+    mock_download_url.assert_not_called()
+    mock_http_exists.assert_called_once_with("https://example.com/purl2url.tar.gz")
+
+
+@mock.patch("fetchcode.utils.make_head_request")
+def test_http_exists_caches_positive_and_negative_results(mock_head_request):
+    utils.clear_exists_cache()
+    mock_head_request.side_effect = lambda url, headers: mock.Mock(
+        status_code=206 if url.endswith("found") else 404
+    )
+
+    assert utils._http_exists("https://example.com/found")
+    assert not utils._http_exists("https://example.com/missing")
+    assert utils._http_exists("https://example.com/found")
+    assert not utils._http_exists("https://example.com/missing")
+    assert 2 == mock_head_request.call_count
+
+    utils.clear_exists_cache()
+    assert utils._http_exists("https://example.com/found")
+    assert 3 == mock_head_request.call_count
+
+
+@mock.patch("fetchcode.utils.make_head_request")
+def test_http_exists_cache_is_bounded(mock_head_request):
+    utils.clear_exists_cache()
+    mock_head_request.return_value = mock.Mock(status_code=200)
+
+    with mock.patch.object(utils._exists_memo, "max_size", 2):
+        for name in ("a", "b", "c", "a"):
+            assert utils._http_exists(f"https://example.com/{name}")
+
+    assert 2 == len(utils._exists_memo.entries)
+    assert 4 == mock_head_request.call_count
+
+
+@mock.patch("fetchcode.utils.make_head_request")
+def test_http_exists_does_not_cache_failed_requests(mock_head_request):
+    utils.clear_exists_cache()
+    mock_head_request.side_effect = [Exception("timeout"), mock.Mock(status_code=200)]
+
+    assert not utils._http_exists("https://example.com/flaky")
+    assert utils._http_exists("https://example.com/flaky")
@@ -0,0 +1,132 @@
+# fetchcode is a free software tool from nexB Inc. and others.
+# Visit https://github.com/aboutcode-org/fetchcode for support and download.
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and http://aboutcode.org
+#
+# This software is licensed under the Apache License version 2.0.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at:
+# http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+
+import time
+from unittest import mock
+
+import pytest
+
+from fetchcode import github_tokens
+from fetchcode.github_tokens import GitHubTokenPool
+from fetchcode.github_tokens import RateLimitExceeded
+from fetchcode.utils import get_github_rest
+from fetchcode.utils import get_github_token
+from fetchcode.utils import github_response
+
+
+def make_response(status_code, remaining, reset=None):
+    response = mock.Mock(status_code=status_code, from_cache=False)
+    response.headers = {
+        "X-RateLimit-Limit": "5000",
+        "X-RateLimit-Remaining": str(remaining),
+        "X-RateLimit-Reset": str(int(reset or time.time() + 3600)),
+    }
+    return response
+
+
+@pytest.fixture
+def token_pool():
+    yield github_tokens.configure(tokens=["token-a", "token-b"], max_wait=0)
+    github_tokens.configure()
+
+
+def test_token_pool_uses_token_with_most_remaining_requests():
+    pool = GitHubTokenPool(["token-a", "token-b"])
+    pool.update("token-a", "core", make_response(200, 10).headers)
+    pool.update("token-b", "core", make_response(200, 4000).headers)
+
+    assert "token-b" == pool.acquire("core")
+    # the graphql rate limit is tracked on its own
+    pool.update("token-b", "graphql", make_response(200, 0).headers)
+    assert "token-a" == pool.acquire("graphql")
+
+
+def test_token_pool_waits_for_rate_limit_reset():
+    pool = GitHubTokenPool(["token-a"])
+    pool.update("token-a", "core", make_response(403, 0, reset=time.time() + 60).headers)
+    rate_limit = pool.rate_limits[("token-a", "core")]
+
+    with mock.patch("time.sleep") as mock_sleep:
+        # sleeping until the rate limit reset
+        mock_sleep.side_effect = lambda seconds: setattr(rate_limit, "reset", time.time())
+        assert "token-a" == pool.acquire("core")
+    assert 60 <= mock_sleep.call_args.args[0] <= 62
+
+
+def test_token_pool_raises_when_wait_exceeds_max_wait():
+    pool = GitHubTokenPool(["token-a"], max_wait=10)
+    pool.update("token-a", "core", make_response(403, 0).headers)
+
+    with pytest.raises(RateLimitExceeded):
+        pool.acquire("core")
+
+
+def test_get_github_token_does_not_reserve_nor_wait(token_pool):
+    token_pool.update("token-a", "core", make_response(200, 10).headers)
+    token_pool.update("token-b", "core", make_response(200, 0).headers)
+
+    with mock.patch("time.sleep") as mock_sleep:
+        assert "token-a" == get_github_token()
+        assert "token-a" == get_github_token()
+        assert 10 == token_pool.rate_limits[("token-a", "core")].remaining
+
+        token_pool.update("token-a", "core", make_response(200, 0).headers)
+        assert get_github_token() in ("token-a", "token-b")
+
+    mock_sleep.assert_not_called()
+
+
+@mock.patch("fetchcode.memo.transport.get_metadata")
+def test_get_github_rest_retries_rate_limited_request_with_another_token(mock_get, token_pool):
+    rate_limited = make_response(403, 0)
+    success = make_response(200, 4999)
+    success.json.return_value = {"name": "fetchcode"}
+    mock_get.side_effect = [rate_limited, success]
+
+    assert {"name": "fetchcode"} == get_github_rest("https://api.github.com/repos/a/b")
+
+    tokens = [call.kwargs["headers"]["Authorization"] for call in mock_get.call_args_list]
+    assert 2 == len(set(tokens))
+    quota = {item["token"]: item["remaining"] for item in github_tokens.get_quota()}
+    assert {"...en-a", "...en-b"} == set(quota)
+    assert sorted(quota.values()) == [0, 4999]
+
+
+@mock.patch("fetchcode.transport.post")
+def test_github_response_retries_graphql_rate_limited_request_with_another_token(
+    mock_post, token_pool
+):
+    rate_limited = make_response(200, 1)
+    rate_limited.json.return_value = {
+        "errors": [{"type": "RATE_LIMITED", "message": "API rate limit exceeded"}]
+    }
+    success = make_response(200, 4999)
+    success.json.return_value = {"data": {"repository": None}}
+    mock_post.side_effect = [rate_limited, success]
+
+    assert {"data": {"repository": None}} == github_response({"query": "query {}"})
+
+    tokens = [call.kwargs["headers"]["Authorization"] for call in mock_post.call_args_list]
+    assert 2 == len(set(tokens))
+    quota = {item["token"]: item["remaining"] for item in github_tokens.get_quota()}
+    assert sorted(quota.values()) == [0, 4999]
+
+
+def test_get_pool_reads_tokens_from_environment(monkeypatch):
+    monkeypatch.setenv("GH_TOKENS", "token-a, token-b")
+    monkeypatch.setenv("GH_TOKEN", "token-a")
+
+    assert ["token-a", "token-b"] == github_tokens.get_pool().tokens
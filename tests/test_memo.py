@@ -0,0 +1,118 @@
+# fetchcode is a free software tool from nexB Inc. and others.
+# Visit https://github.com/aboutcode-org/fetchcode for support and download.
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and http://aboutcode.org
+#
+# This software is licensed under the Apache License version 2.0.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at:
+# http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+
+from fetchcode import fetch_json_response
+from fetchcode import memo
+from fetchcode.memo import Memo
+from fetchcode.utils import get_response
+
+
+def test_memo_shares_in_flight_computation():
+    memo_ = Memo(ttl=0)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return "value"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda _: memo_.get_or_compute("key", compute), range(4)))
+
+    assert ["value"] * 4 == results
+    assert 1 == len(calls)
+    assert "new value" == memo_.get_or_compute("key", lambda: "new value")
+
+
+def test_memo_shares_in_flight_error():
+    memo_ = Memo(ttl=0)
+    started = threading.Event()
+
+    def compute():
+        started.set()
+        time.sleep(0.2)
+        raise ValueError()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(memo_.get_or_compute, "key", compute)
+        started.wait()
+        follower = executor.submit(memo_.get_or_compute, "key", lambda: "value")
+        with pytest.raises(ValueError):
+            leader.result()
+        with pytest.raises(ValueError):
+            follower.result()
+
+    assert "value" == memo_.get_or_compute("key", lambda: "value")
+
+
+def test_memo_ttl_and_max_size():
+    memo_ = Memo(max_size=2, ttl=0.1)
+    memo_.get_or_compute("a", lambda: 1)
+    memo_.get_or_compute("b", lambda: 2)
+    memo_.get_or_compute("c", lambda: 3)
+
+    assert 10 == memo_.get_or_compute("a", lambda: 10)
+    assert 3 == memo_.get_or_compute("c", lambda: 30)
+    time.sleep(0.15)
+    assert 30 == memo_.get_or_compute("c", lambda: 30)
+
+
+@mock.patch("fetchcode.transport.get")
+def test_request_scope_fetches_each_document_once(mock_get):
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.json.return_value = {"info": {}}
+    url = "https://pypi.org/pypi/django/json"
+
+    with memo.request_scope():
+        assert {"info": {}} == fetch_json_response(url)
+        assert {"info": {}} == get_response(url)
+    mock_get.assert_called_once_with(url)
+
+    fetch_json_response(url)
+    assert 2 == mock_get.call_count
+
+
+@mock.patch("fetchcode.transport.get")
+def test_request_scope_does_not_keep_errors(mock_get):
+    mock_get.return_value.status_code = 404
+
+    with memo.request_scope():
+        for _ in range(2):
+            with pytest.raises(Exception):
+                fetch_json_response("https://pypi.org/pypi/missing/json")
+
+    assert 2 == mock_get.call_count
+
+
+@mock.patch("fetchcode.transport.get")
+def test_process_scope_ttl(mock_get):
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.json.return_value = {}
+    memo.configure(ttl=60)
+    try:
+        fetch_json_response("https://example.com/a.json")
+        fetch_json_response("https://example.com/a.json")
+    finally:
+        memo.configure()
+
+    assert 1 == mock_get.call_count
@@ -19,8 +19,12 @@ from unittest import TestCase
 from unittest import mock
 
 import pytest
+import requests
 from packageurl import PackageURL
 
+from fetchcode import transport
+from fetchcode import utils
+from fetchcode.cache import MetadataCache
 from fetchcode.package import get_cocoapods_data_from_purl
 from fetchcode.package import info
 from fetchcode.package_util import construct_cocoapods_package
@@ -81,6 +85,15 @@ def test_pypi_packages(mock_get):
     check_packages(packages, expected_data)
 
 
+@mock.patch("fetchcode.package.get_response")
+def test_pypi_packages_ignore_options_of_other_types(mock_get):
+    mock_get.return_value = load_json("tests/data/pypi_mock_data.json")
+
+    packages = list(info("pkg:pypi/flask", details=False, max_workers=2))
+
+    check_packages(packages, "tests/data/pypi.json")
+
+
 @mock.patch("fetchcode.package.get_response")
 def test_bitbucket_packages(mock_get):
     side_effect = [
@@ -105,18 +118,82 @@ def test_rubygems_packages(mock_get):
     mock_get_03_2nd_in_list = load_json("tests/data/rubygems_mock_get_2nd_in_list.json")
     mock_get_04_3rd_in_list = load_json("tests/data/rubygems_mock_get_3rd_in_list.json")
 
-    mock_get.side_effect = [
-        mock_get_01_list_of_versions,
-        mock_get_02_1st_in_list,
-        mock_get_03_2nd_in_list,
-        mock_get_04_3rd_in_list,
-    ]
+    version_api = "https://rubygems.org/api/v2/rubygems/pronto-goodcheck/versions"
+    # the version APIs are fetched concurrently, in any order
+    responses = {
+        "https://rubygems.org/api/v1/versions/pronto-goodcheck.json": mock_get_01_list_of_versions,
+        f"{version_api}/0.2.0.json": mock_get_02_1st_in_list,
+        f"{version_api}/0.1.2.json": mock_get_03_2nd_in_list,
+        f"{version_api}/0.1.1.json": mock_get_04_3rd_in_list,
+    }
+    mock_get.side_effect = responses.get
 
     packages = list(info(purl))
 
     check_packages(packages, expected_data)
 
 
+@mock.patch("fetchcode.package.get_response")
+def test_rubygems_packages_without_details(mock_get):
+    mock_get.return_value = load_json("tests/data/rubygems_mock_get_list_of_versions.json")
+
+    packages = list(info("pkg:rubygems/pronto-goodcheck", details=False))
+
+    assert ["0.2.0", "0.1.2", "0.1.1"] == [package.version for package in packages]
+    assert "https://rubygems.org/gems/pronto-goodcheck-0.2.0.gem" == packages[0].download_url
+    assert ["MIT"] == packages[0].declared_license
+    mock_get.assert_called_once_with("https://rubygems.org/api/v1/versions/pronto-goodcheck.json")
+
+
+@mock.patch("fetchcode.package.get_response")
+@mock.patch("fetchcode.package.get_response_if_exists")
+def test_pinned_version_packages_use_version_endpoints(mock_get_if_exists, mock_get):
+    mock_get.return_value = {"crate": {"homepage": "https://rust-random.github.io"}}
+    mock_get_if_exists.side_effect = [
+        {"info": {"license": "BSD-3-Clause"}, "urls": [{"url": "https://f/flask-2.0.tar.gz"}]},
+        {"version": "4.17.1", "license": "MIT", "dist": {"tarball": "https://n/e.tgz"}},
+        {"version": {"num": "0.8.5", "dl_path": "/api/v1/crates/rand/0.8.5/download"}},
+        {"gem_uri": "https://rubygems.org/gems/pronto-goodcheck-0.1.0.gem"},
+        {"name": "v1.0"},
+    ]
+
+    pypi, npm, cargo, rubygems, bitbucket = [
+        list(info(purl))
+        for purl in (
+            "pkg:pypi/flask@2.0",
+            "pkg:npm/express@4.17.1",
+            "pkg:cargo/rand@0.8.5",
+            "pkg:rubygems/pronto-goodcheck@0.1.0",
+            "pkg:bitbucket/litmis/python-itoolkit@v1.0",
+        )
+    ]
+
+    assert "https://f/flask-2.0.tar.gz" == pypi[0].download_url
+    assert "BSD-3-Clause" == pypi[0].declared_license
+    assert "https://n/e.tgz" == npm[0].download_url
+    assert "https://crates.io//api/v1/crates/rand/0.8.5/download" == cargo[0].download_url
+    assert "https://rust-random.github.io" == cargo[0].homepage_url
+    assert "0.1.0" == rubygems[0].version
+    assert "v1.0" == bitbucket[0].version
+    assert [
+        mock.call("https://pypi.org/pypi/flask/2.0/json"),
+        mock.call("http://registry.npmjs.org/express/4.17.1"),
+        mock.call("https://crates.io/api/v1/crates/rand/0.8.5"),
+        mock.call("https://rubygems.org/api/v2/rubygems/pronto-goodcheck/versions/0.1.0.json"),
+        mock.call(
+            "https://api.bitbucket.org/2.0/repositories/litmis/python-itoolkit/refs/tags/v1.0"
+        ),
+    ] == mock_get_if_exists.call_args_list
+    mock_get.assert_called_once_with("https://crates.io/api/v1/crates/rand?include=")
+
+
+@mock.patch("fetchcode.package.get_response_if_exists")
+def test_pinned_version_package_not_found(mock_get_if_exists):
+    mock_get_if_exists.return_value = None
+
+    assert [] == list(info("pkg:pypi/flask@0.0.0"))
+
+
 @mock.patch("fetchcode.package.get_response")
 def test_tuby_package_with_invalid_url(mock_get):
     with pytest.raises(Exception) as e_info:
@@ -125,8 +202,7 @@ def test_tuby_package_with_invalid_url(mock_get):
         assert "Failed to fetch: https://rubygems.org/api/v1/gems/file.json" == e_info
 
 
-@mock.patch("fetchcode.package_util.utils.make_head_request")
-@mock.patch("fetchcode.package_util.utils.get_github_rest")
+@mock.patch("fetchcode.package_util.utils.get_github_repository")
 @mock.patch("fetchcode.package_util.utils.get_response")
 @mock.patch("fetchcode.package.get_cocoapod_tags")
 @mock.patch("fetchcode.package.get_hashed_path")
@@ -134,8 +210,7 @@ def test_cocoapods_packages(
     mock_get_hashed_path,
     mock_get_cocoapod_tags,
     mock_get_response,
-    mock_get_github_rest,
-    mock_make_head_request,
+    mock_get_github_repository,
 ):
     mock_get_hashed_path.return_value = "5/5/b"
 
@@ -151,22 +226,17 @@ def test_cocoapods_packages(
     mock_get_response.side_effect = file_json(
         "tests/data/cocoapods/mock_get_response_side_effect.json"
     )
-    mock_get_github_rest.return_value = load_json(
+    mock_get_github_repository.return_value = load_json(
         "tests/data/cocoapods/mock_get_github_rest_return_value.json"
     )
 
-    mock_response = mock.Mock()
-    mock_response.status_code = 200
-    mock_make_head_request.return_value = mock_response
-
     purl = "pkg:cocoapods/ASNetworking"
     expected_data = "tests/data/cocoapods.json"
     packages = list(info(purl))
     check_packages(packages, expected_data)
 
 
-@mock.patch("fetchcode.package_util.utils.make_head_request")
-@mock.patch("fetchcode.package_util.utils.get_github_rest")
+@mock.patch("fetchcode.package_util.utils.get_github_repository")
 @mock.patch("fetchcode.package_util.utils.get_response")
 @mock.patch("fetchcode.package.get_cocoapod_tags")
 @mock.patch("fetchcode.package.get_hashed_path")
@@ -174,8 +244,7 @@ def test_get_cocoapods_data_from_purl(
     mock_get_hashed_path,
     mock_get_cocoapod_tags,
     mock_get_response,
-    mock_get_github_rest,
-    mock_make_head_request,
+    mock_get_github_repository,
 ):
     """
     This already-existing test is structurally identical to the new
@@ -196,14 +265,10 @@ def test_get_cocoapods_data_from_purl(
     mock_get_response.side_effect = file_json(
         "tests/data/cocoapods/mock_get_response_side_effect.json"
     )
-    mock_get_github_rest.return_value = load_json(
+    mock_get_github_repository.return_value = load_json(
         "tests/data/cocoapods/mock_get_github_rest_return_value.json"
     )
 
-    mock_response = mock.Mock()
-    mock_response.status_code = 200
-    mock_make_head_request.return_value = mock_response
-
     expected_result_to_dict = file_json("tests/data/cocoapods/expected_result_to_dict.json")
     purl = "pkg:cocoapods/ASNetworking"
     actual_result = get_cocoapods_data_from_purl(purl)
@@ -231,18 +296,10 @@ def test_get_cocoapod_tags(mock_get):
 
 
 @mock.patch("fetchcode.package_util.utils.get_response")
-@mock.patch("fetchcode.package_util.utils.make_head_request")
-@mock.patch("fetchcode.package_util.utils.get_github_rest")
-def test_construct_cocoapods_package(
-    mock_get_github_rest, mock_make_head_request, mock_get_response
-):
-    mock_get_github_rest.return_value = (
-        "Failed to fetch: https://api.github.com/repos/KevalPatel94/KVLLibraries"
-    )
-
-    mock_response = mock.Mock()
-    mock_response.status_code = 404
-    mock_make_head_request.return_value = mock_response
+@mock.patch("fetchcode.package_util.utils.get_github_repository")
+def test_construct_cocoapods_package(mock_get_github_repository, mock_get_response):
+    # the repository does not exist
+    mock_get_github_repository.return_value = None
 
     mock_get_response.return_value = load_json(
         "tests/data/cocoapods/get_response_kvllibraries.json"
@@ -268,6 +325,30 @@ def test_construct_cocoapods_package(
     assert actual == expected
 
 
+@mock.patch("fetchcode.transport.get")
+def test_get_github_repository_revalidates_with_etag(mock_get, monkeypatch, tmp_path):
+    monkeypatch.delenv("GH_TOKEN", raising=False)
+    monkeypatch.delenv("GH_TOKENS", raising=False)
+    fresh = mock.Mock(status_code=200, content=b'{"language": "Python"}')
+    fresh.headers = requests.structures.CaseInsensitiveDict({"ETag": '"abc"'})
+    fresh.json.return_value = {"language": "Python"}
+    mock_get.side_effect = [fresh, mock.Mock(status_code=304, headers={})]
+
+    transport.set_metadata_cache(MetadataCache(str(tmp_path / "metadata.sqlite3")))
+    try:
+        first = utils.get_github_repository("aboutcode-org", "fetchcode")
+        second = utils.get_github_repository("aboutcode-org", "fetchcode")
+    finally:
+        transport.set_metadata_cache(None)
+
+    assert {"language": "Python"} == first == second
+    url = "https://api.github.com/repos/aboutcode-org/fetchcode"
+    assert [
+        mock.call(url),
+        mock.call(url, headers={"If-None-Match": '"abc"'}),
+    ] == mock_get.call_args_list
+
+
 class GitHubSourceTestCase(TestCase):
     def check_result(self, filename, packages, regen=False):
         result = [p.to_dict() for p in packages]
@@ -283,7 +364,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.assertListEqual(expected, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_avahi(self, mock_github_response, mock_get_response):
         test_data = [
@@ -299,7 +380,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_avahi(self, mock_github_response, mock_get_response):
         test_data = [
@@ -315,7 +396,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_bpftool(self, mock_github_response, mock_get_response):
         test_data = [
@@ -331,7 +412,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_brotli(self, mock_github_response, mock_get_response):
         test_data = [
@@ -347,7 +428,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_dosfstools(self, mock_github_response, mock_get_response):
         test_data = [
@@ -363,7 +444,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_genext2fs(self, mock_github_response, mock_get_response):
         test_data = [
@@ -379,7 +460,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_inotify_tools(self, mock_github_response, mock_get_response):
         test_data = [
@@ -395,7 +476,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_llvm_project(self, mock_github_response, mock_get_response):
         test_data = [
@@ -413,7 +494,100 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
+    @mock.patch("fetchcode.utils.github_response")
+    def test_packages_github_source_pinned_version_looks_up_tag(
+        self, mock_github_response, mock_get_response
+    ):
+        node = {"name": "llvmorg-1.5.0", "target": {"committedDate": "2005-05-18T00:00:00Z"}}
+        mock_github_response.return_value = {
+            "data": {"repository": {"query0": {"nodes": [node]}, "query2": {"nodes": []}}}
+        }
+        mock_get_response.return_value = file_json(
+            "tests/data/package/github/llvm-project/github_mock_data_0.json"
+        )
+
+        result = list(info("pkg:github/llvm/llvm-project@1.5.0"))
+
+        assert ["1.5.0"] == [package.version for package in result]
+        expected = "https://github.com/llvm/llvm-project/archive/refs/tags/llvmorg-1.5.0.tar.gz"
+        assert expected == result[0].download_url
+        graphql_query = mock_github_response.call_args.args[0]
+        assert "llvmorg-1.5.0" == graphql_query["variables"]["query0"]
+        mock_github_response.assert_called_once()
+
+    @mock.patch("fetchcode.utils.get_github_repository")
+    @mock.patch("fetchcode.utils.github_response")
+    def test_packages_github_source_pinned_version_picks_tag_of_full_scan(
+        self, mock_github_response, mock_get_response
+    ):
+        date = {"committedDate": "2020-01-01T00:00:00Z"}
+        # the tags listed by name as in a full scan
+        nodes = [{"name": "1.0", "target": date}, {"name": "v1.0", "target": date}]
+        mock_get_response.return_value = file_json(
+            "tests/data/package/github/llvm-project/github_mock_data_0.json"
+        )
+
+        refs = {"nodes": nodes, "pageInfo": {"hasNextPage": False}}
+        mock_github_response.side_effect = [
+            {"data": {"repository": {}}},
+            {"data": {"repository": {"refs": refs}}},
+        ]
+        [scanned] = info("pkg:github/python/cpython@1.0")
+
+        # the v1.0 query comes first in the direct lookup
+        queries = {"query0": {"nodes": nodes[1:]}, "query2": {"nodes": nodes[:1]}}
+        mock_github_response.side_effect = [{"data": {"repository": queries}}]
+        [looked_up] = info("pkg:github/python/cpython@1.0")
+
+        assert scanned.download_url.endswith("/1.0.tar.gz")
+        assert scanned.download_url == looked_up.download_url
+
+    @mock.patch("fetchcode.utils.get_github_repository")
+    @mock.patch("fetchcode.utils.github_response")
+    def test_packages_github_source_openssl_pinned_version_looks_up_tag(
+        self, mock_github_response, mock_get_response
+    ):
+        node = {"name": "OpenSSL_1_1_1w", "target": {"committedDate": "2023-09-11T00:00:00Z"}}
+        mock_github_response.return_value = {
+            "data": {"repository": {"query0": {"nodes": []}, "query1": {"nodes": [node]}}}
+        }
+        mock_get_response.return_value = file_json(
+            "tests/data/package/github/openssl/github_mock_data_0.json"
+        )
+
+        result = list(info("pkg:openssl/openssl@1.1.1w"))
+
+        assert ["pkg:openssl/openssl@1.1.1w"] == [package.purl for package in result]
+        expected = "https://github.com/openssl/openssl/archive/refs/tags/OpenSSL_1_1_1w.tar.gz"
+        assert expected == result[0].download_url
+        variables = mock_github_response.call_args.args[0]["variables"]
+        queries = [value for key, value in variables.items() if key.startswith("query")]
+        assert ["OpenSSL_1.1.1w", "OpenSSL_1_1_1w", "openssl-1.1.1w", "openssl-1_1_1w"] == queries
+        mock_github_response.assert_called_once()
+
+    @mock.patch("fetchcode.utils.get_github_repository")
+    @mock.patch("fetchcode.utils.github_response")
+    def test_packages_github_source_pinned_version_falls_back_to_all_tags(
+        self, mock_github_response, mock_get_response
+    ):
+        test_data = [
+            "tests/data/package/github/llvm-project/github_mock_data_1.json",
+            "tests/data/package/github/llvm-project/github_mock_data_2.json",
+            "tests/data/package/github/llvm-project/github_mock_data_3.json",
+        ]
+        mock_github_response.side_effect = [{"data": {"repository": {}}}] + [
+            file_json(file) for file in test_data
+        ]
+        mock_get_response.return_value = file_json(
+            "tests/data/package/github/llvm-project/github_mock_data_0.json"
+        )
+
+        result = list(info("pkg:github/llvm/llvm-project@1.5.0"))
+
+        assert ["1.5.0"] == [package.version for package in result]
+
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_miniupnpc(self, mock_github_response, mock_get_response):
         test_data = [
@@ -429,7 +603,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_miniupnpd(self, mock_github_response, mock_get_response):
         test_data = [
@@ -445,7 +619,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_minissdpd(self, mock_github_response, mock_get_response):
         test_data = [
@@ -461,7 +635,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_nix(self, mock_github_response, mock_get_response):
         test_data = [
@@ -478,7 +652,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_pupnp(self, mock_github_response, mock_get_response):
         test_data = [
@@ -494,7 +668,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_cpython(self, mock_github_response, mock_get_response):
         test_data = [
@@ -515,7 +689,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_rpm(self, mock_github_response, mock_get_response):
         test_data = [
@@ -532,7 +706,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_shadow(self, mock_github_response, mock_get_response):
         test_data = [
@@ -548,7 +722,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_sqlite(self, mock_github_response, mock_get_response):
         test_data = [
@@ -565,7 +739,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_squashfs_tools(self, mock_github_response, mock_get_response):
         test_data = [
@@ -581,7 +755,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_wireless_tools(self, mock_github_response, mock_get_response):
         test_data = [
@@ -597,7 +771,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_uboot(self, mock_github_response, mock_get_response):
         test_data = [
@@ -617,7 +791,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_erofs_utils(self, mock_github_response, mock_get_response):
         test_data = [
@@ -633,7 +807,7 @@ class GitHubSourceTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("fetchcode.utils.get_response")
+    @mock.patch("fetchcode.utils.get_github_repository")
     @mock.patch("fetchcode.utils.github_response")
     def test_packages_github_source_openssl(self, mock_github_response, mock_get_response):
         test_data = [
@@ -668,7 +842,7 @@ class DirListedTestCase(TestCase):
 
         self.assertListEqual(expected, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_openssh(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/openssh/index.html",
@@ -691,7 +865,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_syslinux(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/syslinux/index.html",
@@ -714,7 +888,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_toybox(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/toybox/index.html",
@@ -737,7 +911,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_uclibc(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/uclibc/index.html",
@@ -760,7 +934,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_uclibc_ng(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/uclibc-ng/index.html",
@@ -830,7 +1004,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_wpa_supplicant(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/wpa_supplicant/index.html",
@@ -853,7 +1027,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_gnu_glibc(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/gnu/glibc/index.html",
@@ -876,7 +1050,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_util_linux(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/util-linux/index.html",
@@ -927,7 +1101,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_busybox(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/busybox/index.html",
@@ -950,7 +1124,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_bzip2(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/bzip2/index.html",
@@ -973,7 +1147,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_dnsmasq(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/dnsmasq/index.html",
@@ -996,7 +1170,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_dropbear(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/dropbear/index.html",
@@ -1019,7 +1193,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_ebtables(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/ebtables/index.html",
@@ -1042,7 +1216,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_hostapd(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/hostapd/index.html",
@@ -1065,7 +1239,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_iproute2(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/iproute2/index.html",
@@ -1088,7 +1262,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_iptables(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/iptables/index.html",
@@ -1111,7 +1285,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_libnl(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/libnl/index.html",
@@ -1134,7 +1308,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_lighttpd(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/lighttpd/index.html",
@@ -1157,7 +1331,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_nftables(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/nftables/index.html",
@@ -1180,7 +1354,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_samba(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/samba/index.html",
@@ -1215,7 +1389,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_linux(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/linux/index.html",
@@ -1254,7 +1428,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_mtd_utils(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/mtd-utils/index.html",
@@ -1277,7 +1451,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_barebox(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/barebox/index.html",
@@ -1300,7 +1474,7 @@ class DirListedTestCase(TestCase):
 
         self.check_result(expected_file, result)
 
-    @mock.patch("requests.get")
+    @mock.patch("fetchcode.transport.get")
     def test_packages_e2fsprogs(self, mock_get):
         test_data = [
             "tests/data/package/dirlisting/generic/e2fsprogs/index.html",
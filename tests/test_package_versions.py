@@ -22,8 +22,12 @@ from unittest import mock
 import yaml
 from packageurl import PackageURL
 
+from fetchcode.cache import TagCache
+from fetchcode.package_versions import PackageVersion
 from fetchcode.package_versions import get_npm_registry_url
 from fetchcode.package_versions import versions
+from fetchcode.utils import fetch_github_tags_gql_batch
+from fetchcode.utils import set_github_tag_cache
 
 FETCHCODE_REGEN_TEST_FIXTURES = os.getenv("FETCHCODE_REGEN_TEST_FIXTURES", False)
 
@@ -69,6 +73,15 @@ def test_get_pypi_versions_from_purl(mock_get_response):
     check_results_against_json(result, expected_file)
 
 
+@mock.patch("fetchcode.package_versions.get_response")
+def test_get_pypi_versions_from_purl_ignores_options_of_other_types(mock_get_response):
+    mock_get_response.return_value = get_json_data(data_location / "pypi_mock_data.json")
+
+    result = list(versions("pkg:pypi/Djblets", release_dates=False))
+
+    check_results_against_json(result, data_location / "pypi.json")
+
+
 @mock.patch("fetchcode.package_versions.get_response")
 def test_get_cargo_versions_from_purl(mock_get_response):
     side_effect = [get_json_data(data_location / "cargo_mock_data.json")]
@@ -113,6 +126,24 @@ def test_get_npm_versions_from_purl(mock_get_response):
     check_results_against_json(result, expected_file)
 
 
+@mock.patch("fetchcode.package_versions.get_response")
+def test_get_npm_versions_from_purl_without_release_dates(mock_get_response):
+    abbreviated = get_json_data(data_location / "npm_mock_data.json")
+    abbreviated.pop("time")
+    mock_get_response.return_value = abbreviated
+    purl = "pkg:npm/%40angular/animation"
+
+    result = list(versions(purl, release_dates=False))
+
+    assert PackageVersion(value="4.0.0-beta.8") in result
+    assert all(version.release_date is None for version in result)
+    mock_get_response.assert_called_once_with(
+        url="https://registry.npmjs.org/@angular/animation",
+        content_type="json",
+        headers={"Accept": "application/vnd.npm.install-v1+json"},
+    )
+
+
 @mock.patch("fetchcode.package_versions.get_response")
 def test_get_deb_versions_from_purl(mock_get_response):
     side_effect = [get_json_data(data_location / "deb_mock_data.json")]
@@ -195,6 +226,67 @@ def test_get_github_versions_from_purl(mock_github_response):
     check_results_against_json(result, expected_file)
 
 
+def make_refs(names, end_cursor=None):
+    nodes = [{"name": name, "target": {"committedDate": "2024-01-02T03:04:05Z"}} for name in names]
+    page_info = {"endCursor": end_cursor, "hasNextPage": bool(end_cursor)}
+    return {"refs": {"totalCount": len(nodes), "pageInfo": page_info, "nodes": nodes}}
+
+
+@mock.patch("fetchcode.utils.github_response")
+def test_fetch_github_tags_gql_batch(mock_github_response):
+    mock_github_response.side_effect = [
+        {
+            "data": {
+                "repo0": make_refs(["v1.0"], end_cursor="abc"),
+                "repo1": make_refs(["v2.0"]),
+                "repo2": None,
+            },
+            "errors": [{"type": "NOT_FOUND", "path": ["repo2"]}],
+        },
+        {"data": {"repo0": make_refs(["v1.1"])}},
+    ]
+    purls = [
+        PackageURL.from_string("pkg:github/nexB/scancode-toolkit"),
+        PackageURL.from_string("pkg:github/aboutcode-org/fetchcode"),
+        PackageURL.from_string("pkg:github/aboutcode-org/missing"),
+    ]
+
+    result = fetch_github_tags_gql_batch(purls)
+
+    assert ["v1.0", "v1.1"] == [name for name, _date in result[("nexb", "scancode-toolkit")]]
+    assert ["v2.0"] == [name for name, _date in result[("aboutcode-org", "fetchcode")]]
+    assert [] == result[("aboutcode-org", "missing")]
+    first_query, second_query = [call.args[0] for call in mock_github_response.call_args_list]
+    assert "repo2: repository" in first_query["query"]
+    assert "repo1: repository" not in second_query["query"]
+    assert {"owner0": "nexb", "name0": "scancode-toolkit", "after0": "abc"} == second_query[
+        "variables"
+    ]
+
+
+@mock.patch("fetchcode.utils.github_response")
+def test_get_github_versions_from_purl_syncs_tags_incrementally(mock_github_response, tmp_path):
+    tag_cache = TagCache(str(tmp_path / "tags.sqlite3"))
+    set_github_tag_cache(tag_cache)
+    purl = "pkg:github/nexB/scancode-toolkit"
+    try:
+        mock_github_response.side_effect = [
+            {"data": {"repository": make_refs(["v2.0", "v1.1"], end_cursor="abc")}},
+            {"data": {"repository": make_refs(["v1.0"])}},
+        ]
+        assert ["v1.0", "v1.1", "v2.0"] == [version.value for version in versions(purl)]
+
+        mock_github_response.side_effect = [
+            {"data": {"repository": make_refs(["v3.0", "v2.0"], end_cursor="def")}},
+        ]
+        assert ["v1.0", "v1.1", "v2.0", "v3.0"] == [version.value for version in versions(purl)]
+    finally:
+        set_github_tag_cache(None)
+
+    assert 3 == mock_github_response.call_count
+    assert "TAG_COMMIT_DATE" in mock_github_response.call_args.args[0]["query"]
+
+
 @mock.patch("fetchcode.package_versions.get_response")
 def test_get_golang_versions_from_purl(mock_get_response):
     golang_version_list_file = data_location / "golang/golang_mock_meta_data.txt"
@@ -0,0 +1,87 @@
+# fetchcode is a free software tool from nexB Inc. and others.
+# Visit https://github.com/aboutcode-org/fetchcode for support and download.
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and http://aboutcode.org
+#
+# This software is licensed under the Apache License version 2.0.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at:
+# http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+
+import pytest
+from packageurl import PackageURL
+from packageurl.contrib.route import MultipleRoutesDefined
+from packageurl.contrib.route import NoRouteAvailable
+from packageurl.contrib.route import Router
+
+from fetchcode import package
+from fetchcode import package_versions
+from fetchcode.routing import PurlRouter
+
+
+def make_routers(patterns):
+    routers = Router(), PurlRouter()
+    for router in routers:
+        for pattern in patterns:
+            router.append(pattern, lambda purl, pattern=pattern: pattern)
+    return routers
+
+
+def test_purl_router_routes_like_router():
+    patterns = [
+        "pkg:generic/uclibc",
+        "pkg:generic/uclibc@.*",
+        "pkg:generic/uclibc-ng.*",
+        "pkg:generic/linux.*",
+        "pkg:npms?/.*",
+        "pkg:deb/ubuntu/.*",
+        "pkg:deb/debian/.*",
+        "https://example.com/.*",
+    ]
+    router, purl_router = make_routers(patterns)
+    strings = [
+        "pkg:generic/uclibc",
+        "pkg:generic/uclibc@1.0",
+        "pkg:generic/uclibc-ng@1.0",
+        "pkg:generic/linux-firmware@1.0",
+        "pkg:npm/foo",
+        "pkg:npms/foo",
+        "pkg:deb/debian/curl@1.0",
+        "https://example.com/foo",
+        "pkg:generic/busybox@1.0",
+        "pkg:pypi/foo",
+        "pkg:",
+    ]
+    for string in strings:
+        try:
+            expected = router.process(string)
+        except NoRouteAvailable:
+            with pytest.raises(NoRouteAvailable):
+                purl_router.process(string)
+        else:
+            assert expected == purl_router.process(string)
+
+
+def test_purl_router_raises_on_multiple_routes():
+    _router, purl_router = make_routers(["pkg:generic/foo.*", "pkg:generic/.*"])
+    with pytest.raises(MultipleRoutesDefined):
+        purl_router.process("pkg:generic/foo")
+
+
+def test_purl_router_accepts_package_url():
+    _router, purl_router = make_routers(["pkg:pypi/.*"])
+    assert "pkg:pypi/.*" == purl_router.process(PackageURL(type="pypi", name="django"))
+
+
+def test_package_routers_resolve_all_routes():
+    for router in (package.router, package_versions.router):
+        for pattern, rule in router:
+            if pattern.endswith(".*"):
+                string = pattern[: -len(".*")]
+                assert rule.endpoint == router.resolve(string)
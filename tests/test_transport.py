@@ -0,0 +1,167 @@
+# fetchcode is a free software tool from nexB Inc. and others.
+# Visit https://github.com/aboutcode-org/fetchcode for support and download.
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and http://aboutcode.org
+#
+# This software is licensed under the Apache License version 2.0.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at:
+# http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+
+from unittest import mock
+
+import pytest
+
+from fetchcode import fetch
+from fetchcode import resolve_purl
+from fetchcode import transport
+from fetchcode import utils
+from fetchcode.cache import DownloadCache
+from fetchcode.cache import MetadataCache
+from fetchcode.cache import TagCache
+from fetchcode.package_versions import get_response
+from fetchcode.package_versions import versions
+from fetchcode.transport import OfflineError
+
+
+@pytest.fixture(autouse=True)
+def reset_transport():
+    transport.configure(
+        pool_connections=transport.DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize=transport.DEFAULT_POOL_MAXSIZE,
+        timeout=transport.DEFAULT_TIMEOUT,
+        max_retries=0,
+    )
+    yield
+    transport.configure(
+        pool_connections=transport.DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize=transport.DEFAULT_POOL_MAXSIZE,
+        timeout=transport.DEFAULT_TIMEOUT,
+        max_retries=0,
+    )
+
+
+def test_get_session_is_shared():
+    assert transport.get_session() is transport.get_session()
+
+
+def test_configure_creates_new_session_with_pool_sizes():
+    session = transport.get_session()
+    transport.configure(pool_connections=4, pool_maxsize=2)
+    new_session = transport.get_session()
+    assert new_session is not session
+
+    adapter = new_session.get_adapter("https://example.com")
+    assert 4 == adapter._pool_connections
+    assert 2 == adapter._pool_maxsize
+
+
+def test_request_uses_default_timeout():
+    transport.configure(timeout=5)
+    with mock.patch.object(transport.get_session(), "request") as mock_request:
+        transport.get("https://example.com", headers={"Accept": "application/json"})
+        mock_request.assert_called_once_with(
+            "GET", "https://example.com", headers={"Accept": "application/json"}, timeout=5
+        )
+
+        transport.head("https://example.com", timeout=1)
+        mock_request.assert_called_with(
+            "HEAD", "https://example.com", timeout=1, allow_redirects=False
+        )
+
+
+@mock.patch("fetchcode.transport.get")
+def test_package_versions_get_response_sends_headers(mock_get):
+    mock_get.return_value.json.return_value = {"versions": []}
+    response = get_response(
+        url="https://example.com/api", content_type="json", headers={"User-Agent": "pm_bot"}
+    )
+    assert {"versions": []} == response
+    mock_get.assert_called_once_with("https://example.com/api", headers={"User-Agent": "pm_bot"})
+
+
+@pytest.fixture
+def offline():
+    transport.set_offline(True)
+    yield
+    transport.set_offline(False)
+    transport.set_metadata_cache(None)
+
+
+def test_offline_mode_does_not_make_requests(offline):
+    with mock.patch.object(transport.get_session(), "request") as mock_request:
+        with pytest.raises(OfflineError):
+            transport.get("https://example.com")
+        with pytest.raises(OfflineError):
+            get_response("https://pypi.org/pypi/django/json")
+        with pytest.raises(OfflineError):
+            resolve_purl("pkg:pub/http@0.13.3")
+        with pytest.raises(OfflineError):
+            fetch("https://example.com/foo.tar.gz")
+        assert not mock_request.called
+
+
+def test_offline_mode_serves_from_caches(offline, tmp_path):
+    url = "https://pypi.org/pypi/django/json"
+    metadata_cache = MetadataCache(str(tmp_path / "metadata.sqlite3"))
+    transport.set_metadata_cache(metadata_cache)
+    response = mock.Mock(status_code=200, content=b'{"info": {}}', headers={})
+    metadata_cache.fetch(url, get=mock.Mock(return_value=response))
+
+    download_cache = DownloadCache(str(tmp_path / "downloads"))
+    archive = tmp_path / "archive"
+    archive.write_bytes(b"content")
+    download_cache.add(url="https://example.com/foo.tar.gz", location=str(archive))
+
+    with mock.patch.object(transport.get_session(), "request") as mock_request:
+        assert {"info": {}} == get_response(url)
+        fetched = fetch(
+            "https://example.com/foo.tar.gz", location=tmp_path / "fetched", cache=download_cache
+        )
+        assert b"content" == (tmp_path / "fetched").read_bytes()
+        assert 7 == fetched.size
+        assert not mock_request.called
+
+
+def test_offline_mode_resolves_purls_from_caches(offline, tmp_path):
+    transport.set_metadata_cache(MetadataCache(str(tmp_path / "metadata.sqlite3")))
+    url = "https://pub.dev/api/archives/http-0.13.3.tar.gz"
+    transport.set_offline(False)
+    utils.clear_exists_cache()
+    with mock.patch.object(transport.get_session(), "request") as mock_request:
+        mock_request.return_value = mock.Mock(status_code=206, content=b"", headers={})
+        assert url == resolve_purl("pkg:pub/http@0.13.3")
+
+    transport.set_offline(True)
+    utils.clear_exists_cache()
+    download_cache = DownloadCache(str(tmp_path / "downloads"))
+    download_cache.add_purl("pkg:pypi/fetchcode@0.1", "https://example.com/fetchcode-0.1.tar.gz")
+    with mock.patch.object(transport.get_session(), "request") as mock_request:
+        assert url == resolve_purl("pkg:pub/http@0.13.3")
+        assert "https://example.com/fetchcode-0.1.tar.gz" == resolve_purl(
+            "pkg:pypi/fetchcode@0.1", cache=download_cache
+        )
+        assert not mock_request.called
+
+
+def test_offline_mode_serves_github_tags_from_tag_cache(offline, tmp_path):
+    tag_cache = TagCache(str(tmp_path / "tags.sqlite3"))
+    node = {"name": "v1.0", "target": {"committedDate": "2020-01-01T00:00:00Z"}}
+    tag_cache.add_nodes("aboutcode-org/fetchcode", [node])
+    utils.set_github_tag_cache(tag_cache)
+    try:
+        with mock.patch.object(transport.get_session(), "request") as mock_request:
+            result = list(versions("pkg:github/aboutcode-org/fetchcode"))
+            with pytest.raises(OfflineError):
+                list(versions("pkg:github/aboutcode-org/scancode-toolkit"))
+            assert not mock_request.called
+    finally:
+        utils.set_github_tag_cache(None)
+
+    assert ["v1.0"] == [package_version.value for package_version in result]
@@ -0,0 +1,164 @@
+# fetchcode is a free software tool from nexB Inc. and others.
+# Visit https://github.com/aboutcode-org/fetchcode for support and download.
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and http://aboutcode.org
+#
+# This software is licensed under the Apache License version 2.0.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at:
+# http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+
+import os
+from unittest import mock
+
+import pytest
+
+from fetchcode import fetch
+from fetchcode import workspace
+from fetchcode.vcs import fetch_via_vcs
+from fetchcode.workspace import Workspace
+
+
+@pytest.fixture
+def configured_workspace(tmp_path):
+    yield workspace.configure(root=str(tmp_path / "workspace"), max_size=10)
+    workspace.configure()
+
+
+def write_entry(ws, size, pinned=False):
+    entry = ws.make_entry()
+    with open(os.path.join(entry, "file"), "wb") as f:
+        f.write(b"a" * size)
+    if not pinned:
+        ws.unpin(entry)
+    return entry
+
+
+def test_workspace_cleanup_removes_least_recently_used_entries(tmp_path):
+    ws = Workspace(root=str(tmp_path))
+    old = write_entry(ws, 6)
+    new = write_entry(ws, 6)
+    os.utime(old, (1, 1))
+
+    ws.cleanup(max_size=10)
+
+    assert not os.path.exists(old)
+    assert os.path.exists(new)
+    assert 6 == ws.get_size()
+
+
+def test_workspace_cleanup_keeps_pinned_entries(tmp_path):
+    ws = Workspace(root=str(tmp_path))
+    first = write_entry(ws, 6)
+    second = write_entry(ws, 6)
+    ws.pin(first)
+    ws.pin(second)
+
+    ws.cleanup(max_size=10)
+
+    assert os.path.exists(first)
+    assert os.path.exists(second)
+
+    ws.unpin(second)
+    ws.cleanup(max_size=10)
+    assert os.path.exists(first)
+    assert not os.path.exists(second)
+
+
+def test_workspace_cleanup_keeps_entries_pinned_by_other_processes(tmp_path):
+    other_process_workspace = Workspace(root=str(tmp_path))
+    entry = write_entry(other_process_workspace, 6, pinned=True)
+    ws = Workspace(root=str(tmp_path))
+
+    ws.cleanup(max_size=1)
+    assert os.path.exists(entry)
+
+    with mock.patch("fetchcode.workspace.is_process_alive", return_value=False):
+        ws.cleanup(max_size=1)
+    assert [] == os.listdir(tmp_path)
+
+
+def test_workspace_cleanup_uses_sizes_recorded_in_leases(tmp_path):
+    ws = Workspace(root=str(tmp_path))
+    write_entry(ws, 6)
+    write_entry(ws, 6)
+
+    with mock.patch("fetchcode.workspace.get_tree_size") as mock_get_tree_size:
+        ws.cleanup(max_size=100)
+
+    mock_get_tree_size.assert_not_called()
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_keeps_workspace_within_quota_for_unreleased_responses(mock_get, tmp_path):
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.headers = {}
+    mock_get.return_value.iter_content.return_value = [b"a" * 80]
+    ws = workspace.configure(root=str(tmp_path), max_size=100)
+
+    responses = [fetch(f"https://example.com/foo-{i}.tar.gz") for i in range(5)]
+
+    assert 80 == ws.get_size()
+    assert [responses[-1].location] == [
+        response.location for response in responses if os.path.exists(response.location)
+    ]
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_response_in_use_is_not_removed_from_workspace(mock_get, tmp_path):
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.headers = {}
+    mock_get.return_value.iter_content.return_value = [b"a" * 80]
+    workspace.configure(root=str(tmp_path), max_size=100)
+
+    with fetch("https://example.com/foo.tar.gz") as response:
+        fetch("https://example.com/bar.tar.gz")
+        assert os.path.exists(response.location)
+
+
+def test_fetch_requires_location_to_resume():
+    with pytest.raises(ValueError):
+        fetch("https://example.com/foo.tar.gz", resume=True)
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_response_releases_workspace_entry(mock_get, configured_workspace):
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.headers = {}
+    mock_get.return_value.iter_content.return_value = [b"abc"]
+
+    with fetch("https://example.com/foo.tar.gz") as response:
+        assert response.location.startswith(configured_workspace.root)
+        assert response.location.endswith("foo.tar.gz")
+        assert b"abc" == open(response.location, "rb").read()
+
+    assert not os.path.exists(response.location)
+    assert [] == configured_workspace.get_entries()
+
+
+@mock.patch("fetchcode.transport.get")
+def test_fetch_releases_workspace_entry_on_error(mock_get, configured_workspace):
+    mock_get.side_effect = OSError
+
+    with pytest.raises(OSError):
+        fetch("https://example.com/foo.tar.gz")
+
+    assert [] == configured_workspace.get_entries()
+
+
+@mock.patch("fetchcode.vcs.vcs.get_backend_for_scheme")
+def test_fetch_via_vcs_response_releases_workspace_entry(mock_backend, configured_workspace):
+    mock_backend.return_value.obtain = lambda dest, url, verbosity: os.makedirs(dest)
+
+    with fetch_via_vcs("git+https://github.com/aboutcode-org/fetchcode") as response:
+        assert response.dest_dir.startswith(configured_workspace.root)
+        assert os.path.isdir(response.dest_dir)
+
+    assert not os.path.exists(response.dest_dir)
+    assert [] == configured_workspace.get_entries()